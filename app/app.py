@@ -1,17 +1,20 @@
 import streamlit as st
 import numpy as np
 import cv2
-from PIL import Image
 import os
 import time
+import hashlib
+from collections import OrderedDict
 
 # Internal imports
 from utils.image_utils import ImageUtils
 from utils.visualization import VisualizationUtils
-from services.orb_service import ORBService
-from services.sift_service import SIFTService
-from services.matcher import MatcherService
+from services.detector_registry import available_detectors, detector_class
+from services.detector_comparison import DetectorComparison, DEFAULT_CONFIGS
+from services.instance_pool import InstancePool
+from services.matcher import VERIFICATION_METHODS
 from services.metrics import MetricsService
+from services.feature_cache import FeatureCache
 
 # Page configuration
 st.set_page_config(
@@ -42,21 +45,237 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
+PREVIEW_LONG_EDGE = 1600  # drawing happens on previews; full resolution only for downloads
+MAX_SESSION_ENTRIES = 4
+
+@st.cache_resource
+def get_feature_cache():
+    # One cache per server process, shared across sessions and reruns
+    return FeatureCache()
+
+@st.cache_resource
+def get_instance_pool(feature_cache: bool = True):
+    # Detector and matcher instances shared by every session thread (see InstancePool); the
+    # detector comparison gets its own uncached pool so its timings measure real extraction
+    return InstancePool(cache=get_feature_cache() if feature_cache else None)
+
+def file_digest(file) -> str:
+    return hashlib.blake2b(file.getbuffer(), digest_size=16).hexdigest()
+
+def lru_get(store: OrderedDict, key, compute, max_entries: int = MAX_SESSION_ENTRIES):
+    """Return store[key], computing and inserting it (evicting the oldest entries) on a miss."""
+    if key in store:
+        store.move_to_end(key)
+        return store[key]
+    value = store[key] = compute()
+    while len(store) > max_entries:
+        store.popitem(last=False)
+    return value
+
+def session_cached(name: str, key, compute):
+    """Per-session LRU cache in st.session_state, so reruns reuse earlier work."""
+    if name not in st.session_state:
+        st.session_state[name] = OrderedDict()
+    return lru_get(st.session_state[name], key, compute)
+
+def run_analysis(img_a, img_b, algo, n_features, ratio_test, ratio_threshold, verification,
+                 max_megapixels, tile_size):
+    """Extraction, matching, verification and metrics for one set of inputs."""
+    pool = get_instance_pool()
+    detector = pool.detector(algo, n_features, tile_size=tile_size,
+                             max_features_per_tile=500 if tile_size else None, max_megapixels=max_megapixels)
+    matcher = pool.matcher(algo, verification=verification)
+
+    # 1. Feature Extraction
+    res_a = detector.detect_and_compute(img_a)
+    res_b = detector.detect_and_compute(img_b)
+
+    # 2. Matching & Geometric Verification
+    match_results = matcher.match(
+        res_a["keypoints"], res_a["descriptors"],
+        res_b["keypoints"], res_b["descriptors"],
+        ratio_test=ratio_test,
+        ratio_threshold=ratio_threshold
+    )
+
+    # 3. Metrics Generation
+    stats = MetricsService.calculate_similarity_stats(
+        match_results["raw_matches"],
+        match_results["inlier_matches"],
+        res_a["count"], res_b["count"],
+        method=algo
+    )
+
+    total_time = res_a["extraction_time"] + res_b["extraction_time"] + match_results["total_match_time"]
+    return {"res_a": res_a, "res_b": res_b, "match_results": match_results, "stats": stats,
+            "total_time": total_time, "renders": OrderedDict()}
+
+def render_analysis(analysis, img_a, img_b, algo_choice, vis_mode, top_k):
+    res_a, res_b = analysis["res_a"], analysis["res_b"]
+    match_results, stats, total_time = analysis["match_results"], analysis["stats"], analysis["total_time"]
+    # Drawn previews are memoised per display option on the analysis itself
+    render = lambda key, compute: lru_get(analysis["renders"], key, compute, max_entries=8)
+
+    # Metrics Row
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Inlier Matches", stats["num_inliers"], f"{stats['inlier_ratio']:.1f}% ratio")
+    m2.metric("Match Ratio", f"{stats['match_ratio']:.2f}%")
+    m3.metric("Confidence", f"{stats['confidence_score']:.1f}/100")
+    m4.metric("Total Time", f"{total_time:.3f}s")
+
+    # Verdict
+    if stats["confidence_score"] >= 80:
+        st.success(f"**Verdict:** {stats['verdict']} 🌟")
+    elif stats["confidence_score"] >= 50:
+        st.warning(f"**Verdict:** {stats['verdict']} ⚠️")
+    else:
+        st.error(f"**Verdict:** {stats['verdict']} ❌")
+
+    # Only the selected view is rendered (st.tabs would build every tab on each rerun)
+    view = st.radio("View", ["Visualization", "Keypoints", "Analytics", "Performance"],
+                    horizontal=True, label_visibility="collapsed")
+
+    if view == "Visualization":
+        st.write(f"### Match Visualization ({vis_mode})")
+
+        # Determine which matches to draw
+        if vis_mode == "Inliers Only":
+            matches_to_draw = match_results["inlier_matches"]
+        elif vis_mode == "Top-K Matches":
+            matches_to_draw = match_results["raw_matches"][:top_k]
+        else:
+            matches_to_draw = match_results["raw_matches"]
+
+        draw = lambda max_long_edge: VisualizationUtils.draw_matches(
+            img_a, res_a["keypoints"],
+            img_b, res_b["keypoints"],
+            matches_to_draw,
+            n_matches=None, # already sliced
+            max_long_edge=max_long_edge
+        )
+        preview = render(("matches", vis_mode, top_k), lambda: ImageUtils.to_rgb(draw(PREVIEW_LONG_EDGE)))
+        st.image(preview, use_container_width=True)
+
+        # Download: the full-resolution drawing and PNG encode only happen on request
+        png_key = ("matches_png", vis_mode, top_k)
+        png = analysis["renders"].get(png_key)
+        if png is None and st.button("Prepare full-resolution download"):
+            with st.spinner("Encoding full-resolution image..."):
+                png = render(png_key, lambda: VisualizationUtils.encode_png(draw(None)))
+        if png is not None:
+            st.download_button(
+                label="Download Visualization",
+                data=png,
+                file_name=f"visionmatch_{algo_choice}_{vis_mode}.png",
+                mime="image/png"
+            )
+
+    elif view == "Keypoints":
+        k1, k2 = st.columns(2)
+        for column, label, img, res in ((k1, "A", img_a, res_a), (k2, "B", img_b, res_b)):
+            with column:
+                st.write(f"#### Image {label} Keypoints")
+                st.info(f"Detected: {res['count']}")
+                img_kp = render(("keypoints", label), lambda: ImageUtils.to_rgb(
+                    VisualizationUtils.draw_keypoints(img, res["keypoints"], max_long_edge=PREVIEW_LONG_EDGE)))
+                st.image(img_kp, use_container_width=True)
+
+    elif view == "Analytics":
+        st.write("### Distance Distribution")
+        hist = render("histogram", lambda: VisualizationUtils.plot_distance_histogram(
+            match_results["raw_matches"], stats, algo_choice))
+        st.plotly_chart(hist, use_container_width=True)
+
+        st.write("#### Statistical Summary")
+        col_s1, col_s2 = st.columns(2)
+        with col_s1:
+            st.write("**Descriptor Stats**")
+            st.write(f"- Type: `{res_a['descriptor_type']}`")
+            st.write(f"- Size: `{res_a['descriptor_size']}`")
+            st.write(f"- Mean Distance: `{stats['avg_distance']:.2f}`")
+            st.write(f"- Median Distance: `{stats['median_distance']:.2f}`")
+        with col_s2:
+            st.write("**Matching Stats**")
+            st.write(f"- Raw Matches: `{stats['num_matches']}`")
+            st.write(f"- Verified Inliers: `{stats['num_inliers']}`")
+            st.write(f"- Std Deviation: `{stats['std_distance']:.2f}`")
+            st.write(f"- Min/Max: `{stats['min_distance']:.1f}` / `{stats['max_distance']:.1f}`")
+
+    else:
+        st.write("### Execution Breakdown")
+        perf_data = {
+            "Phase": ["Extraction (Img A)", "Extraction (Img B)", "Initial Matching", "RANSAC Verification", "Total"],
+            "Time (Seconds)": [
+                f"{res_a['extraction_time']:.4f}",
+                f"{res_b['extraction_time']:.4f}",
+                f"{match_results['matching_time']:.4f}",
+                f"{match_results['ransac_time']:.4f}",
+                f"{total_time:.4f}"
+            ]
+        }
+        st.table(perf_data)
+        st.write(f"Verification: `{match_results['verification_method']}` "
+                 f"(~{match_results['ransac_iterations']} iterations)")
+        if res_a["cache_hit"] and res_b["cache_hit"]:
+            st.caption("Features for both images were served from the feature cache.")
+        st.info("Performance measured on the current server environment.")
+
+def render_comparison(comparison, min_confidence):
+    rows = comparison["rows"]
+    st.write("### Detector Comparison")
+    st.caption(f"{len(rows)} configurations in {comparison['wall_time']:.2f}s wall time in parallel; "
+               f"per-configuration times are measured with each one running alone. Grayscale "
+               f"conversion is shared by all ({comparison['preprocess_time'] * 1e3:.1f} ms).")
+    st.dataframe([{
+        "Detector": r["label"],
+        "Keypoints A / B": f"{r['keypoints_a']} / {r['keypoints_b']}",
+        "Matches": r["num_matches"],
+        "Inliers": r["num_inliers"],
+        "Inlier %": round(r["inlier_ratio"], 1),
+        "Confidence": round(r["confidence_score"], 1),
+        "Verdict": r["verdict"],
+        "Extraction (s)": round(r["extraction_time_a"] + r["extraction_time_b"], 4),
+        "Matching (s)": round(r["matching_time"], 4),
+        "RANSAC (s)": round(r["ransac_time"], 4),
+        "Total (s)": round(r["total_time"], 4),
+        "Descriptor bytes": r["descriptor_bytes"]
+    } for r in rows], use_container_width=True)
+
+    best = DetectorComparison.cheapest(rows, min_confidence)
+    if best is None:
+        st.warning(f"No configuration reached a confidence of {min_confidence}.")
+    else:
+        st.success(f"**Cheapest above the bar:** {best['label']} "
+                   f"({best['total_time']:.3f}s, confidence {best['confidence_score']:.1f})")
+
 def main():
     st.title("🔍 VisionMatch Pro")
     st.subheader("Mathematically Robust Feature Comparison")
     
     # Sidebar
     st.sidebar.title("Controls")
-    algo_choice = st.sidebar.selectbox("Choose Algorithm", ["ORB", "SIFT"])
+    mode = st.sidebar.radio("Mode", ["Single Detector", "Compare Detectors"], horizontal=True)
+    if mode == "Compare Detectors":
+        labels = [c[0] for c in DEFAULT_CONFIGS if c[1] in available_detectors()]
+        compare_labels = st.sidebar.multiselect("Detectors", labels, default=labels)
+        min_confidence = st.sidebar.slider("Accuracy Bar (confidence)", 0, 100, 80)
+        algo_choice = None
+    else:
+        algo_choice = st.sidebar.selectbox("Choose Algorithm", available_detectors())
     
     st.sidebar.divider()
     
     # Algorithmic Params
     with st.sidebar.expander("Parameters", expanded=True):
-        n_features = st.slider("Max Keypoints", 500, 5000, 2000) if algo_choice == "ORB" else None
+        budgeted = algo_choice is not None and detector_class(algo_choice).has_budget
+        n_features = st.slider("Max Keypoints", 500, 5000, 2000) if budgeted else None
         ratio_test = st.checkbox("Use Lowe's Ratio Test", value=True)
-        ratio_threshold = st.slider("Ratio Threshold", 0.1, 1.0, 0.75) if (ratio_test or algo_choice == "SIFT") else 0.75
+        ratio_threshold = st.slider("Ratio Threshold", 0.1, 1.0, 0.75) if (ratio_test or not budgeted) else 0.75
+        verification = st.selectbox("Geometric Verification", list(VERIFICATION_METHODS), index=0)
+        working_res = st.selectbox("Working Resolution", ["Full", "4 MP", "2 MP", "1 MP"], index=0)
+        max_megapixels = None if working_res == "Full" else float(working_res.split()[0])
+        tiled = st.checkbox("Tiled extraction (large images)", value=False)
+        tile_size = st.select_slider("Tile Size", [512, 1024, 2048], value=1024) if tiled else None
     
     # Visualization Settings
     with st.sidebar.expander("Visualization", expanded=True):
@@ -75,133 +294,45 @@ def main():
         file_b = st.file_uploader("Upload Image B", type=["jpg", "jpeg", "png"], key="img_b")
 
     if file_a and file_b:
-        # Load images
-        img_a = ImageUtils.load_image(file_a)
-        img_b = ImageUtils.load_image(file_b)
-        
+        # Decoded images are kept per upload, so display-only reruns skip decoding
+        digest_a, digest_b = file_digest(file_a), file_digest(file_b)
+        img_a = session_cached("images", digest_a, lambda: ImageUtils.load_image(file_a))
+        img_b = session_cached("images", digest_b, lambda: ImageUtils.load_image(file_b))
+
+        if mode == "Compare Detectors":
+            options = dict(tile_size=tile_size, max_features_per_tile=500 if tiled else None,
+                           max_megapixels=max_megapixels)
+            comparison_key = (digest_a, digest_b, tuple(compare_labels), ratio_test, ratio_threshold,
+                              verification, *options.values())
+            if st.sidebar.button("Run Comparison", type="primary") and compare_labels:
+                configs = [c for c in DEFAULT_CONFIGS if c[0] in compare_labels]
+                with st.spinner(f"Running {len(configs)} detector configurations in parallel..."):
+                    session_cached("comparisons", comparison_key, lambda: DetectorComparison(
+                        configs, verification=verification, pool=get_instance_pool(feature_cache=False), **options
+                    ).compare(img_a, img_b, ratio_test=ratio_test, ratio_threshold=ratio_threshold))
+
+            comparison = st.session_state.get("comparisons", {}).get(comparison_key)
+            if comparison is None:
+                st.info("Press **Run Comparison** to run the selected detectors on this pair.")
+            else:
+                render_comparison(comparison, min_confidence)
+            return
+
+        config = dict(algo=algo_choice, n_features=n_features, ratio_test=ratio_test,
+                      ratio_threshold=ratio_threshold, verification=verification,
+                      max_megapixels=max_megapixels, tile_size=tile_size)
+        analysis_key = (digest_a, digest_b, *config.values())
+
         if st.sidebar.button("Analyze & Verify", type="primary"):
             with st.spinner(f"Running {algo_choice} + RANSAC Verification..."):
-                # Initialize services
-                detector = ORBService(n_features=n_features) if algo_choice == "ORB" else SIFTService()
-                matcher = MatcherService(method=algo_choice)
-                
-                # 1. Feature Extraction
-                res_a = detector.detect_and_compute(img_a)
-                res_b = detector.detect_and_compute(img_b)
-                
-                # 2. Matching & Geometric Verification
-                match_results = matcher.match(
-                    res_a["keypoints"], res_a["descriptors"],
-                    res_b["keypoints"], res_b["descriptors"],
-                    ratio_test=ratio_test, 
-                    ratio_threshold=ratio_threshold
-                )
-                
-                # 3. Metrics Generation
-                stats = MetricsService.calculate_similarity_stats(
-                    match_results["raw_matches"], 
-                    match_results["inlier_matches"],
-                    res_a["count"], res_b["count"],
-                    method=algo_choice
-                )
-                
-                total_time = res_a["extraction_time"] + res_b["extraction_time"] + match_results["total_match_time"]
-
-                # --- UI DISPLAY ---
-                
-                # Metrics Row
-                m1, m2, m3, m4 = st.columns(4)
-                m1.metric("Inlier Matches", stats["num_inliers"], f"{stats['inlier_ratio']:.1f}% ratio")
-                m2.metric("Match Ratio", f"{stats['match_ratio']:.2f}%")
-                m3.metric("Confidence", f"{stats['confidence_score']:.1f}/100")
-                m4.metric("Total Time", f"{total_time:.3f}s")
-                
-                # Verdict
-                if stats["confidence_score"] >= 80:
-                    st.success(f"**Verdict:** {stats['verdict']} 🌟")
-                elif stats["confidence_score"] >= 50:
-                    st.warning(f"**Verdict:** {stats['verdict']} ⚠️")
-                else:
-                    st.error(f"**Verdict:** {stats['verdict']} ❌")
-                
-                # Result Tabs
-                tab1, tab2, tab3, tab4 = st.tabs(["Visualization", "Keypoints", "Analytics", "Performance"])
-                
-                with tab1:
-                    st.write(f"### Match Visualization ({vis_mode})")
-                    
-                    # Determine which matches to draw
-                    if vis_mode == "Inliers Only":
-                        matches_to_draw = match_results["inlier_matches"]
-                    elif vis_mode == "Top-K Matches":
-                        matches_to_draw = match_results["raw_matches"][:top_k]
-                    else:
-                        matches_to_draw = match_results["raw_matches"]
-
-                    img_matches = VisualizationUtils.draw_matches(
-                        img_a, res_a["keypoints"], 
-                        img_b, res_b["keypoints"], 
-                        matches_to_draw,
-                        n_matches=None # already sliced
-                    )
-                    st.image(ImageUtils.to_rgb(img_matches), use_container_width=True)
-                    
-                    # Download
-                    ret, buf = cv2.imencode(".png", img_matches)
-                    st.download_button(
-                        label="Download Visualization",
-                        data=buf.tobytes(),
-                        file_name=f"visionmatch_{algo_choice}_{vis_mode}.png",
-                        mime="image/png"
-                    )
-
-                with tab2:
-                    k1, k2 = st.columns(2)
-                    with k1:
-                        st.write("#### Image A Keypoints")
-                        st.info(f"Detected: {res_a['count']}")
-                        img_kp_a = VisualizationUtils.draw_keypoints(img_a, res_a["keypoints"])
-                        st.image(ImageUtils.to_rgb(img_kp_a), use_container_width=True)
-                    with k2:
-                        st.write("#### Image B Keypoints")
-                        st.info(f"Detected: {res_b['count']}")
-                        img_kp_b = VisualizationUtils.draw_keypoints(img_b, res_b["keypoints"])
-                        st.image(ImageUtils.to_rgb(img_kp_b), use_container_width=True)
-
-                with tab3:
-                    st.write("### Distance Distribution")
-                    hist = VisualizationUtils.plot_distance_histogram(match_results["raw_matches"], stats, algo_choice)
-                    st.plotly_chart(hist, use_container_width=True)
-                    
-                    st.write("#### Statistical Summary")
-                    col_s1, col_s2 = st.columns(2)
-                    with col_s1:
-                        st.write("**Descriptor Stats**")
-                        st.write(f"- Type: `{res_a['descriptor_type']}`")
-                        st.write(f"- Size: `{res_a['descriptor_size']}`")
-                        st.write(f"- Mean Distance: `{stats['avg_distance']:.2f}`")
-                        st.write(f"- Median Distance: `{stats['median_distance']:.2f}`")
-                    with col_s2:
-                        st.write("**Matching Stats**")
-                        st.write(f"- Raw Matches: `{stats['num_matches']}`")
-                        st.write(f"- Verified Inliers: `{stats['num_inliers']}`")
-                        st.write(f"- Std Deviation: `{stats['std_distance']:.2f}`")
-                        st.write(f"- Min/Max: `{stats['min_distance']:.1f}` / `{stats['max_distance']:.1f}`")
-
-                with tab4:
-                    st.write("### Execution Breakdown")
-                    perf_data = {
-                        "Phase": ["Extraction (Img A)", "Extraction (Img B)", "Initial Matching", "RANSAC Verification", "Total"],
-                        "Time (Seconds)": [
-                            f"{res_a['extraction_time']:.4f}",
-                            f"{res_b['extraction_time']:.4f}",
-                            f"{match_results['matching_time']:.4f}",
-                            f"{match_results['ransac_time']:.4f}",
-                            f"{total_time:.4f}"
-                        ]
-                    }
-                    st.table(perf_data)
-                    st.info("Performance measured on the current server environment.")
+                session_cached("analyses", analysis_key, lambda: run_analysis(img_a, img_b, **config))
+
+        # Results survive reruns: changing display options only redraws
+        analysis = st.session_state.get("analyses", {}).get(analysis_key)
+        if analysis is None:
+            st.info("Press **Analyze & Verify** to compare the images with the current parameters.")
+        else:
+            render_analysis(analysis, img_a, img_b, algo_choice, vis_mode, top_k)
 
     else:
         st.info("👋 Welcome to VisionMatch Pro! Please upload two images to begin your comparison.")
@@ -0,0 +1,186 @@
+"""Headless batch comparison: extract, match and score image pairs across a process pool.
+
+Results are streamed as JSON Lines, one object per pair. Every image's features are held in
+memory for the matching phase; for very large or interruptible jobs use job.py instead.
+
+Examples:
+    python app/batch.py --dir images/ --algo ORB --workers 8 > results.jsonl
+    python app/batch.py --manifest pairs.csv --algo SIFT --output results.jsonl
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+
+import cv2
+
+from services.detector_registry import available_detectors, create_detector
+from services.job_runner import directory_pairs, manifest_pairs
+from services.matcher import MatcherService
+from services.metrics import MetricsService
+from utils.image_utils import ImageUtils
+from utils.keypoint_utils import KeypointUtils
+from utils.instrumentation import instrumentation
+
+# Per-process state, populated by the pool initializers
+_worker = {}
+
+def list_directory_pairs(directory: str):
+    """All unordered pairs of images in a directory (sorted for reproducible output)."""
+    return list(directory_pairs(directory))
+
+def read_manifest(manifest: str):
+    """Read image pairs from a CSV/TSV manifest. Relative paths resolve against the manifest's folder."""
+    return list(manifest_pairs(manifest))
+
+def _init_extractor(algo: str, n_features: int):
+    # One OpenCV thread per process: the pool provides the parallelism
+    cv2.setNumThreads(1)
+    _worker["detector"] = create_detector(algo, n_features=n_features)
+
+def _extract(path: str):
+    try:
+        # Extraction only needs grayscale: decode straight to it from the mmapped file
+        img = ImageUtils.load_image(path, grayscale=True)
+    except OSError:
+        img = None
+    if img is None:
+        return path, None
+    res = _worker["detector"].detect_and_compute(img)
+    # cv2.KeyPoint cannot cross process boundaries; ship a packed array instead
+    return path, {
+        "keypoints": KeypointUtils.pack(res["keypoints"]),
+        "descriptors": res["descriptors"],
+        "count": res["count"],
+        "extraction_time": res["extraction_time"]
+    }
+
+def _init_matcher(algo: str, features: dict, ratio_test: bool, ratio_threshold: float, trace: bool = False):
+    cv2.setNumThreads(1)
+    _worker["trace"] = trace
+    _worker["matcher"] = MatcherService(method=algo)
+    _worker["algo"] = algo
+    _worker["features"] = features
+    _worker["ratio_test"] = ratio_test
+    _worker["ratio_threshold"] = ratio_threshold
+    _worker["keypoints"] = {}
+
+def _keypoints(path: str):
+    # Unpack lazily and once per worker, since the same image recurs across pairs
+    kp = _worker["keypoints"].get(path)
+    if kp is None:
+        kp = _worker["keypoints"][path] = KeypointUtils.unpack(_worker["features"][path]["keypoints"])
+    return kp
+
+def _match(pair):
+    if not _worker["trace"]:
+        return _match_pair(pair)
+    with instrumentation.trace("pair") as record:
+        result = _match_pair(pair)
+    result["trace"] = {"duration": record["duration"], "spans": record["spans"], "counters": record["counters"]}
+    return result
+
+def _match_pair(pair):
+    path_a, path_b = pair
+    feat_a = _worker["features"].get(path_a)
+    feat_b = _worker["features"].get(path_b)
+    if feat_a is None or feat_b is None:
+        missing = [p for p, f in ((path_a, feat_a), (path_b, feat_b)) if f is None]
+        return {"image_a": path_a, "image_b": path_b, "error": f"Could not load image: {', '.join(missing)}"}
+
+    match_results = _worker["matcher"].match(
+        _keypoints(path_a), feat_a["descriptors"],
+        _keypoints(path_b), feat_b["descriptors"],
+        ratio_test=_worker["ratio_test"],
+        ratio_threshold=_worker["ratio_threshold"]
+    )
+    stats = MetricsService.calculate_similarity_stats(
+        match_results["raw_matches"],
+        match_results["inlier_matches"],
+        feat_a["count"], feat_b["count"],
+        method=_worker["algo"]
+    )
+    homography = match_results["homography"]
+    return {
+        "image_a": path_a,
+        "image_b": path_b,
+        "keypoints_a": feat_a["count"],
+        "keypoints_b": feat_b["count"],
+        "stats": {k: (v if isinstance(v, str) else float(v)) for k, v in stats.items()},
+        "homography": homography.tolist() if homography is not None else None,
+        "extraction_time_a": feat_a["extraction_time"],
+        "extraction_time_b": feat_b["extraction_time"],
+        "matching_time": match_results["matching_time"],
+        "ransac_time": match_results["ransac_time"]
+    }
+
+def run_batch(pairs, out, algo="ORB", n_features=2000, workers=None, ratio_test=True, ratio_threshold=0.75,
+              trace=False):
+    """Run the full pipeline over pairs, writing one JSON line per pair to `out` as results arrive."""
+    workers = workers or os.cpu_count() or 1
+    unique_paths = sorted({p for pair in pairs for p in pair})
+    ctx = mp.get_context("fork" if "fork" in mp.get_all_start_methods() else "spawn")
+
+    # Phase 1: extract each distinct image exactly once
+    start = time.perf_counter()
+    features = {}
+    with ctx.Pool(workers, initializer=_init_extractor, initargs=(algo, n_features)) as pool:
+        chunksize = max(1, len(unique_paths) // (workers * 4))
+        for path, feat in pool.imap_unordered(_extract, unique_paths, chunksize=chunksize):
+            if feat is not None:
+                features[path] = feat
+    extraction_wall = time.perf_counter() - start
+
+    # Phase 2: match pairs; features are handed to each worker once at start-up
+    start = time.perf_counter()
+    with ctx.Pool(workers, initializer=_init_matcher,
+                  initargs=(algo, features, ratio_test, ratio_threshold, trace)) as pool:
+        chunksize = max(1, len(pairs) // (workers * 8))
+        for record in pool.imap_unordered(_match, pairs, chunksize=chunksize):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+    matching_wall = time.perf_counter() - start
+
+    return {
+        "images": len(unique_paths),
+        "pairs": len(pairs),
+        "workers": workers,
+        "extraction_wall_time": extraction_wall,
+        "matching_wall_time": matching_wall
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch image pair comparison (JSON Lines output).")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", help="Compare every pair of images in this directory")
+    source.add_argument("--manifest", help="CSV/TSV file with one 'image_a,image_b' pair per line")
+    parser.add_argument("--algo", choices=available_detectors(), default="ORB")
+    parser.add_argument("--n-features", type=int, default=2000, help="Max keypoints (ORB only)")
+    parser.add_argument("--no-ratio-test", action="store_true", help="Use the distance threshold instead (ORB only)")
+    parser.add_argument("--ratio-threshold", type=float, default=0.75)
+    parser.add_argument("--workers", type=int, default=None, help="Process count (default: all cores)")
+    parser.add_argument("--output", help="Output .jsonl path (default: stdout)")
+    parser.add_argument("--trace", action="store_true", help="Attach per-stage span timings to each record")
+    args = parser.parse_args(argv)
+
+    pairs = list_directory_pairs(args.dir) if args.dir else read_manifest(args.manifest)
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        summary = run_batch(
+            pairs, out,
+            algo=args.algo,
+            n_features=args.n_features,
+            workers=args.workers,
+            ratio_test=not args.no_ratio_test,
+            ratio_threshold=args.ratio_threshold,
+            trace=args.trace
+        )
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(json.dumps(summary), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""Reproducible benchmarks for the extraction, matching and RANSAC stages.
+
+Synthetic image pairs with known homographies are generated at several resolutions, each stage
+is timed with warmup runs and repeats, and results are written as JSON. Pass --baseline to
+compare against a stored run; any stage whose median slows down by more than --tolerance is
+reported as a regression and the exit code is 1.
+
+Examples:
+    python app/benchmark.py --output bench.json
+    python app/benchmark.py --quick --baseline bench.json
+"""
+import argparse
+import ctypes
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from services.orb_service import ORBService
+from services.sift_service import SIFTService
+from services.matcher import MatcherService, VERIFICATION_METHODS
+from services.quantization import QUANTIZERS
+from utils.synthetic import SyntheticUtils
+
+RESOLUTIONS = {"vga": (480, 640), "hd": (1080, 1920), "4k": (2160, 3840)}
+ORB_BUDGETS = (500, 2000, 5000)
+
+try:
+    _libc = ctypes.CDLL("libc.so.6")  # glibc: malloc_trim
+except OSError:
+    _libc = None
+
+def rss_bytes():
+    """Current resident set size from /proc (None where it is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def peak_rss_growth(fn, interval: float = 0.0005):
+    """Run fn() once and return how far resident memory rose above where it started.
+
+    Unlike tracemalloc this includes OpenCV's native buffers. RSS is sampled from a background
+    thread every `interval` seconds, so allocations that live for less than that can be missed.
+    """
+    if _libc is not None:
+        _libc.malloc_trim(0)  # hand memory freed by earlier runs back, so this run's growth shows
+    baseline = rss_bytes()
+    if baseline is None:
+        fn()
+        return None
+    peak = baseline
+    stop = threading.Event()
+
+    def sample():
+        nonlocal peak
+        while not stop.is_set():
+            peak = max(peak, rss_bytes())
+            stop.wait(interval)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        fn()
+    finally:
+        stop.set()
+        sampler.join()
+    return max(peak, rss_bytes()) - baseline
+
+def time_stage(fn, warmup: int, repeats: int, work_units: float = 1.0):
+    """Time fn() and summarise latency percentiles, throughput and peak memory.
+
+    `peak_python_heap_bytes` (tracemalloc) covers Python and NumPy allocations only;
+    `peak_rss_growth_bytes` also covers OpenCV's native buffers (None without /proc).
+    """
+    for _ in range(warmup):
+        fn()
+
+    # Memory is measured on separate runs so tracing and sampling do not skew the timings
+    rss_growth = peak_rss_growth(fn)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+
+    samples = np.array(samples)
+    mean = float(samples.mean())
+    return {
+        "repeats": repeats,
+        "mean_s": mean,
+        "min_s": float(samples.min()),
+        "p50_s": float(np.percentile(samples, 50)),
+        "p90_s": float(np.percentile(samples, 90)),
+        "p99_s": float(np.percentile(samples, 99)),
+        "throughput_per_s": work_units / mean if mean > 0 else None,
+        "peak_python_heap_bytes": int(peak),
+        "peak_rss_growth_bytes": rss_growth
+    }
+
+def bench_quantizers(label, res_a, res_b, training, quantizers, warmup, repeats):
+    """SIFT matching against compact codes, with recall measured against exact float matching."""
+    results = {}
+    for name in quantizers:
+        quantizer = QUANTIZERS[name]().fit(training)
+        codes = quantizer.encode(res_b["descriptors"])
+        matcher = MatcherService(method="SIFT", quantizer=quantizer)
+        args = (res_a["keypoints"], res_a["descriptors"], res_b["keypoints"], codes)
+        results[f"{label}/sift/match_{name}"] = dict(
+            time_stage(lambda: matcher.match(*args), warmup, repeats),
+            **quantizer.recall(res_a["descriptors"], res_b["descriptors"]),
+            code_bytes=int(codes.nbytes),
+            throughput_unit="pairs"
+        )
+    return results
+
+def bench_resolution(label, shape, budgets, warmup, repeats, seed=0, verifications=("ransac",), quantizers=()):
+    """Benchmark every stage on one synthetic pair."""
+    img_a, img_b, _ = SyntheticUtils.make_pair(*shape, seed=seed)
+    megapixels = shape[0] * shape[1] / 1e6
+    results = {}
+
+    configs = [(f"orb{n}", "ORB", ORBService(n_features=n)) for n in budgets]
+    configs.append(("sift", "SIFT", SIFTService()))
+
+    for name, method, detector in configs:
+        res_a = detector.detect_and_compute(img_a)
+        res_b = detector.detect_and_compute(img_b)
+        results[f"{label}/{name}/extract"] = dict(
+            time_stage(lambda: detector.detect_and_compute(img_a), warmup, repeats, work_units=megapixels),
+            keypoints=res_a["count"], throughput_unit="megapixels"
+        )
+
+        matcher = MatcherService(method=method)
+        args = (res_a["keypoints"], res_a["descriptors"], res_b["keypoints"], res_b["descriptors"])
+        modes = [("ratio", True)] + ([("threshold", False)] if method == "ORB" else [])
+        for mode, ratio_test in modes:
+            match_results = matcher.match(*args, ratio_test=ratio_test)
+            results[f"{label}/{name}/match_{mode}"] = dict(
+                time_stage(lambda: matcher.match(*args, ratio_test=ratio_test), warmup, repeats),
+                raw_matches=len(match_results["raw_matches"]),
+                inliers=len(match_results["inlier_matches"]),
+                throughput_unit="pairs"
+            )
+
+        # Geometric verification in isolation, on the ratio-test matches
+        raw = matcher.match(*args, ratio_test=True)["raw_matches"]
+        src = MatcherService.keypoint_coords(res_a["keypoints"])[raw.query_idx].reshape(-1, 1, 2)
+        dst = MatcherService.keypoint_coords(res_b["keypoints"])[raw.train_idx].reshape(-1, 1, 2)
+        for verification in verifications:
+            verifier = MatcherService(method=method, verification=verification)
+            if len(raw) < verifier.min_matches:
+                continue
+            _, mask = verifier.estimate(src, dst)
+            results[f"{label}/{name}/{verification}"] = dict(
+                time_stage(lambda: verifier.estimate(src, dst), warmup, repeats),
+                matches=len(raw),
+                inliers=int(mask.sum()) if mask is not None else 0,
+                throughput_unit="estimations"
+            )
+
+        if method == "SIFT" and quantizers:
+            # Codebooks are trained on an unrelated image so recall is not measured on training data
+            training = detector.detect_and_compute(SyntheticUtils.texture(*shape, seed=seed + 100))["descriptors"]
+            results.update(bench_quantizers(label, res_a, res_b, training, quantizers, warmup, repeats))
+    return results
+
+def compare(current: dict, baseline: dict, tolerance: float):
+    """Return (regressions, report lines) comparing median latency per benchmark."""
+    regressions, lines = [], []
+    for name, result in sorted(current["results"].items()):
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            lines.append(f"  NEW   {name}: p50 {result['p50_s'] * 1e3:.2f} ms")
+            continue
+        change = result["p50_s"] / base["p50_s"] - 1 if base["p50_s"] > 0 else 0.0
+        status = "SLOW" if change > tolerance else ("FAST" if change < -tolerance else "ok")
+        if status == "SLOW":
+            regressions.append(name)
+        lines.append(f"  {status:<5} {name}: p50 {base['p50_s'] * 1e3:.2f} -> {result['p50_s'] * 1e3:.2f} ms ({change:+.1%})")
+    return regressions, lines
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark extraction, matching and RANSAC stages.")
+    parser.add_argument("--resolutions", nargs="+", choices=sorted(RESOLUTIONS), default=["vga", "hd"])
+    parser.add_argument("--budgets", nargs="+", type=int, default=list(ORB_BUDGETS), help="ORB n_features values")
+    parser.add_argument("--verifications", nargs="+", choices=list(VERIFICATION_METHODS), default=["ransac"])
+    parser.add_argument("--quantizers", nargs="*", choices=list(QUANTIZERS), default=list(QUANTIZERS),
+                        help="Compact SIFT formats to benchmark (recall vs exact float matching)")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--threads", type=int, default=None, help="cv2.setNumThreads value (default: OpenCV's)")
+    parser.add_argument("--quick", action="store_true", help="VGA only, one ORB budget, 3 repeats")
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="Compare against a previous results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed median slowdown (fraction)")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.resolutions, args.budgets, args.warmup, args.repeats = ["vga"], [2000], 1, 3
+    if args.threads is not None:
+        cv2.setNumThreads(args.threads)
+
+    results = {}
+    for label in args.resolutions:
+        results.update(bench_resolution(label, RESOLUTIONS[label], args.budgets, args.warmup, args.repeats,
+                                        args.seed, args.verifications, args.quantizers))
+
+    report = {
+        "meta": {
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "cv2_threads": cv2.getNumThreads(),
+            "warmup": args.warmup,
+            "repeats": args.repeats,
+            "seed": args.seed
+        },
+        "results": results
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions, lines = compare(report, baseline, args.tolerance)
+        print(f"Comparison against {args.baseline} (tolerance {args.tolerance:.0%}):", file=sys.stderr)
+        print("\n".join(lines), file=sys.stderr)
+        if regressions:
+            print(f"{len(regressions)} regression(s) detected.", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
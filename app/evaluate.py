@@ -0,0 +1,139 @@
+"""Ground-truth evaluation: accuracy against throughput for detector and matcher configurations.
+
+Seed images (by default the bundled un* images in the repository root) are transformed with known
+rotation, scale, perspective, blur, JPEG and illumination changes; pairs of different seeds serve
+as negatives. Every configuration reports homography corner error, inlier precision/recall and
+verdict accuracy next to its per-stage latency, and the Pareto-optimal configurations are marked.
+
+Examples:
+    python app/evaluate.py --output eval.json
+    python app/evaluate.py --detectors ORB-500 ORB-2000 SIFT --verifications ransac usac --plot pareto.html
+    python app/evaluate.py --synthetic 3 --transforms rotation blur
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+
+import cv2
+import numpy as np
+
+from services.detector_comparison import DEFAULT_CONFIGS
+from services.evaluation import Evaluator, ACCURACY_METRICS
+from services.matcher import VERIFICATION_METHODS
+from utils.image_utils import ImageUtils
+from utils.synthetic import SyntheticUtils, TRANSFORMS
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def json_safe(value):
+    """Copy of a report with non-finite floats (inf, nan) replaced by None."""
+    if isinstance(value, dict):
+        return {k: json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(v) for v in value]
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+def load_seeds(paths, synthetic: int, max_long_edge: int, seed: int):
+    """{name: BGR image}, downscaled so the long edge is at most max_long_edge."""
+    seeds = {}
+    for path in paths:
+        img = ImageUtils.load_image(path)
+        if img is None:
+            print(f"Skipping undecodable seed {path}", file=sys.stderr)
+            continue
+        scale = max_long_edge / max(img.shape[:2])
+        if scale < 1.0:
+            img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        seeds[os.path.basename(path)] = img
+    for i in range(synthetic):
+        seeds[f"synthetic-{i}"] = SyntheticUtils.texture(480, 640, seed=seed + i)
+    return seeds
+
+def write_plot(path, summaries, front, accuracy_key):
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=[s["throughput_pairs_per_s"] for s in summaries], y=[s[accuracy_key] for s in summaries],
+        mode="markers+text", text=[s["config"] for s in summaries], textposition="top center", name="configurations"
+    ))
+    fig.add_trace(go.Scatter(
+        x=[s["throughput_pairs_per_s"] for s in front], y=[s[accuracy_key] for s in front],
+        mode="lines", line={"dash": "dash"}, name="Pareto front"
+    ))
+    fig.update_layout(xaxis_title="Throughput (pairs/s)", yaxis_title=accuracy_key)
+    fig.write_html(path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure accuracy against throughput on pairs with known transforms.")
+    parser.add_argument("--seeds", nargs="*", help="Seed images (default: the un* images in the repository root)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Add this many synthetic texture seeds")
+    parser.add_argument("--max-long-edge", type=int, default=1024, help="Downscale larger seeds to this size")
+    parser.add_argument("--detectors", nargs="+", choices=[c[0] for c in DEFAULT_CONFIGS],
+                        help="Detector configurations (default: all available)")
+    parser.add_argument("--verifications", nargs="+", choices=list(VERIFICATION_METHODS), default=["ransac"])
+    parser.add_argument("--transforms", nargs="+", choices=list(TRANSFORMS), default=list(TRANSFORMS))
+    parser.add_argument("--pixel-tolerance", type=float, default=3.0, help="Max reprojection error of a correct match")
+    parser.add_argument("--success-threshold", type=float, default=5.0, help="Max corner error of a correct homography")
+    parser.add_argument("--accuracy", choices=ACCURACY_METRICS, default="homography_success",
+                        help="Accuracy axis of the Pareto front")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rows", action="store_true", help="Include per-pair rows in the JSON output")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--plot", help="Write an HTML accuracy/throughput scatter with the Pareto front")
+    args = parser.parse_args(argv)
+
+    paths = args.seeds if args.seeds is not None else sorted(glob.glob(os.path.join(REPO_ROOT, "un*.*")))
+    seeds = load_seeds(paths, args.synthetic, args.max_long_edge, args.seed)
+    if not seeds:
+        print("No seed images.", file=sys.stderr)
+        return 1
+
+    configs = [c for c in DEFAULT_CONFIGS if not args.detectors or c[0] in args.detectors]
+    evaluator = Evaluator(configs, verifications=args.verifications, pixel_tolerance=args.pixel_tolerance,
+                          success_threshold=args.success_threshold)
+    pairs = list(Evaluator.pairs(seeds, args.transforms, seed=args.seed))
+    print(f"{len(seeds)} seeds, {len(pairs)} pairs per configuration", file=sys.stderr)
+
+    rows = evaluator.run(pairs, progress=lambda name, n, t: print(f"  {name}: {n} pairs in {t:.1f}s", file=sys.stderr))
+    summaries = evaluator.summarize(rows)
+    front = Evaluator.pareto(summaries, accuracy_key=args.accuracy)
+
+    report = {
+        "meta": {
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "seeds": list(seeds),
+            "transforms": {t: list(TRANSFORMS[t]) for t in args.transforms},
+            "pixel_tolerance": args.pixel_tolerance,
+            "success_threshold": args.success_threshold,
+            "accuracy_metric": args.accuracy
+        },
+        "summaries": summaries,
+        "pareto": [s["config"] for s in front]
+    }
+    if args.rows:
+        report["rows"] = rows
+
+    # Failed estimations have an infinite corner error; strict JSON has no Infinity, so write null
+    report = json_safe(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, allow_nan=False)
+    else:
+        json.dump(report, sys.stdout, indent=2, allow_nan=False)
+        print()
+    if args.plot:
+        write_plot(args.plot, summaries, front, args.accuracy)
+
+    print(Evaluator.table(summaries, front), file=sys.stderr)
+    print(f"Pareto front ({args.accuracy} vs mean latency): {', '.join(s['config'] for s in front)}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Import-time budgets: keep the headless extraction/matching API quick to cold-start.
+
+Each module is imported in a fresh interpreter under `python -X importtime`. Two checks run on
+the result:
+- Heavy optional packages (PIL, plotting, Streamlit) must not be loaded at all; these modules
+  only import them lazily, on first use.
+- The import overhead of our own code and the stdlib it pulls in must stay within its budget.
+  cv2 and numpy are measured and reported but not charged to the budget, since they are the core
+  dependencies and their cost depends on the installed build.
+
+Each time is the median of --repeats runs. The exit code is 1 when any check fails.
+
+Examples:
+    python app/import_budget.py
+    python app/import_budget.py --scale 2 --json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Core dependencies: reported, not charged to a module's budget
+CORE_PACKAGES = ("cv2", "numpy")
+# Packages that modules below may only import lazily
+HEAVY_PACKAGES = ("PIL", "matplotlib", "plotly", "streamlit", "pandas", "scipy")
+
+# Module -> overhead budget in ms (own code plus stdlib, excluding cv2/numpy)
+BUDGETS = {
+    "services.detector_registry": 40,
+    "services.matcher": 50,
+    "services.metrics": 50,
+    "services.cross_matcher": 60,
+    "services.frame_tracker": 50,
+    "services.job_runner": 80,
+    "utils.image_utils": 40,
+    "utils.visualization": 50,
+}
+
+def measure(module: str):
+    """One cold import: cumulative time, time spent in core packages, and every module loaded."""
+    env = dict(os.environ, PYTHONPATH=APP_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True, env=env, cwd=APP_DIR)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+
+    # Lines are "import time: self | cumulative | <two spaces per depth>name", children before
+    # their parent; the module's own subtree is the run of deeper lines right before it
+    rows = []
+    for line in proc.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2][1:]
+        rows.append((name.strip(), int(parts[1]), (len(name) - len(name.lstrip(" "))) // 2))
+    end = max(i for i, (name, _, depth) in enumerate(rows) if name == module and depth == 0)
+    start = end
+    while start > 0 and rows[start - 1][2] > 0:
+        start -= 1
+    subtree = rows[start:end + 1]
+
+    # Walk parents-first (reverse order) and charge each outermost core package's subtree once
+    core_us, stack = 0, []
+    for name, cumulative, depth in reversed(subtree):
+        while stack and stack[-1][0] >= depth:
+            stack.pop()
+        is_core = name.split(".")[0] in CORE_PACKAGES
+        inside_core = any(core for _, core in stack)
+        if is_core and not inside_core:
+            core_us += cumulative
+        stack.append((depth, is_core or inside_core))
+    return {"total_us": subtree[-1][1], "core_us": core_us, "modules": [name for name, _, _ in subtree]}
+
+def check(module: str, budget_ms: float, repeats: int):
+    runs = [measure(module) for _ in range(repeats)]
+    total = float(np.median([r["total_us"] for r in runs])) / 1e3
+    core = float(np.median([r["core_us"] for r in runs])) / 1e3
+    overhead = float(np.median([r["total_us"] - r["core_us"] for r in runs])) / 1e3
+    heavy = sorted({m.split(".")[0] for r in runs for m in r["modules"] if m.split(".")[0] in HEAVY_PACKAGES})
+    return {
+        "module": module,
+        "total_ms": total,
+        "core_ms": core,
+        "overhead_ms": overhead,
+        "budget_ms": budget_ms,
+        "heavy_imports": heavy,
+        "ok": overhead <= budget_ms and not heavy
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check cold import times against per-module budgets.")
+    parser.add_argument("--modules", nargs="+", choices=list(BUDGETS), default=list(BUDGETS))
+    parser.add_argument("--repeats", type=int, default=5, help="Cold imports per module (median is used)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every budget (slow machines, CI)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = [check(m, BUDGETS[m] * args.scale, args.repeats) for m in args.modules]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        width = max(len(r["module"]) for r in results)
+        print(f"{'Module':<{width}}  {'Total ms':>8}  {'cv2+np ms':>9}  {'Own ms':>7}  {'Budget':>6}  Status")
+        for r in results:
+            status = "ok" if r["ok"] else ("HEAVY " + ",".join(r["heavy_imports"]) if r["heavy_imports"] else "OVER")
+            print(f"{r['module']:<{width}}  {r['total_ms']:>8.1f}  {r['core_ms']:>9.1f}  "
+                  f"{r['overhead_ms']:>7.1f}  {r['budget_ms']:>6.0f}  {status}")
+
+    failed = [r["module"] for r in results if not r["ok"]]
+    if failed:
+        print(f"{len(failed)} module(s) over budget: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
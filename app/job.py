@@ -0,0 +1,71 @@
+"""Resumable, memory-bounded pair comparison job (JSON Lines store with a checkpoint).
+
+Pairs are read lazily, compared across a process pool and appended to the output as they finish,
+so memory stays flat for any number of pairs. Re-running the same command after an interruption
+resumes where it stopped: pairs already in the output are skipped.
+
+Examples:
+    python app/job.py --dir images/ --output results.jsonl
+    python app/job.py --manifest pairs.csv --algo SIFT --output results.jsonl --inliers
+    python app/job.py --manifest pairs.csv --output results.jsonl --restart
+"""
+import argparse
+import json
+import sys
+
+from services.detector_registry import available_detectors
+from services.job_runner import JobRunner, ResultStore, directory_pairs, manifest_pairs
+from services.matcher import VERIFICATION_METHODS
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resumable batch image pair comparison.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", help="Compare every pair of images in this directory")
+    source.add_argument("--manifest", help="CSV/TSV file with one 'image_a,image_b' pair per line")
+    parser.add_argument("--output", required=True, help="Append-only .jsonl result store")
+    parser.add_argument("--algo", choices=available_detectors(), default="ORB")
+    parser.add_argument("--n-features", type=int, default=2000, help="Max keypoints (ORB only)")
+    parser.add_argument("--verification", choices=list(VERIFICATION_METHODS), default="ransac")
+    parser.add_argument("--no-ratio-test", action="store_true", help="Use the distance threshold instead (binary only)")
+    parser.add_argument("--ratio-threshold", type=float, default=0.75)
+    parser.add_argument("--inliers", action="store_true", help="Store packed inlier (query, train) indices per pair")
+    parser.add_argument("--workers", type=int, default=None, help="Process count (default: all cores)")
+    parser.add_argument("--feature-cache", type=int, default=64, help="Images whose features each worker keeps")
+    parser.add_argument("--checkpoint-every", type=int, default=1000, help="Records between checkpoints")
+    parser.add_argument("--restart", action="store_true", help="Discard an existing output and start over")
+    parser.add_argument("--no-retry-errors", action="store_true",
+                        help="On resume, treat pairs that failed as done instead of computing them again")
+    args = parser.parse_args(argv)
+
+    runner = JobRunner(
+        algo=args.algo,
+        n_features=args.n_features,
+        verification=args.verification,
+        workers=args.workers,
+        ratio_test=not args.no_ratio_test,
+        ratio_threshold=args.ratio_threshold,
+        store_inliers=args.inliers,
+        feature_cache_entries=args.feature_cache
+    )
+    try:
+        store = ResultStore(args.output, job=runner.job(), checkpoint_every=args.checkpoint_every,
+                            restart=args.restart, retry_errors=not args.no_retry_errors)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if store.resumed or store.failed:
+        print(f"Resuming: {store.resumed} pairs already done, {store.failed} failed pairs to retry", file=sys.stderr)
+
+    pairs = directory_pairs(args.dir) if args.dir else manifest_pairs(args.manifest)
+    finished = False
+    try:
+        summary = runner.run(pairs, store, progress=lambda done, n, t: print(
+            f"  {done} done ({n / t:.1f} pairs/s this run)", file=sys.stderr))
+        finished = True
+    finally:
+        store.close(finished=finished)
+    print(json.dumps(summary), file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,357 @@
+"""Async HTTP API over the extraction, matching and similarity services (standard library only).
+
+Endpoints (JSON bodies, images base64-encoded):
+    POST /extract     {"image": ..., "algo": "ORB", "n_features": 2000, "include_keypoints": false}
+    POST /match       {"image_a": ..., "image_b": ..., "algo": "ORB", "ratio_test": true, "ratio_threshold": 0.75}
+    POST /similarity  same body as /match, returns MetricsService stats
+    GET  /metrics     Prometheus text format latency histograms per stage and counters
+    GET  /traces      Most recent per-request trace records (?limit=N)
+    GET  /health
+
+CPU work runs in a bounded thread pool sharing pre-warmed detector and matcher instances
+(services.instance_pool), so the event loop never blocks. When more than --max-pending requests are in flight
+new ones get 503 immediately. Requests arriving within --batch-window are grouped into
+micro-batches; identical work inside a batch (same image and settings) is computed once and the
+distinct requests run on separate worker threads.
+
+Example:
+    python app/server.py --port 8080 --workers 4
+    curl -s localhost:8080/health
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import cv2
+
+from services.detector_registry import available_detectors, detector_class
+from services.instance_pool import InstancePool, threads_per_worker
+from services.metrics import MetricsService
+from utils.image_utils import ImageUtils
+from utils.instrumentation import instrumentation
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+MAX_FEATURES = 20000
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class MicroBatcher:
+    """Collect requests for a short window, deduplicate them and run the distinct ones in parallel."""
+
+    def __init__(self, fn, executor, max_batch: int = 4, window: float = 0.002):
+        self.fn = fn
+        self.executor = executor
+        self.max_batch = max_batch
+        self.window = window
+        self.queue = None
+
+    async def submit(self, key, payload):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((key, payload, future, time.perf_counter()))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            # Dispatch without waiting so the next batch can be collected meanwhile
+            loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        loop = asyncio.get_running_loop()
+        # Identical requests in the same batch share one computation; distinct ones are separate
+        # executor tasks so a batch spreads over the idle workers
+        pending = {}
+        for key, payload, _, queued_at in batch:
+            if key not in pending:
+                try:
+                    pending[key] = loop.run_in_executor(self.executor, self.fn, payload, queued_at)
+                except Exception as exc:  # executor shut down, etc.
+                    pending[key] = loop.create_future()
+                    pending[key].set_exception(exc)
+        results = dict(zip(pending, await asyncio.gather(*pending.values(), return_exceptions=True)))
+        for key, _, future, _ in batch:
+            if future.done():
+                continue
+            if isinstance(results[key], BaseException):
+                future.set_exception(results[key])
+            else:
+                future.set_result(results[key])
+
+class MatchingServer:
+    def __init__(self, workers: int = None, max_pending: int = None, batch_window: float = 0.002,
+                 max_batch: int = 4, warm_configs=(("ORB", 2000), ("SIFT", None))):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 4
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="visionmatch")
+        self.pool = InstancePool(workers=self.workers)
+        self.warm_configs = warm_configs
+        self.in_flight = 0
+        self.rejected = 0
+        self.batchers = {
+            "/extract": MicroBatcher(self._extract, self.executor, max_batch, batch_window),
+            "/match": MicroBatcher(self._match, self.executor, max_batch, batch_window),
+            "/similarity": MicroBatcher(self._similarity, self.executor, max_batch, batch_window),
+        }
+
+    # --- CPU work (runs on executor threads) ---
+
+    def _decode(self, data: str, name: str):
+        try:
+            raw = base64.b64decode(data, validate=True)
+        except (TypeError, ValueError):
+            raise HttpError(400, f"'{name}' must be base64-encoded image data")
+        img = ImageUtils.load_image(raw)
+        if img is None:
+            raise HttpError(400, f"'{name}' could not be decoded as an image")
+        return img
+
+    def _features(self, body, img):
+        return self.pool.detector(body["algo"], body["n_features"]).detect_and_compute(img)
+
+    def _extract(self, body, queued_at):
+        with instrumentation.trace("extract", algo=body["algo"]):
+            instrumentation.observe("queue_wait", time.perf_counter() - queued_at, queued_at)
+            res = self._features(body, self._decode(body.get("image"), "image"))
+        out = {
+            "count": res["count"],
+            "descriptor_type": res["descriptor_type"],
+            "descriptor_size": res["descriptor_size"],
+            "extraction_time": res["extraction_time"]
+        }
+        if body.get("include_keypoints"):
+            out["keypoints"] = [[k.pt[0], k.pt[1], k.size, k.angle, k.response] for k in res["keypoints"]]
+        return out
+
+    def _pair(self, body, queued_at):
+        instrumentation.observe("queue_wait", time.perf_counter() - queued_at, queued_at)
+        res_a = self._features(body, self._decode(body.get("image_a"), "image_a"))
+        res_b = self._features(body, self._decode(body.get("image_b"), "image_b"))
+        match_results = self.pool.matcher(body["algo"]).match(
+            res_a["keypoints"], res_a["descriptors"],
+            res_b["keypoints"], res_b["descriptors"],
+            ratio_test=body["ratio_test"],
+            ratio_threshold=body["ratio_threshold"]
+        )
+        return res_a, res_b, match_results
+
+    def _match(self, body, queued_at):
+        with instrumentation.trace("match", algo=body["algo"]):
+            res_a, res_b, match_results = self._pair(body, queued_at)
+        homography = match_results["homography"]
+        return {
+            "keypoints_a": res_a["count"],
+            "keypoints_b": res_b["count"],
+            "raw_matches": len(match_results["raw_matches"]),
+            "inlier_matches": len(match_results["inlier_matches"]),
+            "inlier_ratio": match_results["inlier_ratio"],
+            "homography": homography.tolist() if homography is not None else None,
+            "matching_time": match_results["matching_time"],
+            "ransac_time": match_results["ransac_time"]
+        }
+
+    def _similarity(self, body, queued_at):
+        with instrumentation.trace("similarity", algo=body["algo"]):
+            res_a, res_b, match_results = self._pair(body, queued_at)
+            stats = MetricsService.calculate_similarity_stats(
+                match_results["raw_matches"],
+                match_results["inlier_matches"],
+                res_a["count"], res_b["count"],
+                method=body["algo"]
+            )
+        return {k: (v if isinstance(v, str) else float(v)) for k, v in stats.items()}
+
+    # --- HTTP plumbing (event loop) ---
+
+    @staticmethod
+    def _normalize(body: dict) -> dict:
+        algo = str(body.get("algo", "ORB")).upper()
+        detectors = available_detectors()
+        if algo not in detectors:
+            raise HttpError(400, f"algo must be one of: {', '.join(detectors)}")
+        body["algo"] = algo
+        if detector_class(algo).has_budget:
+            # Each distinct value becomes a pooled detector: only accept a sane range
+            try:
+                n_features = int(body.get("n_features") or 2000)
+            except (TypeError, ValueError):
+                n_features = 0
+            if not 1 <= n_features <= MAX_FEATURES:
+                raise HttpError(400, f"n_features must be an integer between 1 and {MAX_FEATURES}")
+            body["n_features"] = n_features
+        else:
+            body["n_features"] = None
+        ratio_test = body.get("ratio_test", True)
+        if not isinstance(ratio_test, bool):
+            raise HttpError(400, "ratio_test must be true or false")
+        body["ratio_test"] = ratio_test
+        ratio_threshold = body.get("ratio_threshold", 0.75)
+        # bool is an int subclass: reject it rather than reading true as 1.0
+        if isinstance(ratio_threshold, bool) or not isinstance(ratio_threshold, (int, float)) \
+                or not math.isfinite(ratio_threshold) or not 0 < ratio_threshold <= 1:
+            raise HttpError(400, "ratio_threshold must be a number in (0, 1]")
+        body["ratio_threshold"] = float(ratio_threshold)
+        return body
+
+    async def dispatch(self, method: str, path: str, raw_body: bytes, query: str = ""):
+        if method == "GET" and path == "/health":
+            return 200, "application/json", json.dumps({"status": "ok", "in_flight": self.in_flight})
+        if method == "GET" and path == "/metrics":
+            text = instrumentation.prometheus()
+            text += f"visionmatch_in_flight {self.in_flight}\nvisionmatch_rejected_total {self.rejected}\n"
+            return 200, "text/plain; version=0.0.4", text
+        if method == "GET" and path == "/traces":
+            try:
+                limit = int(parse_qs(query).get("limit", ["50"])[0])
+            except ValueError:
+                raise HttpError(400, "limit must be an integer")
+            traces = list(instrumentation.traces)[-limit:] if limit > 0 else []
+            return 200, "application/json", json.dumps(traces, default=str)
+        if path not in self.batchers:
+            raise HttpError(404, f"No route for {path}")
+        if method != "POST":
+            raise HttpError(405, f"{path} only accepts POST")
+
+        # Backpressure: refuse instead of queueing without bound
+        if self.in_flight >= self.max_pending:
+            self.rejected += 1
+            raise HttpError(503, "Server busy, retry later")
+
+        try:
+            body = self._normalize(json.loads(raw_body or b"{}"))
+        except (ValueError, AttributeError):
+            raise HttpError(400, "Body must be a JSON object")
+
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            key = hashlib.blake2b(path.encode() + raw_body, digest_size=16).digest()
+            result = await self.batchers[path].submit(key, body)
+        finally:
+            self.in_flight -= 1
+            instrumentation.observe(f"request{path.replace('/', '_')}", time.perf_counter() - start, start)
+        return 200, "application/json", json.dumps(result)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, "application/json", json.dumps({"error": "Bad request line"}), False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # The body's extent is unknown, so the connection cannot be reused
+                    await self._respond(writer, 400, "application/json", json.dumps({"error": "Invalid Content-Length"}), False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, "application/json", json.dumps({"error": "Body too large"}), False)
+                    break
+                raw_body = await reader.readexactly(length) if length else b""
+
+                try:
+                    url = urlsplit(target)
+                    status, content_type, payload = await self.dispatch(method.upper(), url.path, raw_body, url.query)
+                except HttpError as exc:
+                    status, content_type, payload = exc.status, "application/json", json.dumps({"error": str(exc)})
+                except Exception as exc:
+                    status, content_type, payload = 500, "application/json", json.dumps({"error": repr(exc)})
+                await self._respond(writer, status, content_type, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, content_type, payload, keep_alive):
+        reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                   413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+        body = payload.encode("utf-8")
+        head = [
+            f"HTTP/1.1 {status} {reasons.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        if status == 503:
+            head.append("Retry-After: 1")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8080, ready: asyncio.Event = None):
+        # OpenCV's own thread pool would oversubscribe the cores our executor already uses
+        cv2.setNumThreads(threads_per_worker(self.workers))
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.pool.warm, self.executor, self.workers, self.warm_configs)
+        batch_tasks = [loop.create_task(b.run()) for b in self.batchers.values()]
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        self.port = server.sockets[0].getsockname()[1]
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in batch_tasks:
+                task.cancel()
+            self.executor.shutdown(wait=False)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="VisionMatch HTTP matching service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=None, help="CPU worker threads (default: all cores)")
+    parser.add_argument("--max-pending", type=int, default=None, help="In-flight requests before 503 (default: 4 x workers)")
+    parser.add_argument("--batch-window", type=float, default=0.002, help="Micro-batch collection window in seconds")
+    parser.add_argument("--max-batch", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    server = MatchingServer(workers=args.workers, max_pending=args.max_pending,
+                            batch_window=args.batch_window, max_batch=args.max_batch)
+    print(f"Serving on http://{args.host}:{args.port} with {server.workers} workers")
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import cv2
+
+from services.detector_service import DetectorService
+
+class AKAZEService(DetectorService):
+    name = "AKAZE"
+    binary = True
+    distance_scale = 114.0  # ORB's 60/256 bits scaled to the 486-bit MLDB descriptor
+
+    def __init__(self, threshold: float = 0.001, cache=None, **options):
+        super().__init__(cache=cache, **options)
+        self.threshold = threshold
+
+    @staticmethod
+    def available() -> bool:
+        return hasattr(cv2, "AKAZE_create") or hasattr(getattr(cv2, "xfeatures2d", None), "AKAZE_create")
+
+    def _create_detector(self):
+        # OpenCV 5 moved AKAZE to the contrib xfeatures2d module
+        create = getattr(cv2, "AKAZE_create", None) or cv2.xfeatures2d.AKAZE_create
+        return create(threshold=self.threshold)
+
+    def params(self) -> dict:
+        return {**super().params(), "threshold": self.threshold}
@@ -0,0 +1,25 @@
+import cv2
+
+from services.detector_service import DetectorService
+
+class BRISKService(DetectorService):
+    name = "BRISK"
+    binary = True
+    distance_scale = 120.0  # ORB's 60/256 bits scaled to the 512-bit descriptor
+
+    def __init__(self, threshold: int = 30, octaves: int = 3, cache=None, **options):
+        super().__init__(cache=cache, **options)
+        self.threshold = threshold
+        self.octaves = octaves
+
+    @staticmethod
+    def available() -> bool:
+        return hasattr(cv2, "BRISK_create") or hasattr(getattr(cv2, "xfeatures2d", None), "BRISK_create")
+
+    def _create_detector(self):
+        # OpenCV 5 moved BRISK to the contrib xfeatures2d module
+        create = getattr(cv2, "BRISK_create", None) or cv2.xfeatures2d.BRISK_create
+        return create(thresh=self.threshold, octaves=self.octaves)
+
+    def params(self) -> dict:
+        return {**super().params(), "threshold": self.threshold, "octaves": self.octaves}
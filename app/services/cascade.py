@@ -0,0 +1,125 @@
+import time
+
+import cv2
+import numpy as np
+
+from services.detector_registry import create_detector, is_binary
+from services.orb_service import ORBService
+from services.matcher import MatcherService
+from services.metrics import MetricsService
+
+DEFAULT_THRESHOLDS = {
+    # Stage 1: global signature (difference hash + colour histogram)
+    "signature_high_max_hash_distance": 4,     # near-identical layout ...
+    "signature_high_min_hist_corr": 0.95,      # ... and colours -> High similarity
+    # Colour/layout alone cannot tell two photos of the same scene apart from unrelated images,
+    # so the signature Low exit is off by default. Enable it for strict near-duplicate workloads,
+    # e.g. {"signature_low_max_hist_corr": 0.1, "signature_low_min_hash_distance": 24}.
+    "signature_low_max_hist_corr": None,       # different colours ...
+    "signature_low_min_hash_distance": 24,     # ... and layout -> Low similarity
+    # Stage 2: small-budget ORB + RANSAC
+    "quick_low_max_inliers": 6,                # too few verified matches -> Low similarity
+    "quick_high_min_confidence": 85.0,         # already convincing -> High similarity
+}
+
+class CascadeService:
+    """Staged similarity check that stops as soon as a stage is decisive.
+
+    1. Global signature: 64-bit difference hash and HSV histogram correlation.
+    2. Quick ORB pass: small keypoint budget at reduced resolution, matched with RANSAC.
+    3. Full pass: the configured detector plus MatcherService RANSAC and MetricsService stats.
+    """
+
+    def __init__(self, detector=None, method="ORB", quick_n_features: int = 300,
+                 quick_long_edge: int = 640, thresholds: dict = None):
+        self.method = method.upper()
+        if detector is not None and detector.binary != is_binary(self.method):
+            raise ValueError(f"{detector.name} descriptors cannot be matched as {self.method}; "
+                             f"pass method='{detector.name}' or a matching detector")
+        self.detector = detector or create_detector(self.method)
+        self.matcher = MatcherService(method=self.method)
+        self.quick_detector = ORBService(n_features=quick_n_features, max_long_edge=quick_long_edge)
+        self.quick_matcher = MatcherService(method="ORB")
+        self.thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+
+    @staticmethod
+    def signature(img: np.ndarray) -> dict:
+        """Cheap global signature: difference hash plus a normalized HSV histogram."""
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        dhash = np.packbits(small[:, 1:] > small[:, :-1])
+
+        color = img if img.ndim == 3 else cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        thumb = cv2.resize(color, (64, 64), interpolation=cv2.INTER_AREA)
+        hsv = cv2.cvtColor(thumb, cv2.COLOR_BGR2HSV)
+        hist = cv2.calcHist([hsv], [0, 1], None, [16, 8], [0, 180, 0, 256])
+        cv2.normalize(hist, hist)
+        return {"dhash": dhash, "hist": hist}
+
+    def compare(self, img_a: np.ndarray, img_b: np.ndarray, ratio_test=True, ratio_threshold=0.75):
+        """Return the verdict, the stage that decided it and per-stage timings."""
+        t = self.thresholds
+        stage_times = {}
+
+        # Stage 1: global signature
+        start = time.perf_counter()
+        sig_a, sig_b = self.signature(img_a), self.signature(img_b)
+        hash_distance = int(np.unpackbits(sig_a["dhash"] ^ sig_b["dhash"]).sum())
+        hist_corr = float(cv2.compareHist(sig_a["hist"], sig_b["hist"], cv2.HISTCMP_CORREL))
+        stage_times["signature"] = time.perf_counter() - start
+        signature = {"hash_distance": hash_distance, "hist_correlation": hist_corr}
+
+        if hash_distance <= t["signature_high_max_hash_distance"] and hist_corr >= t["signature_high_min_hist_corr"]:
+            return self._result("High similarity", "signature", stage_times, signature)
+        if (t["signature_low_max_hist_corr"] is not None and hist_corr <= t["signature_low_max_hist_corr"]
+                and hash_distance >= t["signature_low_min_hash_distance"]):
+            return self._result("Low similarity", "signature", stage_times, signature)
+
+        # Stage 2: small-budget ORB
+        start = time.perf_counter()
+        quick_stats = self._match(self.quick_detector, self.quick_matcher, "ORB", img_a, img_b,
+                                  ratio_test, ratio_threshold)[0]
+        stage_times["quick_orb"] = time.perf_counter() - start
+
+        if quick_stats["num_inliers"] <= t["quick_low_max_inliers"]:
+            return self._result("Low similarity", "quick_orb", stage_times, signature, quick_stats)
+        if quick_stats["confidence_score"] >= t["quick_high_min_confidence"]:
+            return self._result("High similarity", "quick_orb", stage_times, signature, quick_stats)
+
+        # Stage 3: full detector + RANSAC
+        start = time.perf_counter()
+        stats, match_results = self._match(self.detector, self.matcher, self.method, img_a, img_b,
+                                           ratio_test, ratio_threshold)
+        stage_times["full"] = time.perf_counter() - start
+        result = self._result(stats["verdict"], "full", stage_times, signature, stats)
+        result["match_results"] = match_results
+        return result
+
+    @staticmethod
+    def _match(detector, matcher, method, img_a, img_b, ratio_test, ratio_threshold):
+        res_a = detector.detect_and_compute(img_a)
+        res_b = detector.detect_and_compute(img_b)
+        match_results = matcher.match(
+            res_a["keypoints"], res_a["descriptors"],
+            res_b["keypoints"], res_b["descriptors"],
+            ratio_test=ratio_test,
+            ratio_threshold=ratio_threshold
+        )
+        stats = MetricsService.calculate_similarity_stats(
+            match_results["raw_matches"],
+            match_results["inlier_matches"],
+            res_a["count"], res_b["count"],
+            method=method
+        )
+        return stats, match_results
+
+    @staticmethod
+    def _result(verdict, decided_by, stage_times, signature, stats=None):
+        return {
+            "verdict": verdict,
+            "decided_by": decided_by,
+            "stage_times": stage_times,
+            "total_time": sum(stage_times.values()),
+            "signature": signature,
+            "stats": stats
+        }
@@ -0,0 +1,73 @@
+import time
+
+from services.detector_registry import create_detector
+from services.matcher import MatcherService
+from services.metrics import MetricsService
+
+class CoarseToFineMatcher:
+    """Match at a reduced working resolution first; refine at full resolution only when borderline.
+
+    Keypoints from the coarse pass are already mapped back to the original frame, so a decisive
+    coarse result (confidence outside `borderline`) is returned as-is, homography included.
+
+    With `guided_radius` set, the fine pass uses the coarse homography (when there is one) as a
+    prior and only matches keypoints within that many pixels of their predicted position.
+    """
+
+    def __init__(self, method="ORB", n_features: int = 2000, coarse_long_edge: int = 800,
+                 fine_long_edge: int = None, borderline=(35.0, 80.0), cache=None, guided_radius: float = None):
+        self.method = method.upper()
+        self.borderline = borderline
+        self.guided_radius = guided_radius
+        self.coarse = self._detector(n_features, coarse_long_edge, cache)
+        self.fine = self._detector(n_features, fine_long_edge, cache)
+        self.matcher = MatcherService(method=self.method)
+
+    def _detector(self, n_features, long_edge, cache):
+        return create_detector(self.method, n_features=n_features, cache=cache, max_long_edge=long_edge)
+
+    def _run(self, detector, img_a, img_b, ratio_test, ratio_threshold, prior=None):
+        res_a = detector.detect_and_compute(img_a)
+        res_b = detector.detect_and_compute(img_b)
+        if prior is not None and self.guided_radius:
+            match_results = self.matcher.guided_match(
+                res_a["keypoints"], res_a["descriptors"],
+                res_b["keypoints"], res_b["descriptors"],
+                prior, radius=self.guided_radius,
+                ratio_test=ratio_test,
+                ratio_threshold=ratio_threshold
+            )
+        else:
+            match_results = self.matcher.match(
+                res_a["keypoints"], res_a["descriptors"],
+                res_b["keypoints"], res_b["descriptors"],
+                ratio_test=ratio_test,
+                ratio_threshold=ratio_threshold
+            )
+        stats = MetricsService.calculate_similarity_stats(
+            match_results["raw_matches"],
+            match_results["inlier_matches"],
+            res_a["count"], res_b["count"],
+            method=self.method
+        )
+        return {"res_a": res_a, "res_b": res_b, "match_results": match_results, "stats": stats}
+
+    def compare(self, img_a, img_b, ratio_test=True, ratio_threshold=0.75):
+        """Run the coarse pass and, if its confidence is borderline, the full-resolution pass."""
+        start = time.perf_counter()
+        result = self._run(self.coarse, img_a, img_b, ratio_test, ratio_threshold)
+        coarse_time = time.perf_counter() - start
+
+        low, high = self.borderline
+        confidence = result["stats"]["confidence_score"]
+        if low <= confidence < high:
+            start = time.perf_counter()
+            coarse_stats = result["stats"]
+            prior = result["match_results"]["homography"]
+            result = self._run(self.fine, img_a, img_b, ratio_test, ratio_threshold, prior=prior)
+            result.update(stage="fine", coarse_stats=coarse_stats, fine_time=time.perf_counter() - start)
+        else:
+            result.update(stage="coarse", coarse_stats=result["stats"], fine_time=0.0)
+
+        result["coarse_time"] = coarse_time
+        return result
@@ -0,0 +1,165 @@
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from services.detector_registry import is_binary
+from services.match_set import MatchSet
+from services.matcher import MatcherService, POPCOUNT_LUT
+from services.metrics import MetricsService
+
+class CrossMatcher:
+    """Many-to-many matching over a set of images with mutual nearest-neighbour checks.
+
+    Binary descriptors use OpenCV's Hamming k-NN a->b, then b->a only for the descriptors that
+    ratio-tested matches point to. SIFT uses blocked BLAS
+    L2 distances via |a|^2 + |b|^2 - 2ab, where each unordered pair is computed once: the same
+    distance blocks give the nearest neighbours in both directions (row and column minima).
+    Only mutual, ratio-tested matches are kept before MatcherService verification.
+    """
+
+    def __init__(self, method="ORB", ratio_threshold: float = 0.75, block_size: int = 1024,
+                 min_inliers: int = 15, workers: int = None, matcher: MatcherService = None):
+        self.method = method.upper()
+        self.ratio_threshold = ratio_threshold
+        self.block_size = block_size
+        self.min_inliers = min_inliers
+        self.workers = workers or os.cpu_count() or 1
+        self.matcher = matcher or MatcherService(method=self.method)
+
+    def distance_block(self, des_a: np.ndarray, des_b: np.ndarray) -> np.ndarray:
+        """Dense (len(des_a), len(des_b)) float32 distance matrix."""
+        if is_binary(self.method):
+            if des_a.shape[1] % 8 == 0 and hasattr(np, "bitwise_count"):
+                a, b = des_a.view(np.uint64), des_b.view(np.uint64)
+                bits = np.bitwise_count(a[:, None, :] ^ b[None, :, :])
+            else:
+                bits = POPCOUNT_LUT[des_a[:, None, :] ^ des_b[None, :, :]]
+            return bits.sum(axis=2, dtype=np.int32).astype(np.float32)
+
+        a = des_a.astype(np.float32, copy=False)
+        b = des_b.astype(np.float32, copy=False)
+        sq = (a * a).sum(axis=1)[:, None] + (b * b).sum(axis=1)[None, :] - 2.0 * (a @ b.T)
+        np.maximum(sq, 0.0, out=sq)
+        return np.sqrt(sq, out=sq)
+
+    @staticmethod
+    def _merge_top2(best_d, best_i, block, offset):
+        """Fold a block's two smallest entries per row into the running top-2."""
+        k = min(2, block.shape[1])
+        part = np.argpartition(block, k - 1, axis=1)[:, :k] if block.shape[1] > k else \
+            np.tile(np.arange(block.shape[1]), (block.shape[0], 1))
+        cand_d = np.concatenate([best_d, np.take_along_axis(block, part, axis=1)], axis=1)
+        cand_i = np.concatenate([best_i, part + offset], axis=1)
+        order = np.argsort(cand_d, axis=1, kind="stable")[:, :2]
+        return np.take_along_axis(cand_d, order, axis=1), np.take_along_axis(cand_i, order, axis=1)
+
+    def mutual_matches(self, des_a: np.ndarray, des_b: np.ndarray) -> MatchSet:
+        """Ratio-tested matches a->b that are also each other's nearest neighbour b->a."""
+        n_a, n_b = len(des_a), len(des_b)
+        if is_binary(self.method):
+            # OpenCV's Hamming kernel is several times faster than a NumPy popcount over the XOR
+            # cube, so binary descriptors use k-NN passes; NumPy only does the mutual check
+            row_d, row_i = self.matcher.knn(des_a, des_b, k=2)
+            if row_d.shape[1] < 2:
+                return MatchSet.empty()
+            query = np.flatnonzero(row_d[:, 0] < self.ratio_threshold * row_d[:, 1])
+            if len(query) == 0:
+                return MatchSet.empty()
+            train = row_i[query, 0]
+            # The reverse pass only needs the b descriptors that some ratio-tested match points to
+            targets, inverse = np.unique(train, return_inverse=True)
+            _, back = self.matcher.knn(des_b[targets], des_a, k=1)
+            keep = back[inverse.ravel(), 0] == query
+            return MatchSet(query[keep], train[keep], row_d[query[keep], 0]).sorted()
+
+        row_d = np.full((n_a, 2), np.inf, dtype=np.float32)
+        row_i = np.full((n_a, 2), -1, dtype=np.int64)
+        col_d = np.full((n_b, 2), np.inf, dtype=np.float32)
+        col_i = np.full((n_b, 2), -1, dtype=np.int64)
+
+        bs = self.block_size
+        for r0 in range(0, n_a, bs):
+            for c0 in range(0, n_b, bs):
+                block = self.distance_block(des_a[r0:r0 + bs], des_b[c0:c0 + bs])
+                row_d[r0:r0 + bs], row_i[r0:r0 + bs] = self._merge_top2(row_d[r0:r0 + bs], row_i[r0:r0 + bs], block, c0)
+                col_d[c0:c0 + bs], col_i[c0:c0 + bs] = self._merge_top2(col_d[c0:c0 + bs], col_i[c0:c0 + bs], block.T, r0)
+
+        query = np.arange(n_a)
+        train = row_i[:, 0]
+        keep = (row_d[:, 0] < self.ratio_threshold * row_d[:, 1]) & (col_i[train, 0] == query)
+        return MatchSet(query[keep], train[keep], row_d[keep, 0]).sorted()
+
+    def match_pair(self, feat_a: dict, feat_b: dict):
+        """Match and verify one pair; returns (match_results, stats)."""
+        start = time.perf_counter()
+        raw_matches = self.mutual_matches(feat_a["descriptors"], feat_b["descriptors"])
+        matching_time = time.perf_counter() - start
+
+        verification = self.matcher.verify(feat_a["keypoints"], feat_b["keypoints"], raw_matches)
+        match_results = {"raw_matches": raw_matches, "matching_time": matching_time, **verification}
+        stats = MetricsService.calculate_similarity_stats(
+            raw_matches, verification["inlier_matches"],
+            feat_a["count"], feat_b["count"],
+            method=self.method
+        )
+        return match_results, stats
+
+    def run(self, features: dict):
+        """Cross-match every pair of images.
+
+        `features` maps image id -> detect_and_compute() result (keypoints may be packed arrays).
+        Returns the similarity graph edges (pairs with at least `min_inliers` inliers) with
+        MetricsService stats, and near-duplicate groups as connected components.
+        """
+        ids = [i for i, f in features.items() if f["descriptors"] is not None and len(f["descriptors"]) >= 4]
+        pairs = list(itertools.combinations(ids, 2))
+
+        def work(pair):
+            a, b = pair
+            match_results, stats = self.match_pair(features[a], features[b])
+            return a, b, match_results, stats
+
+        start = time.perf_counter()
+        edges = []
+        # NumPy's matmul/XOR kernels release the GIL, so threads run pairs in parallel
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for a, b, match_results, stats in pool.map(work, pairs):
+                if stats["num_inliers"] >= self.min_inliers:
+                    homography = match_results["homography"]
+                    edges.append({
+                        "image_a": a,
+                        "image_b": b,
+                        "stats": stats,
+                        "homography": homography.tolist() if homography is not None else None
+                    })
+
+        return {
+            "edges": edges,
+            "groups": self.connected_components(ids, edges),
+            "pairs_compared": len(pairs),
+            "total_time": time.perf_counter() - start
+        }
+
+    @staticmethod
+    def connected_components(ids, edges):
+        """Union-find grouping of the similarity graph; singletons are omitted."""
+        parent = {i: i for i in ids}
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for edge in edges:
+            ra, rb = find(edge["image_a"]), find(edge["image_b"])
+            if ra != rb:
+                parent[rb] = ra
+
+        groups = {}
+        for i in ids:
+            groups.setdefault(find(i), []).append(i)
+        return sorted((sorted(g) for g in groups.values() if len(g) > 1), key=len, reverse=True)
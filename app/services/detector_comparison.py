@@ -0,0 +1,133 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from services.detector_registry import available_detectors
+from services.instance_pool import InstancePool, opencv_threads, threads_per_worker
+from services.metrics import MetricsService
+from utils.image_utils import ImageUtils
+
+# (label, method, n_features) run by default; detectors missing from the OpenCV build are skipped
+DEFAULT_CONFIGS = [
+    ("ORB-500", "ORB", 500),
+    ("ORB-1000", "ORB", 1000),
+    ("ORB-2000", "ORB", 2000),
+    ("ORB-5000", "ORB", 5000),
+    ("SIFT", "SIFT", None),
+    ("AKAZE", "AKAZE", None),
+    ("BRISK", "BRISK", None),
+]
+
+class DetectorComparison:
+    """Run several detector configurations on the same image pair in parallel threads.
+
+    Both images are converted to grayscale once; every configuration reads those same buffers
+    (DetectorService uses a 2-D input as-is), and they are marked read-only so no configuration
+    can modify what the others see. OpenCV releases the GIL, so the threads run concurrently.
+    Detectors and matchers come from an InstancePool, so repeated comparisons reuse them.
+    """
+
+    def __init__(self, configs=None, workers: int = None, verification: str = "ransac",
+                 pool: InstancePool = None, **detector_options):
+        available = set(available_detectors())
+        self.configs = [c for c in (configs or DEFAULT_CONFIGS) if c[1].upper() in available]
+        self.workers = workers or len(self.configs) or 1
+        self.verification = verification
+        self.pool = pool or InstancePool(workers=self.workers)
+        self.detector_options = detector_options
+
+    @staticmethod
+    def shared_gray(img: np.ndarray) -> np.ndarray:
+        # A view shares the caller's buffer without changing its own flags
+        gray = img.view() if img.ndim == 2 else ImageUtils.to_grayscale(img)
+        gray.setflags(write=False)
+        return gray
+
+    def _run(self, config, gray_a, gray_b, ratio_test, ratio_threshold):
+        label, method, n_features = config
+        detector = self.pool.detector(method, n_features, **self.detector_options)
+        matcher = self.pool.matcher(method, verification=self.verification)
+        detector.detector  # build this thread's cv2 object outside the timed section
+        start = time.perf_counter()
+        res_a = detector.detect_and_compute(gray_a)
+        res_b = detector.detect_and_compute(gray_b)
+        match_results = matcher.match(
+            res_a["keypoints"], res_a["descriptors"],
+            res_b["keypoints"], res_b["descriptors"],
+            ratio_test=ratio_test,
+            ratio_threshold=ratio_threshold
+        )
+        stats = MetricsService.calculate_similarity_stats(
+            match_results["raw_matches"],
+            match_results["inlier_matches"],
+            res_a["count"], res_b["count"],
+            method=method
+        )
+        descriptors = res_a["descriptors"]
+        return {
+            "label": label,
+            "method": method,
+            "keypoints_a": res_a["count"],
+            "keypoints_b": res_b["count"],
+            "descriptor_bytes": int(descriptors.shape[1] * descriptors.itemsize) if descriptors is not None else 0,
+            **stats,
+            "extraction_time_a": res_a["extraction_time"],
+            "extraction_time_b": res_b["extraction_time"],
+            "matching_time": match_results["matching_time"],
+            "ransac_time": match_results["ransac_time"],
+            "total_time": time.perf_counter() - start
+        }
+
+    def compare(self, img_a: np.ndarray, img_b: np.ndarray, ratio_test=True, ratio_threshold=0.75,
+                isolated_timing=True):
+        """One row of stats and timings per configuration, in configuration order.
+
+        Configurations running side by side slow each other down, so with `isolated_timing` each
+        one is then re-run alone and its row carries those timings (the concurrent figure is kept
+        as `parallel_total_time`); `wall_time` covers the parallel run only.
+        """
+        start = time.perf_counter()
+        gray_a, gray_b = self.shared_gray(img_a), self.shared_gray(img_b)
+        preprocess_time = time.perf_counter() - start
+
+        with opencv_threads(threads_per_worker(self.workers)), ThreadPoolExecutor(max_workers=self.workers) as pool:
+            rows = list(pool.map(lambda c: self._run(c, gray_a, gray_b, ratio_test, ratio_threshold), self.configs))
+        wall_time = time.perf_counter() - start
+
+        if isolated_timing:
+            timing_keys = ("extraction_time_a", "extraction_time_b", "matching_time", "ransac_time", "total_time")
+            for row, config in zip(rows, self.configs):
+                alone = self._run(config, gray_a, gray_b, ratio_test, ratio_threshold)
+                row["parallel_total_time"] = row["total_time"]
+                row.update({key: alone[key] for key in timing_keys})
+        return {"rows": rows, "preprocess_time": preprocess_time, "wall_time": wall_time}
+
+    @staticmethod
+    def cheapest(rows, min_confidence: float = 80.0, min_inliers: int = 0):
+        """Fastest configuration by `total_time` that still meets the accuracy bar, or None."""
+        passing = [r for r in rows if r["confidence_score"] >= min_confidence and r["num_inliers"] >= min_inliers]
+        return min(passing, key=lambda r: r["total_time"]) if passing else None
+
+    @staticmethod
+    def table(rows) -> str:
+        """Plain-text side-by-side table of the comparison rows."""
+        columns = [
+            ("Detector", "label", "{}"), ("Kp A", "keypoints_a", "{}"), ("Kp B", "keypoints_b", "{}"),
+            ("Matches", "num_matches", "{}"), ("Inliers", "num_inliers", "{}"),
+            ("Inlier %", "inlier_ratio", "{:.1f}"), ("Conf", "confidence_score", "{:.1f}"),
+            ("Extract ms", None, "{:.1f}"), ("Match ms", "matching_time", "{:.1f}"),
+            ("RANSAC ms", "ransac_time", "{:.1f}"), ("Total ms", "total_time", "{:.1f}"),
+            ("Verdict", "verdict", "{}")
+        ]
+        ms_keys = {"matching_time", "ransac_time", "total_time"}
+
+        def cell(row, key, fmt):
+            if key is None:
+                return fmt.format((row["extraction_time_a"] + row["extraction_time_b"]) * 1e3)
+            value = row[key] * 1e3 if key in ms_keys else row[key]
+            return fmt.format(value)
+
+        lines = [[title for title, _, _ in columns]] + [[cell(r, k, f) for _, k, f in columns] for r in rows]
+        widths = [max(len(line[i]) for line in lines) for i in range(len(columns))]
+        return "\n".join("  ".join(v.ljust(w) for v, w in zip(line, widths)).rstrip() for line in lines)
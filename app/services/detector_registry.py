@@ -0,0 +1,39 @@
+from services.orb_service import ORBService
+from services.sift_service import SIFTService
+from services.akaze_service import AKAZEService
+from services.brisk_service import BRISKService
+
+# Method name -> DetectorService subclass. Plug in another detector with register_detector().
+DETECTORS = {}
+
+def register_detector(cls):
+    """Make a DetectorService subclass available by its `name` (usable as a class decorator)."""
+    DETECTORS[cls.name.upper()] = cls
+    return cls
+
+for _cls in (ORBService, SIFTService, AKAZEService, BRISKService):
+    register_detector(_cls)
+
+def detector_class(method: str):
+    cls = DETECTORS.get(method.upper())
+    if cls is None:
+        raise ValueError(f"Unknown detector '{method}'. Choose from: {', '.join(DETECTORS)}")
+    return cls
+
+def available_detectors() -> list:
+    """Registered detectors that the installed OpenCV build provides."""
+    return [name for name, cls in DETECTORS.items() if getattr(cls, "available", lambda: True)()]
+
+def create_detector(method: str, n_features: int = None, **options):
+    """Instantiate a registered detector; `n_features` only applies to budgeted ones (ORB)."""
+    cls = detector_class(method)
+    if cls.has_budget and n_features is not None:
+        return cls(n_features=n_features, **options)
+    return cls(**options)
+
+def is_binary(method: str) -> bool:
+    """Whether the method's descriptors are binary strings (Hamming distance)."""
+    return detector_class(method).binary
+
+def distance_scale(method: str) -> float:
+    return detector_class(method).distance_scale
@@ -0,0 +1,246 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from utils.image_utils import ImageUtils
+from utils.instrumentation import instrumentation
+from utils.keypoint_utils import KeypointUtils
+
+class DetectorService:
+    """Shared detect-and-compute pipeline for the OpenCV feature detectors.
+
+    Subclasses set `name`, implement `_create_detector()` and describe their settings in `params()`.
+
+    With `tile_size` set, images larger than one tile are split into a grid of tiles, each padded
+    by `tile_overlap` pixels of context and extracted on its own thread. A keypoint is kept only by
+    the tile whose core (unpadded) cell contains it, which removes duplicates from the overlaps,
+    and `max_features_per_tile` caps each cell so features spread evenly over the image. Without
+    that cap, a detector with an `n_features` budget gives each cell an even share of it and the
+    merged result is trimmed back to the budget by response.
+
+    `max_long_edge` / `max_megapixels` set a working resolution: larger images are downscaled
+    before extraction and keypoint coordinates and sizes are mapped back to the original frame,
+    so homographies estimated downstream stay valid for the full-size image.
+
+    `mask` (non-zero = keep, image-sized) and `roi` boxes (x0, y0, x1, y1) restrict extraction to
+    regions of interest: the image is cropped to the boxes' bounding rectangle (a view, no copy),
+    several boxes and/or a mask become a detector mask inside it, and keypoints are returned in
+    full-image coordinates.
+
+    `binary` descriptors are matched with Hamming distance, float ones with L2; `distance_scale`
+    is the distance of a typical good match, used to normalise similarity scores.
+    """
+    name = None
+    binary = False
+    distance_scale = 300.0
+    has_budget = False  # whether the constructor takes an n_features keypoint budget
+
+    def __init__(self, cache=None, tile_size: int = None, tile_overlap: int = 64,
+                 max_features_per_tile: int = None, n_threads: int = None,
+                 max_long_edge: int = None, max_megapixels: float = None):
+        self.cache = cache
+        self.max_long_edge = max_long_edge
+        self.max_megapixels = max_megapixels
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.max_features_per_tile = max_features_per_tile
+        self.n_threads = n_threads or min(8, os.cpu_count() or 1)
+        self._local = threading.local()
+
+    def _create_detector(self):
+        raise NotImplementedError
+
+    @property
+    def detector(self):
+        # cv2 detectors are not safe to share between threads: one instance per thread
+        detector = getattr(self._local, "detector", None)
+        if detector is None:
+            detector = self._local.detector = self._create_detector()
+        return detector
+
+    def params(self) -> dict:
+        """Detector settings that influence the output (part of the feature cache key)."""
+        params = {"algorithm": self.name}
+        if self.tile_size:
+            params.update(tile_size=self.tile_size, tile_overlap=self.tile_overlap,
+                          max_features_per_tile=self.max_features_per_tile)
+        if self.max_long_edge or self.max_megapixels:
+            params.update(max_long_edge=self.max_long_edge, max_megapixels=self.max_megapixels)
+        return params
+
+    def working_scale(self, shape) -> float:
+        """Downscale factor (<= 1) that satisfies the working-resolution limits."""
+        h, w = shape[:2]
+        scale = 1.0
+        if self.max_long_edge:
+            scale = min(scale, self.max_long_edge / max(h, w))
+        if self.max_megapixels:
+            scale = min(scale, (self.max_megapixels * 1e6 / (h * w)) ** 0.5)
+        return scale
+
+    @staticmethod
+    def region(gray: np.ndarray, mask: np.ndarray = None, roi=None):
+        """Crop to the ROI boxes; returns (image view, detector mask or None, (x0, y0) offset)."""
+        if mask is not None:
+            if mask.shape[:2] != gray.shape[:2]:
+                raise ValueError(f"Mask shape {mask.shape[:2]} does not match image shape {gray.shape[:2]}")
+            mask = (mask if mask.ndim == 2 else mask[..., 0]) != 0
+        if roi is None:
+            return gray, (mask.astype(np.uint8) if mask is not None else None), (0, 0)
+
+        h, w = gray.shape[:2]
+        boxes = np.atleast_2d(np.asarray(roi, dtype=np.float64))
+        boxes = np.column_stack([
+            np.clip(np.floor(boxes[:, 0]), 0, w), np.clip(np.floor(boxes[:, 1]), 0, h),
+            np.clip(np.ceil(boxes[:, 2]), 0, w), np.clip(np.ceil(boxes[:, 3]), 0, h)
+        ]).astype(int)
+        boxes = boxes[(boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])]
+        if len(boxes) == 0:
+            return gray[:0, :0], None, (0, 0)
+
+        x0, y0 = boxes[:, :2].min(axis=0)
+        x1, y1 = boxes[:, 2:].max(axis=0)
+        crop = gray[y0:y1, x0:x1]
+        if len(boxes) == 1 and mask is None:
+            return crop, None, (x0, y0)
+        region_mask = np.zeros(crop.shape[:2], dtype=bool)
+        for bx0, by0, bx1, by1 in boxes:
+            region_mask[by0 - y0:by1 - y0, bx0 - x0:bx1 - x0] = True
+        if mask is not None:
+            region_mask &= mask[y0:y1, x0:x1]
+        return crop, region_mask.astype(np.uint8), (x0, y0)
+
+    def detect_and_compute(self, img: np.ndarray, mask: np.ndarray = None, roi=None):
+        """Detect keypoints and compute descriptors, serving repeat images from the feature cache.
+
+        `mask` and `roi` limit extraction to regions of interest (see the class docstring).
+        """
+        start_time = time.perf_counter()
+
+        cache_key = None
+        if self.cache is not None:
+            params = self.params()
+            if mask is not None:
+                params["mask"] = self.cache.make_key(np.ascontiguousarray(mask), {})
+            if roi is not None:
+                params["roi"] = np.atleast_2d(np.asarray(roi, dtype=np.float64)).tolist()
+            cache_key = self.cache.make_key(img, params)
+            with instrumentation.span("cache_lookup"):
+                cached = self.cache.get(cache_key)
+            if cached is not None:
+                instrumentation.count("feature_cache_hits")
+                packed, des = cached
+                return self._result(KeypointUtils.unpack(packed), des, packed, start_time, cache_hit=True)
+            instrumentation.count("feature_cache_misses")
+
+        # Ensure image is grayscale for detection
+        with instrumentation.span("grayscale"):
+            if len(img.shape) == 3:
+                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            else:
+                gray = img
+            gray, mask, (ox, oy) = self.region(gray, mask, roi)
+
+            scale = self.working_scale(gray.shape) if gray.size else 1.0
+            if scale < 1.0:
+                h, w = gray.shape[:2]
+                gray = ImageUtils.resize_image(gray, width=max(1, int(round(w * scale))))
+                if mask is not None:
+                    mask = cv2.resize(mask, (gray.shape[1], gray.shape[0]), interpolation=cv2.INTER_NEAREST)
+
+        with instrumentation.span(f"detect_{self.name.lower()}"):
+            if gray.size == 0:
+                kp, des = [], None
+            elif self.tile_size and max(gray.shape[:2]) > self.tile_size:
+                kp, des = self._detect_tiled(gray, mask)
+            else:
+                kp, des = self.detector.detectAndCompute(gray, mask)
+        instrumentation.count("keypoints_detected", len(kp))
+
+        if scale < 1.0 or ox or oy:
+            # Map back to the original frame (per axis, since the resized size is rounded)
+            sx, sy = (w / gray.shape[1], h / gray.shape[0]) if scale < 1.0 else (1.0, 1.0)
+            for k in kp:
+                k.pt = (k.pt[0] * sx + ox, k.pt[1] * sy + oy)
+                k.size *= (sx + sy) / 2
+        packed = KeypointUtils.pack(kp)
+
+        if cache_key is not None:
+            self.cache.put(cache_key, packed, des)
+
+        return self._result(kp, des, packed, start_time, cache_hit=False)
+
+    def tiles(self, shape):
+        """Yield (core, padded) boxes as (x0, y0, x1, y1) covering an image of the given shape."""
+        h, w = shape[:2]
+        step, pad = self.tile_size, self.tile_overlap
+        for y0 in range(0, h, step):
+            for x0 in range(0, w, step):
+                core = (x0, y0, min(x0 + step, w), min(y0 + step, h))
+                padded = (max(0, x0 - pad), max(0, y0 - pad), min(w, core[2] + pad), min(h, core[3] + pad))
+                yield core, padded
+
+    def _tile_cap(self, n_tiles: int):
+        """Keypoints each of `n_tiles` tiles may keep: max_features_per_tile, else a share of the budget."""
+        if self.max_features_per_tile or not self.has_budget:
+            return self.max_features_per_tile
+        return -(-self.n_features // n_tiles)
+
+    def _detect_tile(self, gray, mask, core, padded, cap=None):
+        px0, py0, px1, py1 = padded
+        tile_mask = mask[py0:py1, px0:px1] if mask is not None else None
+        if tile_mask is not None and not tile_mask.any():
+            return [], None
+        # Slicing gives a view: no per-tile copy of the image
+        kp, des = self.detector.detectAndCompute(gray[py0:py1, px0:px1], tile_mask)
+        if not kp:
+            return [], None
+
+        pts = cv2.KeyPoint_convert(kp).reshape(-1, 2) + (px0, py0)
+        cx0, cy0, cx1, cy1 = core
+        owned = (pts[:, 0] >= cx0) & (pts[:, 0] < cx1) & (pts[:, 1] >= cy0) & (pts[:, 1] < cy1)
+        keep = np.flatnonzero(owned)
+        if cap and len(keep) > cap:
+            responses = np.array([kp[i].response for i in keep])
+            keep = keep[np.argsort(-responses, kind="stable")[:cap]]
+
+        kept = []
+        for i in keep:
+            k = kp[i]
+            k.pt = (float(pts[i, 0]), float(pts[i, 1]))
+            kept.append(k)
+        return kept, des[keep]
+
+    def _detect_tiled(self, gray, mask=None):
+        boxes = list(self.tiles(gray.shape))
+        cap = self._tile_cap(len(boxes))
+        with ThreadPoolExecutor(max_workers=self.n_threads) as pool:
+            results = list(pool.map(lambda b: self._detect_tile(gray, mask, *b, cap), boxes))
+
+        kp = [k for tile_kp, _ in results for k in tile_kp]
+        descriptors = [des for _, des in results if des is not None and len(des)]
+        des = np.concatenate(descriptors) if descriptors else None
+        if self.has_budget and not self.max_features_per_tile and len(kp) > self.n_features:
+            # Rounded-up shares can overshoot the budget by a few keypoints
+            responses = np.array([k.response for k in kp])
+            keep = np.sort(np.argsort(-responses, kind="stable")[:self.n_features])
+            kp, des = [kp[i] for i in keep], des[keep]
+        return kp, des
+
+    @staticmethod
+    def _result(kp, des, packed, start_time, cache_hit):
+        end_time = time.perf_counter()
+        return {
+            "keypoints": kp,
+            "keypoint_array": packed,
+            "descriptors": des,
+            "extraction_time": end_time - start_time,
+            "count": len(kp),
+            "descriptor_type": str(des.dtype) if des is not None else None,
+            "descriptor_size": des.shape[1] if des is not None else None,
+            "cache_hit": cache_hit
+        }
@@ -0,0 +1,212 @@
+import time
+from itertools import combinations
+
+import cv2
+import numpy as np
+
+from services.detector_comparison import DEFAULT_CONFIGS
+from services.detector_registry import available_detectors, create_detector
+from services.matcher import MatcherService
+from services.metrics import MetricsService
+from utils.synthetic import SyntheticUtils, TRANSFORMS
+
+# Summary keys usable as the accuracy axis of the Pareto front (higher is better)
+ACCURACY_METRICS = ("homography_success", "verdict_accuracy", "inlier_precision", "inlier_recall")
+
+class Evaluator:
+    """Ground-truth accuracy and latency of detector/matcher configurations.
+
+    Positive pairs are a seed image and a transformed copy with a known homography H
+    (SyntheticUtils.transform); negative pairs are two different seeds. Per pair it measures:
+    - corner error: mean distance between the image corners mapped by H and by the estimate,
+    - inlier precision: share of inlier_matches that H maps to within `pixel_tolerance`,
+    - inlier recall: correct inliers over the ground-truth correspondences between the keypoints,
+    - whether the verdict (positive when confidence >= `positive_confidence`) is right,
+    alongside the extraction, matching and RANSAC times.
+    """
+
+    def __init__(self, configs=None, verifications=("ransac",), pixel_tolerance: float = 3.0,
+                 success_threshold: float = 5.0, positive_confidence: float = 50.0,
+                 ratio_threshold: float = 0.75):
+        available = set(available_detectors())
+        self.configs = [c for c in (configs or DEFAULT_CONFIGS) if c[1].upper() in available]
+        self.verifications = tuple(verifications)
+        self.pixel_tolerance = pixel_tolerance
+        self.success_threshold = success_threshold
+        self.positive_confidence = positive_confidence
+        self.ratio_threshold = ratio_threshold
+
+    @staticmethod
+    def pairs(seeds, transforms=None, seed: int = 0):
+        """Yield evaluation pairs from {name: image} seeds: every transform level, then every seed pair."""
+        transforms = transforms or list(TRANSFORMS)
+        for name, img in seeds.items():
+            for transform in transforms:
+                for level in TRANSFORMS[transform]:
+                    img_b, homography = SyntheticUtils.transform(img, transform, level, seed=seed)
+                    yield {"seed": name, "transform": transform, "level": level,
+                           "image_a": img, "image_b": img_b, "homography": homography}
+        for (name_a, img_a), (name_b, img_b) in combinations(seeds.items(), 2):
+            yield {"seed": f"{name_a}|{name_b}", "transform": "negative", "level": None,
+                   "image_a": img_a, "image_b": img_b, "homography": None}
+
+    @staticmethod
+    def project(points: np.ndarray, homography: np.ndarray) -> np.ndarray:
+        return cv2.perspectiveTransform(points.reshape(-1, 1, 2).astype(np.float64), homography).reshape(-1, 2)
+
+    @staticmethod
+    def corner_error(true_h: np.ndarray, estimated_h, shape) -> float:
+        """Mean distance between the image corners mapped by the true and estimated homographies."""
+        if estimated_h is None:
+            return float("inf")
+        h, w = shape[:2]
+        corners = np.float64([[0, 0], [w, 0], [w, h], [0, h]])
+        diff = Evaluator.project(corners, true_h) - Evaluator.project(corners, estimated_h)
+        return float(np.linalg.norm(diff, axis=1).mean())
+
+    @staticmethod
+    def correct_mask(pts_a, pts_b, matches, homography, tolerance) -> np.ndarray:
+        """Which matches land within `tolerance` pixels of where the homography maps their query point."""
+        if len(matches) == 0:
+            return np.zeros(0, dtype=bool)
+        projected = Evaluator.project(pts_a[matches.query_idx], homography)
+        return np.linalg.norm(projected - pts_b[matches.train_idx], axis=1) <= tolerance
+
+    @staticmethod
+    def correspondences(pts_a, pts_b, homography, tolerance) -> int:
+        """Ground-truth correspondences: A keypoints that H maps to within `tolerance` of some B keypoint."""
+        if len(pts_a) == 0 or len(pts_b) == 0:
+            return 0
+        projected = Evaluator.project(pts_a, homography).astype(np.float32)
+        dist, _ = cv2.batchDistance(projected, pts_b, cv2.CV_32F, normType=cv2.NORM_L2, K=1)
+        return int((dist[:, 0] <= tolerance).sum())
+
+    def evaluate_pair(self, label, method, detector, matcher, pair):
+        """One row of ground-truth measures and stage timings for one configuration on one pair."""
+        res_a = detector.detect_and_compute(pair["image_a"])
+        res_b = detector.detect_and_compute(pair["image_b"])
+        match_results = matcher.match(
+            res_a["keypoints"], res_a["descriptors"],
+            res_b["keypoints"], res_b["descriptors"],
+            ratio_threshold=self.ratio_threshold
+        )
+        stats = MetricsService.calculate_similarity_stats(
+            match_results["raw_matches"], match_results["inlier_matches"],
+            res_a["count"], res_b["count"], method=method
+        )
+        positive = pair["homography"] is not None
+        row = {
+            "config": label,
+            "seed": pair["seed"],
+            "transform": pair["transform"],
+            "level": pair["level"],
+            "positive": positive,
+            "predicted_positive": bool(stats["confidence_score"] >= self.positive_confidence),
+            "confidence_score": float(stats["confidence_score"]),
+            "num_matches": stats["num_matches"],
+            "num_inliers": stats["num_inliers"],
+            "extraction_time": res_a["extraction_time"] + res_b["extraction_time"],
+            "matching_time": match_results["matching_time"],
+            "ransac_time": match_results["ransac_time"]
+        }
+        row["total_time"] = row["extraction_time"] + row["matching_time"] + row["ransac_time"]
+
+        if positive:
+            pts_a = MatcherService.keypoint_coords(res_a["keypoints"])
+            pts_b = MatcherService.keypoint_coords(res_b["keypoints"])
+            inliers = match_results["inlier_matches"]
+            row["corner_error"] = self.corner_error(pair["homography"], match_results["homography"], pair["image_a"].shape)
+            row["correct_inliers"] = int(self.correct_mask(pts_a, pts_b, inliers, pair["homography"], self.pixel_tolerance).sum())
+            row["correspondences"] = self.correspondences(pts_a, pts_b, pair["homography"], self.pixel_tolerance)
+        return row
+
+    def run(self, pairs, progress=None):
+        """Evaluate every (detector config x verification) on every pair; returns the per-pair rows."""
+        pairs = list(pairs)
+        runners = []
+        for label, method, n_features in self.configs:
+            detector = create_detector(method, n_features=n_features)
+            for verification in self.verifications:
+                name = label if len(self.verifications) == 1 else f"{label}/{verification}"
+                runners.append((name, method, detector, MatcherService(method=method, verification=verification)))
+
+        rows = []
+        for name, method, detector, matcher in runners:
+            start = time.perf_counter()
+            for pair in pairs:
+                rows.append(self.evaluate_pair(name, method, detector, matcher, pair))
+            if progress:
+                progress(name, len(pairs), time.perf_counter() - start)
+        return rows
+
+    def summarize(self, rows):
+        """Aggregate rows per configuration (in first-seen order)."""
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(row["config"], []).append(row)
+
+        summaries = []
+        for config, group in grouped.items():
+            positives = [r for r in group if r["positive"]]
+            errors = np.array([r["corner_error"] for r in positives]) if positives else np.empty(0)
+            inliers = sum(r["num_inliers"] for r in positives)
+            correct = sum(r["correct_inliers"] for r in positives)
+            correspondences = sum(r["correspondences"] for r in positives)
+            negatives = [r for r in group if not r["positive"]]
+            totals = np.array([r["total_time"] for r in group])
+
+            by_transform = {}
+            for r in positives:
+                by_transform.setdefault(r["transform"], []).append(r["corner_error"] <= self.success_threshold)
+
+            summaries.append({
+                "config": config,
+                "pairs": len(group),
+                "positives": len(positives),
+                "negatives": len(negatives),
+                "homography_success": float((errors <= self.success_threshold).mean()) if len(errors) else 0.0,
+                "median_corner_error": float(np.median(errors)) if len(errors) else float("inf"),
+                "inlier_precision": correct / inliers if inliers else 0.0,
+                "inlier_recall": correct / correspondences if correspondences else 0.0,
+                "verdict_accuracy": float(np.mean([r["predicted_positive"] == r["positive"] for r in group])),
+                "false_positive_rate": float(np.mean([r["predicted_positive"] for r in negatives])) if negatives else 0.0,
+                "success_by_transform": {t: float(np.mean(v)) for t, v in by_transform.items()},
+                "mean_extraction_time": float(np.mean([r["extraction_time"] for r in group])),
+                "mean_matching_time": float(np.mean([r["matching_time"] for r in group])),
+                "mean_ransac_time": float(np.mean([r["ransac_time"] for r in group])),
+                "mean_total_time": float(totals.mean()),
+                "p90_total_time": float(np.percentile(totals, 90)),
+                "throughput_pairs_per_s": float(1.0 / totals.mean()) if totals.mean() > 0 else None
+            })
+        return summaries
+
+    @staticmethod
+    def pareto(summaries, accuracy_key: str = "homography_success", cost_key: str = "mean_total_time"):
+        """Configurations no other one beats on both accuracy and cost, cheapest first."""
+        front, best = [], -np.inf
+        for s in sorted(summaries, key=lambda s: (s[cost_key], -s[accuracy_key])):
+            if s[accuracy_key] > best:
+                front.append(s)
+                best = s[accuracy_key]
+        return front
+
+    @staticmethod
+    def table(summaries, front=()) -> str:
+        """Plain-text table of the summaries; Pareto-optimal configurations are starred."""
+        on_front = {s["config"] for s in front}
+        columns = [
+            ("Config", lambda s: ("* " if s["config"] in on_front else "  ") + s["config"]),
+            ("H ok %", lambda s: f"{s['homography_success'] * 100:.1f}"),
+            ("Med err px", lambda s: f"{s['median_corner_error']:.2f}"),
+            ("Precision", lambda s: f"{s['inlier_precision']:.3f}"),
+            ("Recall", lambda s: f"{s['inlier_recall']:.3f}"),
+            ("Verdict %", lambda s: f"{s['verdict_accuracy'] * 100:.1f}"),
+            ("FP %", lambda s: f"{s['false_positive_rate'] * 100:.1f}"),
+            ("Extract ms", lambda s: f"{s['mean_extraction_time'] * 1e3:.1f}"),
+            ("Match ms", lambda s: f"{s['mean_matching_time'] * 1e3:.1f}"),
+            ("RANSAC ms", lambda s: f"{s['mean_ransac_time'] * 1e3:.1f}"),
+            ("Pairs/s", lambda s: f"{s['throughput_pairs_per_s']:.1f}")
+        ]
+        lines = [[title for title, _ in columns]] + [[fmt(s) for _, fmt in columns] for s in summaries]
+        widths = [max(len(line[i]) for line in lines) for i in range(len(columns))]
+        return "\n".join("  ".join(v.ljust(w) for v, w in zip(line, widths)).rstrip() for line in lines)
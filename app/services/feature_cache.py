@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "VISIONMATCH_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "visionmatch", "features")
+)
+
+class FeatureCache:
+    """Content-addressed on-disk cache of packed keypoints and memory-mapped descriptors.
+
+    `max_bytes` bounds the size of the cache files (headers included), measured the same way for
+    entries written by this process and entries found on disk at startup.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self._total_bytes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._scan()
+
+    @staticmethod
+    def make_key(img: np.ndarray, params: dict) -> str:
+        """Hash image content together with the detector parameters that produced the features."""
+        h = hashlib.blake2b(digest_size=20)
+        h.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+        h.update(f"{img.shape}|{img.dtype}".encode("utf-8"))
+        h.update(np.ascontiguousarray(img).data)
+        return h.hexdigest()
+
+    def get(self, key: str):
+        """Return (packed_keypoints, descriptors) or None. Descriptors are memory-mapped, not read."""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+        kp_path, des_path = self._paths(key)
+        try:
+            keypoints = np.load(kp_path, allow_pickle=False)
+            # An image without keypoints stores an empty descriptor file, which cannot be mmapped
+            descriptors = np.load(des_path, mmap_mode="r", allow_pickle=False) if len(keypoints) else None
+            os.utime(kp_path)  # persist recency across processes/restarts
+        except (OSError, ValueError):
+            # Evicted by another process or partially written: treat as a miss
+            self._forget(key)
+            return None
+        return keypoints, descriptors
+
+    def put(self, key: str, keypoints: np.ndarray, descriptors):
+        """Store features atomically and evict least recently used entries beyond max_bytes."""
+        if descriptors is None:
+            descriptors = np.empty((0, 0), dtype=np.uint8)
+        kp_path, des_path = self._paths(key)
+        size = 0
+        for path, arr in ((des_path, descriptors), (kp_path, keypoints)):
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, np.ascontiguousarray(arr), allow_pickle=False)
+                size += f.tell()  # file size, as _scan() counts it
+            os.replace(tmp, path)
+
+        with self._lock:
+            self._total_bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._evict()
+
+    def clear(self):
+        """Remove every cached entry."""
+        with self._lock:
+            for key in list(self._entries):
+                self._remove_files(key)
+            self._entries.clear()
+            self._total_bytes = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._total_bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _paths(self, key: str):
+        return (os.path.join(self.cache_dir, f"{key}.kp.npy"),
+                os.path.join(self.cache_dir, f"{key}.des.npy"))
+
+    def _scan(self):
+        # Rebuild LRU order from keypoint file mtimes (touched on every hit)
+        found = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".kp.npy"):
+                continue
+            key = name[:-len(".kp.npy")]
+            kp_path, des_path = self._paths(key)
+            try:
+                size = os.path.getsize(kp_path) + os.path.getsize(des_path)
+                found.append((os.path.getmtime(kp_path), key, size))
+            except OSError:
+                continue
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._evict()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self._remove_files(key)
+
+    def _forget(self, key: str):
+        with self._lock:
+            size = self._entries.pop(key, None)
+            if size is not None:
+                self._total_bytes -= size
+
+    def _remove_files(self, key: str):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,170 @@
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from services.orb_service import ORBService
+from services.matcher import MatcherService
+from utils.image_utils import ImageUtils
+from utils.instrumentation import instrumentation
+
+class FrameTracker:
+    """Incremental frame-to-frame homography tracking for videos and image sequences.
+
+    Features are detected once with ORBService and then followed with pyramidal Lucas-Kanade
+    optical flow, seeded by the previous frame's motion. Full detection only runs again when the
+    inlier ratio or the number of tracked points drops. If flow fails outright (fast motion, blur),
+    the tracked points' stored descriptors (never recomputed) are matched against the fresh
+    keypoints inside a search window around each point's motion-predicted position.
+
+    A homography is only accepted with at least `min_inliers` inliers making up at least
+    `min_inlier_ratio` of the tracked points; a weaker one (a blank or unrelated frame) is
+    treated as a flow failure, so it never reaches the cumulative motion or the next prior.
+    """
+
+    def __init__(self, n_features: int = 1000, redetect_ratio: float = 0.6, min_points: int = 150,
+                 search_radius: float = 40.0, win_size: int = 15, max_level: int = 2,
+                 reproj_threshold: float = 3.0, ratio_threshold: float = 0.8, fps_window: int = 30,
+                 min_inliers: int = 15, min_inlier_ratio: float = 0.2, detector: ORBService = None):
+        self.detector = detector or ORBService(n_features=n_features)
+        self.matcher = MatcherService(method="ORB", reproj_threshold=reproj_threshold)
+        self.redetect_ratio = redetect_ratio
+        self.min_points = min_points
+        self.search_radius = search_radius
+        self.ratio_threshold = ratio_threshold
+        self.min_inliers = max(min_inliers, self.matcher.min_matches)
+        self.min_inlier_ratio = min_inlier_ratio
+        self.fps_window = fps_window
+        self.lk_params = {
+            "winSize": (win_size, win_size),
+            "maxLevel": max_level,
+            "criteria": (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03),
+            "flags": cv2.OPTFLOW_USE_INITIAL_FLOW
+        }
+        self.reset()
+
+    def reset(self):
+        """Forget the tracked state; the next frame starts a new track."""
+        self.prev_gray = None
+        self.points = np.empty((0, 2), dtype=np.float32)
+        self.descriptors = None
+        self.detected = 0
+        self.motion = np.eye(3)
+        self.cumulative = np.eye(3)
+        self._frame_times = deque(maxlen=self.fps_window)
+
+    @staticmethod
+    def _project(points, homography):
+        if len(points) == 0:
+            return points
+        return cv2.perspectiveTransform(points.reshape(-1, 1, 2), homography).reshape(-1, 2).astype(np.float32)
+
+    def _detect(self, gray):
+        res = self.detector.detect_and_compute(gray)
+        self.detected = res["count"]
+        return MatcherService.keypoint_coords(res["keypoints"]), res["descriptors"]
+
+    def _flow(self, gray):
+        """Track the current points into `gray`; returns (next points, tracked mask)."""
+        predicted = self._project(self.points, self.motion)
+        with instrumentation.span("optical_flow"):
+            nxt, status, _ = cv2.calcOpticalFlowPyrLK(
+                self.prev_gray, gray, self.points.reshape(-1, 1, 2), predicted.reshape(-1, 1, 2).copy(),
+                **self.lk_params
+            )
+        return nxt.reshape(-1, 2), status.ravel().astype(bool)
+
+    def _windowed_matches(self, new_points, new_descriptors, homography):
+        """Ratio-tested matches tracked -> new keypoints, restricted to a radius around the prediction."""
+        with instrumentation.span("window_match"):
+            dist, idx = self.matcher.guided_knn(
+                self.points, self.descriptors, new_points, new_descriptors, homography, self.search_radius
+            )
+        # Same selection as guided matching: lone candidates must also pass the absolute threshold
+        matches = self.matcher._select(dist, idx, True, self.ratio_threshold)
+        return matches.query_idx, matches.train_idx
+
+    def _estimate(self, src, dst):
+        """RANSAC homography and inlier mask, or (None, None) when its support is too weak."""
+        if len(src) < self.min_inliers:
+            return None, None
+        with instrumentation.span("ransac"):
+            homography, mask = self.matcher.estimate(src.reshape(-1, 1, 2), dst.reshape(-1, 1, 2))
+        if homography is None or mask is None:
+            return None, None
+        inliers = int(mask.sum())
+        if inliers < self.min_inliers or inliers < self.min_inlier_ratio * len(self.points):
+            instrumentation.count("homographies_rejected")
+            return None, None
+        return homography, mask
+
+    def step(self, frame: np.ndarray) -> dict:
+        """Process one frame and return its motion relative to the previous frame."""
+        start = time.perf_counter()
+        gray = frame if frame.ndim == 2 else ImageUtils.to_grayscale(frame)
+
+        if self.prev_gray is None or gray.shape != self.prev_gray.shape:
+            # First frame, or the frame size changed: start a new track
+            self.motion, self.cumulative = np.eye(3), np.eye(3)
+            self.points, self.descriptors = self._detect(gray)
+            self.prev_gray = gray
+            return self._result(np.eye(3), 1.0, len(self.points), True, start)
+
+        homography, inlier_ratio, tracked = None, 0.0, 0
+        if len(self.points):
+            nxt, ok = self._flow(gray)
+            tracked = int(ok.sum())
+            homography, mask = self._estimate(self.points[ok], nxt[ok])
+            if homography is not None:
+                inliers = np.flatnonzero(ok)[mask.ravel().astype(bool)]
+                # Lost tracks count against the ratio, so drifting scenes trigger re-detection
+                inlier_ratio = len(inliers) / len(self.points)
+                self.points, self.descriptors = nxt[inliers], self.descriptors[inliers]
+
+        # Also refresh once too few of the last detection survive: a shrinking cluster extrapolates badly
+        survivors = max(self.min_points, self.redetect_ratio * self.detected)
+        redetect = homography is None or inlier_ratio < self.redetect_ratio or len(self.points) < survivors
+        if redetect:
+            new_points, new_descriptors = self._detect(gray)
+            if homography is None and new_descriptors is not None and self.descriptors is not None and len(self.points):
+                # Flow failed: match the stored descriptors around each point's predicted position
+                src_idx, dst_idx = self._windowed_matches(new_points, new_descriptors, self.motion)
+                homography, mask = self._estimate(self.points[src_idx], new_points[dst_idx])
+                if homography is not None:
+                    inlier_ratio = float(mask.sum()) / len(self.points)
+            self.points, self.descriptors = new_points, new_descriptors
+            instrumentation.count("frames_redetected")
+
+        self.prev_gray = gray
+        if homography is None:
+            # Lost: continue from the fresh detection with no motion prior
+            self.motion = np.eye(3)
+            return self._result(None, 0.0, tracked, redetect, start)
+
+        self.motion = homography
+        self.cumulative = homography @ self.cumulative
+        return self._result(homography, inlier_ratio, tracked, redetect, start)
+
+    def _result(self, homography, inlier_ratio, tracked, redetected, start):
+        frame_time = time.perf_counter() - start
+        instrumentation.observe("track_frame", frame_time, start)
+        instrumentation.count("frames_tracked")
+        self._frame_times.append(frame_time)
+        window = sum(self._frame_times)
+        return {
+            "homography": homography,
+            "cumulative": self.cumulative.copy() if homography is not None else None,
+            "inlier_ratio": float(inlier_ratio),
+            "tracked_points": tracked,
+            "points": len(self.points),
+            "redetected": redetected,
+            "frame_time": frame_time,
+            "fps": len(self._frame_times) / window if window > 0 else None
+        }
+
+    def track(self, frames):
+        """Yield one result per frame (frame index included) from any iterable of frames."""
+        self.reset()
+        for index, frame in enumerate(frames):
+            yield {"frame": index, **self.step(frame)}
@@ -0,0 +1,136 @@
+import time
+
+import numpy as np
+
+from services.matcher import MatcherService
+from services.vocabulary import Vocabulary
+from utils.keypoint_utils import KeypointUtils
+
+class GlobalIndex:
+    """Shortlist images by a global descriptor, then verify only the top-K with MatcherService.
+
+    `encoding="bow"` scores tf-idf weighted visual-word histograms by cosine similarity through an
+    inverted file (only images sharing a word with the query are touched); `encoding="vlad"`
+    keeps one dense VLAD vector per image and ranks with a single matrix-vector product.
+    """
+
+    def __init__(self, vocabulary: Vocabulary, encoding: str = "bow"):
+        if encoding not in ("bow", "vlad"):
+            raise ValueError(f"Unknown encoding '{encoding}'. Choose from: bow, vlad")
+        self.vocabulary = vocabulary
+        self.method = vocabulary.method
+        self.encoding = encoding
+        self.images = {}  # image_id -> {"keypoints", "descriptors", "vector"}
+        self._built = None
+
+    def __len__(self):
+        return len(self.images)
+
+    def __contains__(self, image_id):
+        return image_id in self.images
+
+    def encode(self, descriptors: np.ndarray) -> np.ndarray:
+        if self.encoding == "vlad":
+            return self.vocabulary.vlad(descriptors)
+        return self.vocabulary.bow(descriptors)
+
+    def add(self, image_id: str, keypoints, descriptors: np.ndarray):
+        """Add (or replace) an image. Search structures are rebuilt lazily on the next query."""
+        if descriptors is None or len(descriptors) == 0:
+            return
+        if not isinstance(keypoints, np.ndarray):
+            keypoints = KeypointUtils.pack(keypoints)
+        self.images[image_id] = {
+            "keypoints": keypoints,
+            "descriptors": descriptors,
+            "vector": self.encode(descriptors)
+        }
+        self._built = None
+
+    def remove(self, image_id: str) -> bool:
+        if self.images.pop(image_id, None) is None:
+            return False
+        self._built = None
+        return True
+
+    def _build(self):
+        if self._built is not None:
+            return
+        ids = list(self.images)
+        vectors = np.stack([self.images[i]["vector"] for i in ids]) if ids else np.empty((0, 0), np.float32)
+        if self.encoding == "vlad":
+            self._built = {"ids": ids, "vectors": vectors}
+            return
+
+        # Inverted file: postings sorted by word, with per-word offsets into them
+        df = (vectors > 0).sum(axis=0)
+        # Smoothed idf stays positive, so words present in every image (or a one-image index) still count
+        idf = (np.log((len(ids) + 1) / (df + 1)) + 1).astype(np.float32)
+        tfidf = vectors / np.maximum(vectors.sum(axis=1, keepdims=True), 1) * idf
+        norms = np.maximum(np.linalg.norm(tfidf, axis=1), 1e-12)
+        # Row-major nonzero over the (word, image) matrix comes out sorted by word
+        words, image_idx = np.nonzero(tfidf.T > 0)
+        self._built = {
+            "ids": ids,
+            "idf": idf,
+            "postings_image": image_idx,
+            "postings_weight": (tfidf[image_idx, words] / norms[image_idx]).astype(np.float32),
+            "offsets": np.searchsorted(words, np.arange(self.vocabulary.n_words + 1))
+        }
+
+    def query(self, descriptors: np.ndarray, top_k: int = 10):
+        """Top-K indexed images by global similarity."""
+        if descriptors is None or len(descriptors) == 0 or not self.images:
+            return []
+        self._build()
+        built = self._built
+        vector = self.encode(descriptors)
+
+        if self.encoding == "vlad":
+            scores = built["vectors"] @ vector
+        else:
+            weights = vector / max(vector.sum(), 1) * built["idf"]
+            weights /= max(np.linalg.norm(weights), 1e-12)
+            words = np.flatnonzero(weights)
+            starts, ends = built["offsets"][words], built["offsets"][words + 1]
+            lengths = ends - starts
+            # Concatenated posting ranges of the query's words, without a Python loop
+            positions = np.repeat(ends - lengths.cumsum(), lengths) + np.arange(lengths.sum())
+            contributions = built["postings_weight"][positions] * np.repeat(weights[words], lengths)
+            scores = np.bincount(built["postings_image"][positions], weights=contributions,
+                                 minlength=len(built["ids"]))
+
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        return [
+            {"image_id": built["ids"][i], "score": float(scores[i])}
+            for i in order if scores[i] > 0
+        ]
+
+    def search(self, keypoints, descriptors: np.ndarray, top_k: int = 10, matcher: MatcherService = None,
+               ratio_test=True, ratio_threshold=0.75):
+        """Shortlist with the global descriptor, then verify each candidate with MatcherService RANSAC."""
+        start_query = time.perf_counter()
+        candidates = self.query(descriptors, top_k=top_k)
+        query_time = time.perf_counter() - start_query
+
+        matcher = matcher or MatcherService(method=self.method)
+        results = []
+        for candidate in candidates:
+            entry = self.images[candidate["image_id"]]
+            match_results = matcher.match(
+                keypoints, descriptors,
+                KeypointUtils.unpack(entry["keypoints"]), entry["descriptors"],
+                ratio_test=ratio_test,
+                ratio_threshold=ratio_threshold
+            )
+            results.append({
+                "image_id": candidate["image_id"],
+                "score": candidate["score"],
+                "num_inliers": len(match_results["inlier_matches"]),
+                "match_results": match_results,
+                "query_time": query_time
+            })
+
+        # Geometric verification has the final say on ranking
+        results.sort(key=lambda r: (r["num_inliers"], r["score"]), reverse=True)
+        return results
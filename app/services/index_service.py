@@ -0,0 +1,275 @@
+import cv2
+import numpy as np
+import json
+import os
+import tempfile
+import time
+
+from services.detector_registry import is_binary
+from services.matcher import MatcherService
+from utils.keypoint_utils import KeypointUtils, KEYPOINT_DTYPE
+
+# FLANN algorithm ids (cv2 does not expose them as constants)
+FLANN_INDEX_KDTREE = 1
+FLANN_INDEX_LSH = 6
+
+class IndexService:
+    """Approximate nearest-neighbour index over the descriptors of an image collection.
+
+    Building the FLANN structure is the expensive part (seconds for a few hundred thousand float
+    descriptors), and cv2 cannot extend a trained one: FlannBasedMatcher.add() + train() rebuilds
+    the whole tree. Mutations are therefore applied incrementally: added images go to a pending
+    set that queries search exactly (brute force) next to the tree, and removed or replaced ones
+    are masked out of the tree's results. The tree is rebuilt over everything only once the
+    pending and masked rows exceed `rebuild_fraction` of the rows it holds.
+
+    save() stores a trained KD-tree with the index so load() does not rebuild it; LSH tables
+    (binary descriptors) are cheap to build and are rebuilt on the first query instead.
+    """
+
+    def __init__(self, method="ORB", trees: int = 5, checks: int = 50, rebuild_fraction: float = 0.25):
+        self.method = method.upper()
+        if is_binary(self.method):
+            # Binary descriptors: locality sensitive hashing
+            self.index_params = dict(algorithm=FLANN_INDEX_LSH, table_number=6, key_size=12, multi_probe_level=1)
+        else:
+            # Float descriptors: randomized KD-trees
+            self.index_params = dict(algorithm=FLANN_INDEX_KDTREE, trees=trees)
+        self.search_params = dict(checks=checks)
+        self.rebuild_fraction = rebuild_fraction
+
+        self.images = {}  # image_id -> {"keypoints": packed array, "descriptors": array}
+        self._flann = None
+        self._flann_data = None  # rows of the tree (FLANN keeps a pointer into them)
+        self._tree_rows = 0
+        # One slot per indexed copy of an image: the tree's images first, then pending ones.
+        # Rows of slot i start at _row_offsets[i] in tree rows followed by pending rows.
+        self._row_ids = []
+        self._row_offsets = []
+        self._live = []
+        self._slots = {}  # image_id -> its live slot
+        self._pending = []
+        self._pending_data = None
+        self._stale_rows = 0  # pending rows plus masked tree rows
+        self.rebuilds = 0
+
+    def __len__(self):
+        return len(self.images)
+
+    def __contains__(self, image_id):
+        return image_id in self.images
+
+    def add(self, image_id: str, keypoints, descriptors: np.ndarray):
+        """Add (or replace) an image's features. The ANN structure is rebuilt lazily on the next query."""
+        if descriptors is None or len(descriptors) == 0:
+            return
+        if not isinstance(keypoints, np.ndarray):
+            keypoints = KeypointUtils.pack(keypoints)
+        descriptors = self._as_index_dtype(descriptors)
+        self.images[image_id] = {"keypoints": keypoints, "descriptors": descriptors}
+        if self._flann is None:
+            return
+        self._mask(image_id)
+        self._slots[image_id] = len(self._row_ids)
+        self._row_ids.append(image_id)
+        self._row_offsets.append(self._tree_rows + sum(len(d) for d in self._pending))
+        self._live.append(True)
+        self._pending.append(descriptors)
+        self._pending_data = None
+        self._stale_rows += len(descriptors)
+
+    def remove(self, image_id: str) -> bool:
+        """Remove an image from the index. Returns False if it was not indexed."""
+        if self.images.pop(image_id, None) is None:
+            return False
+        if self._flann is not None:
+            self._mask(image_id)
+        return True
+
+    def _mask(self, image_id):
+        slot = self._slots.pop(image_id, None)
+        if slot is not None:
+            self._live[slot] = False
+            if slot < self._tree_slots:
+                end = self._row_offsets[slot + 1] if slot + 1 < len(self._row_offsets) else self._tree_rows
+                self._stale_rows += end - self._row_offsets[slot]
+
+    def query(self, descriptors: np.ndarray, top_k: int = 5, ratio_threshold: float = 0.75):
+        """Rank indexed images by the number of query descriptors that vote for them."""
+        if descriptors is None or len(descriptors) == 0 or not self.images:
+            return []
+
+        self._build()
+        dist, rows = self._knn(self._as_index_dtype(descriptors))
+        first, second = rows[:, 0], rows[:, 1]
+        ratio_ok = dist[:, 0] < ratio_threshold * dist[:, 1]
+
+        offsets = np.asarray(self._row_offsets)
+        owner = np.searchsorted(offsets, first, side="right") - 1
+        second_owner = np.searchsorted(offsets, second, side="right") - 1
+        # The ratio test is only meaningful between neighbours of the same image;
+        # a near-duplicate in another image must not veto the vote.
+        keep = (first >= 0) & (ratio_ok | (owner != second_owner) | (second < 0))
+        votes = np.bincount(owner[keep], minlength=len(self._row_ids))
+
+        order = np.argsort(-votes, kind="stable")[:top_k]
+        return [
+            {"image_id": self._row_ids[i], "votes": int(votes[i])}
+            for i in order if votes[i] > 0
+        ]
+
+    def search(self, keypoints, descriptors: np.ndarray, top_k: int = 5, matcher: MatcherService = None,
+               ratio_test=True, ratio_threshold=0.75):
+        """Shortlist candidates via the ANN index, then verify each with MatcherService RANSAC."""
+        start_query = time.perf_counter()
+        candidates = self.query(descriptors, top_k=top_k, ratio_threshold=ratio_threshold)
+        query_time = time.perf_counter() - start_query
+
+        matcher = matcher or MatcherService(method=self.method)
+        results = []
+        for candidate in candidates:
+            entry = self.images[candidate["image_id"]]
+            match_results = matcher.match(
+                keypoints, descriptors,
+                KeypointUtils.unpack(entry["keypoints"]), entry["descriptors"],
+                ratio_test=ratio_test,
+                ratio_threshold=ratio_threshold
+            )
+            results.append({
+                "image_id": candidate["image_id"],
+                "votes": candidate["votes"],
+                "num_inliers": len(match_results["inlier_matches"]),
+                "match_results": match_results,
+                "query_time": query_time
+            })
+
+        # Geometric verification has the final say on ranking
+        results.sort(key=lambda r: (r["num_inliers"], r["votes"]), reverse=True)
+        return results
+
+    def save(self, path: str):
+        """Persist keypoints, descriptors, settings and a trained KD-tree to a single .npz file."""
+        tree = np.empty(0, dtype=np.uint8)
+        if self.images and not is_binary(self.method):
+            if self._flann is None or self._stale_rows:
+                self._build(force=True)
+            tree = self._tree_bytes()
+        ids = list(self.images)
+        descriptors = [self.images[i]["descriptors"] for i in ids]
+        keypoints = [self.images[i]["keypoints"] for i in ids]
+        counts = np.array([len(d) for d in descriptors], dtype=np.int64)
+        meta = {"method": self.method, "index_params": self.index_params,
+                "search_params": self.search_params, "ids": ids}
+        np.savez(
+            path,
+            meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8),
+            counts=counts,
+            descriptors=np.concatenate(descriptors) if descriptors else np.empty((0, 0)),
+            keypoints=np.concatenate(keypoints) if keypoints else np.empty(0, dtype=KEYPOINT_DTYPE),
+            tree=tree
+        )
+
+    @classmethod
+    def load(cls, path: str):
+        """Load an index written by save()."""
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+            counts = data["counts"]
+            descriptors = data["descriptors"]
+            keypoints = data["keypoints"]
+            tree = data["tree"] if "tree" in data else np.empty(0, dtype=np.uint8)
+
+        index = cls(method=meta["method"])
+        index.index_params = meta["index_params"]
+        index.search_params = meta["search_params"]
+        bounds = np.concatenate([[0], np.cumsum(counts)])
+        for i, image_id in enumerate(meta["ids"]):
+            lo, hi = bounds[i], bounds[i + 1]
+            index.images[image_id] = {"keypoints": keypoints[lo:hi], "descriptors": descriptors[lo:hi]}
+        if len(tree):
+            # Saved right after a full build, so the tree's rows are the stored descriptors in order
+            index._load_tree(tree, np.ascontiguousarray(descriptors), bounds[:-1])
+        return index
+
+    def _as_index_dtype(self, descriptors: np.ndarray) -> np.ndarray:
+        # LSH works on packed uint8 bits, KD-trees need float32
+        dtype = np.uint8 if is_binary(self.method) else np.float32
+        return np.ascontiguousarray(descriptors, dtype=dtype)
+
+    @property
+    def _tree_slots(self):
+        return len(self._row_ids) - len(self._pending)
+
+    def _build(self, force: bool = False):
+        """Rebuild the tree over every image when missing or too stale; otherwise only gather pending rows."""
+        if force or self._flann is None or self._stale_rows > self.rebuild_fraction * self._tree_rows:
+            ids = list(self.images)
+            descriptors = [self.images[i]["descriptors"] for i in ids]
+            data = np.concatenate(descriptors)
+            offsets = np.concatenate([[0], np.cumsum([len(d) for d in descriptors])[:-1]])
+            self._set_tree(cv2.flann_Index(data, self.index_params), data, offsets)
+            self.rebuilds += 1
+        elif self._pending and self._pending_data is None:
+            self._pending_data = np.concatenate(self._pending)
+
+    def _set_tree(self, flann, data, offsets):
+        ids = list(self.images)
+        self._flann, self._flann_data, self._tree_rows = flann, data, len(data)
+        self._row_ids, self._row_offsets = ids, [int(o) for o in offsets]
+        self._live = [True] * len(ids)
+        self._slots = {image_id: slot for slot, image_id in enumerate(ids)}
+        self._pending, self._pending_data, self._stale_rows = [], None, 0
+
+    def _tree_bytes(self) -> np.ndarray:
+        # cv2 only serializes a FLANN index to a file
+        fd, tmp = tempfile.mkstemp(suffix=".flann")
+        os.close(fd)
+        try:
+            self._flann.save(tmp)
+            return np.fromfile(tmp, dtype=np.uint8)
+        finally:
+            os.remove(tmp)
+
+    def _load_tree(self, tree: np.ndarray, data: np.ndarray, offsets):
+        fd, tmp = tempfile.mkstemp(suffix=".flann")
+        os.close(fd)
+        try:
+            tree.tofile(tmp)
+            flann = cv2.flann_Index()
+            if flann.load(data, tmp):
+                self._set_tree(flann, data, offsets)
+        finally:
+            os.remove(tmp)
+
+    def _knn(self, descriptors: np.ndarray):
+        """Two nearest live rows per query descriptor as (distances, rows); missing ones are (inf, -1)."""
+        n = len(descriptors)
+        masked = not all(self._live[:self._tree_slots])
+        # Masked rows can take the tree's nearest places: ask for spares to fall back on
+        k = min(4 if masked else 2, self._tree_rows)
+        rows, dist = self._flann.knnSearch(descriptors, k, params=self.search_params)
+        dist = dist.astype(np.float64)
+        if not is_binary(self.method):
+            dist = np.sqrt(dist)  # FLANN's L2 is squared; the ratio test works on distances
+        rows = rows.astype(np.int64)
+
+        if self._pending_data is not None:
+            k = min(2, len(self._pending_data))
+            norm, dtype = (cv2.NORM_HAMMING, cv2.CV_32S) if is_binary(self.method) else (cv2.NORM_L2, cv2.CV_32F)
+            pending_dist, pending_rows = cv2.batchDistance(
+                descriptors, self._pending_data, dtype, normType=norm, K=k)
+            dist = np.hstack([dist, pending_dist.astype(np.float64)])
+            rows = np.hstack([rows, np.where(pending_rows >= 0, pending_rows + self._tree_rows, -1)])
+
+        missing = rows < 0
+        if masked or self._pending_data is not None and not all(self._live[self._tree_slots:]):
+            owner = np.searchsorted(np.asarray(self._row_offsets), rows, side="right") - 1
+            missing |= ~np.asarray(self._live)[owner]
+        dist[missing], rows[missing] = np.inf, -1
+
+        order = np.argsort(dist, axis=1, kind="stable")[:, :2]
+        dist, rows = np.take_along_axis(dist, order, 1), np.take_along_axis(rows, order, 1)
+        if dist.shape[1] < 2:
+            dist = np.hstack([dist, np.full((n, 2 - dist.shape[1]), np.inf)])
+            rows = np.hstack([rows, np.full((n, 2 - rows.shape[1]), -1)])
+        return dist, rows
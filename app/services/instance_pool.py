@@ -0,0 +1,160 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+from services.detector_registry import create_detector, detector_class
+from services.matcher import MatcherService
+
+def threads_per_worker(workers: int) -> int:
+    """OpenCV threads each of `workers` concurrent callers can use without oversubscribing the cores."""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+_thread_lock = threading.Lock()
+_thread_limits = []
+_default_threads = None
+
+@contextmanager
+def opencv_threads(n: int):
+    """Limit cv2's (process-wide) thread count to `n` for the duration of a block.
+
+    Blocks may overlap across threads: the smallest active limit applies, and the original
+    count is restored when the last one exits.
+    """
+    global _default_threads
+    with _thread_lock:
+        if not _thread_limits:
+            _default_threads = cv2.getNumThreads()
+        _thread_limits.append(n)
+        cv2.setNumThreads(min(_thread_limits))
+    try:
+        yield
+    finally:
+        with _thread_lock:
+            _thread_limits.remove(n)
+            cv2.setNumThreads(min(_thread_limits) if _thread_limits else _default_threads)
+
+class InstancePool:
+    """Detector and matcher instances keyed by configuration, shared across threads.
+
+    One DetectorService per configuration is safe to share: it builds its cv2 detector lazily
+    per thread, and its feature cache is locked. MatcherService holds no cv2 state. detector()
+    and matcher() therefore return one shared instance per key, created once under a lock.
+    checkout() hands out an exclusive instance instead, for callers that hold per-call state.
+
+    With `workers` set (the size of the caller's own thread pool), tiled detectors get
+    threads_per_worker(workers) tile threads unless configured explicitly; apply the same
+    limit to OpenCV itself with `with opencv_threads(threads_per_worker(workers)):`.
+
+    Both stores are LRUs: at most `max_instances` shared configurations and `max_instances`
+    checkout keys with up to `max_idle` idle instances each are kept. An evicted instance
+    stays valid for whoever still holds it and is rebuilt on the next request for its key.
+    """
+
+    def __init__(self, cache=None, workers: int = None, max_instances: int = 32, max_idle: int = 8):
+        self.cache = cache
+        self.workers = workers
+        self.max_instances = max_instances
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._shared = OrderedDict()
+        self._idle = OrderedDict()
+        self.created = 0
+        self.evicted = 0
+        self.checkouts = 0
+
+    @staticmethod
+    def key(kind: str, method: str, **config) -> tuple:
+        return (kind, method.upper()) + tuple(sorted(config.items()))
+
+    def _create(self, kind, method, **config):
+        if kind == "matcher":
+            return MatcherService(method=method, **config)
+        if self.workers and config.get("tile_size") and "n_threads" not in config:
+            config["n_threads"] = threads_per_worker(self.workers)
+        if self.cache is not None and "cache" not in config:
+            config["cache"] = self.cache
+        n_features = config.pop("n_features", None)
+        return create_detector(method, n_features=n_features, **config)
+
+    def _normalize(self, kind, method, config):
+        # n_features does not change a detector without a budget: one instance serves every value
+        if kind == "detector" and not detector_class(method).has_budget:
+            config.pop("n_features", None)
+        return config
+
+    def _evict(self, store: OrderedDict):
+        while len(store) > self.max_instances:
+            store.popitem(last=False)
+            self.evicted += 1
+
+    def _get(self, kind, method, **config):
+        config = self._normalize(kind, method, config)
+        key = self.key(kind, method, **config)
+        with self._lock:
+            instance = self._shared.get(key)
+            if instance is not None:
+                self._shared.move_to_end(key)
+                return instance
+            instance = self._shared[key] = self._create(kind, method, **config)
+            self.created += 1
+            self._evict(self._shared)
+        return instance
+
+    def detector(self, method: str, n_features: int = None, **options):
+        """Shared detector for this configuration (n_features only matters for ORB)."""
+        return self._get("detector", method, n_features=n_features, **options)
+
+    def matcher(self, method: str, **options):
+        """Shared matcher for this configuration (verification, thresholds, ...)."""
+        return self._get("matcher", method, **options)
+
+    @contextmanager
+    def checkout(self, kind: str, method: str, **config):
+        """Exclusive instance for the duration of a block; returned to an idle list afterwards."""
+        config = self._normalize(kind, method, config)
+        key = self.key(kind, method, **config)
+        with self._lock:
+            idle = self._idle.get(key)
+            instance = idle.pop() if idle else None
+            self.checkouts += 1
+        if instance is None:
+            instance = self._create(kind, method, **config)
+            with self._lock:
+                self.created += 1
+        try:
+            yield instance
+        finally:
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                self._idle.move_to_end(key)
+                if len(idle) < self.max_idle:
+                    idle.append(instance)
+                self._evict(self._idle)
+
+    def warm(self, executor, workers: int, configs):
+        """Build the given (method, n_features) configs and their per-thread cv2 objects on every executor thread."""
+        barrier = threading.Barrier(workers)
+        blank = np.zeros((64, 64), dtype=np.uint8)
+
+        def warm_thread():
+            barrier.wait()  # forces each task onto a distinct thread
+            for method, n_features in configs:
+                self.detector(method, n_features).detect_and_compute(blank)
+                self.matcher(method)
+
+        for future in [executor.submit(warm_thread) for _ in range(workers)]:
+            future.result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "shared": len(self._shared),
+                "idle": sum(len(v) for v in self._idle.values()),
+                "created": self.created,
+                "evicted": self.evicted,
+                "checkouts": self.checkouts
+            }
@@ -0,0 +1,303 @@
+import base64
+import csv
+import hashlib
+import itertools
+import json
+import multiprocessing as mp
+import os
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from services.detector_registry import create_detector
+from services.matcher import MatcherService
+from services.metrics import MetricsService
+from utils.image_utils import ImageUtils, IMAGE_EXTENSIONS
+
+def directory_pairs(directory: str):
+    """Lazily yield every unordered pair of images in a directory (sorted for reproducible order)."""
+    paths = sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    return itertools.combinations(paths, 2)
+
+def manifest_pairs(manifest: str):
+    """Lazily yield image pairs from a CSV/TSV manifest. Relative paths resolve against the manifest's folder."""
+    base = os.path.dirname(os.path.abspath(manifest))
+    with open(manifest, newline="") as f:
+        dialect = "excel-tab" if manifest.endswith(".tsv") else "excel"
+        for row in csv.reader(f, dialect=dialect):
+            row = [c.strip() for c in row if c.strip()]
+            if len(row) < 2 or row[0].startswith("#"):
+                continue
+            yield tuple(p if os.path.isabs(p) else os.path.join(base, p) for p in row[:2])
+
+class ResultStore:
+    """Append-only JSON Lines result file with a checkpoint sidecar (`<path>.ckpt`).
+
+    Pairs are identified by their (image_a, image_b) paths, not by their position in the input, so
+    a resumed job that sees a changed listing (an image added to the directory, a reordered
+    manifest) still skips exactly the pairs already written and computes the new ones. Reopening
+    an existing store scans it once, drops a torn trailing line left by a crash, and keeps the
+    finished pairs as a sorted array of 64-bit path digests (8 bytes per pair). The checkpoint
+    holds the job settings, which must match on resume, and is rewritten atomically after an
+    fsync every `checkpoint_every` records.
+
+    Records with an "error" (an unreadable image, ...) do not count as done: with `retry_errors`
+    (the default) a resumed job computes those pairs again and appends a new record, so a pair can
+    appear more than once and its last record is the current one. `retry_errors=False` treats
+    failed pairs as finished. `completed` counts the pairs that are done in this sense.
+    """
+
+    def __init__(self, path: str, job: dict = None, checkpoint_every: int = 1000, restart: bool = False,
+                 retry_errors: bool = True):
+        self.path = path
+        self.checkpoint_path = f"{path}.ckpt"
+        self.job = job or {}
+        self.checkpoint_every = checkpoint_every
+        self.retry_errors = retry_errors
+        self.done = np.empty(0, dtype=np.uint64)
+        self.completed = 0
+        self.resumed = 0
+        self.failed = 0  # failed pairs found on reopening that will be computed again
+        self._since_checkpoint = 0
+
+        if restart:
+            for p in (self.path, self.checkpoint_path):
+                if os.path.exists(p):
+                    os.remove(p)
+        elif os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+            if checkpoint["job"] != self.job:
+                raise ValueError(f"{path} was written by a job with different settings; "
+                                 "use another output file or restart")
+        elif os.path.exists(self.path) and os.path.getsize(self.path):
+            raise ValueError(f"{path} exists without a checkpoint; refusing to append to it")
+
+        if os.path.exists(self.path):
+            self._recover()
+        self.resumed = self.completed
+        self._file = open(self.path, "a", encoding="utf-8")
+        self.checkpoint()
+
+    @staticmethod
+    def pair_key(path_a: str, path_b: str) -> int:
+        """Stable 64-bit identity of a pair (absolute paths, so relative and absolute inputs agree)."""
+        text = f"{os.path.abspath(path_a)}\0{os.path.abspath(path_b)}".encode("utf-8", "surrogateescape")
+        return int.from_bytes(hashlib.blake2b(text, digest_size=8).digest(), "little")
+
+    def _recover(self):
+        # Keep every complete, parseable line; truncate from the first torn one
+        valid_end = 0
+        keys, failed = [], []
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                    key = self.pair_key(record["image_a"], record["image_b"])
+                except (ValueError, KeyError):
+                    break
+                (failed if self.retry_errors and "error" in record else keys).append(key)
+                valid_end += len(line)
+        with open(self.path, "r+b") as f:
+            f.truncate(valid_end)
+        self.done = np.unique(np.array(keys, dtype=np.uint64))
+        self.completed = len(self.done)
+        failed = np.unique(np.array(failed, dtype=np.uint64))
+        self.failed = int(np.count_nonzero(~np.isin(failed, self.done)))
+
+    def is_done(self, path_a: str, path_b: str) -> bool:
+        """Whether this pair was written before the store was (re)opened."""
+        key = np.uint64(self.pair_key(path_a, path_b))
+        i = np.searchsorted(self.done, key)
+        return bool(i < len(self.done) and self.done[i] == key)
+
+    def append(self, record: dict):
+        self._file.write(json.dumps(record) + "\n")
+        self.completed += not (self.retry_errors and "error" in record)
+        self._since_checkpoint += 1
+        if self._since_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+
+    def checkpoint(self, finished: bool = False):
+        """Make every written record durable, then record progress atomically."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        state = {"job": self.job, "completed": self.completed, "offset": self._file.tell(),
+                 "finished": finished, "updated": time.time()}
+        tmp = f"{self.checkpoint_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.checkpoint_path)
+        self._since_checkpoint = 0
+
+    def close(self, finished: bool = False):
+        self.checkpoint(finished)
+        self._file.close()
+
+    @staticmethod
+    def read(path: str):
+        """Stream the records of a store back, one dict at a time (a retried pair's last record is current)."""
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.endswith("\n"):
+                    yield json.loads(line)
+
+    @staticmethod
+    def pack_indices(matches) -> dict:
+        """(query, train) index pairs of a MatchSet as base64 of the smallest unsigned dtype that fits."""
+        pairs = np.column_stack([matches.query_idx, matches.train_idx])
+        dtype = np.uint16 if pairs.size == 0 or pairs.max() < 2 ** 16 else np.uint32
+        return {"dtype": np.dtype(dtype).str, "data": base64.b64encode(pairs.astype(dtype).tobytes()).decode("ascii")}
+
+    @staticmethod
+    def unpack_indices(packed: dict) -> np.ndarray:
+        """(N, 2) array of (query, train) indices from pack_indices output."""
+        return np.frombuffer(base64.b64decode(packed["data"]), dtype=np.dtype(packed["dtype"])).reshape(-1, 2)
+
+# Per-process state, populated by the pool initializer
+_worker = {}
+
+def _init_worker(settings: dict):
+    cv2.setNumThreads(1)
+    _worker.update(settings)
+    _worker["detector"] = create_detector(settings["algo"], n_features=settings["n_features"])
+    _worker["matcher"] = MatcherService(method=settings["algo"], verification=settings["verification"])
+    _worker["features"] = OrderedDict()
+
+def _features(path: str):
+    # Bounded LRU: pairs are ordered so the same image recurs in nearby pairs
+    features = _worker["features"]
+    feat = features.get(path)
+    if feat is not None:
+        features.move_to_end(path)
+        return feat
+    try:
+        img = ImageUtils.load_image(path, grayscale=True)
+    except OSError:
+        img = None
+    if img is None:
+        return None
+    res = _worker["detector"].detect_and_compute(img)
+    # Packed keypoints are all matching needs; the cv2.KeyPoint list is dropped
+    feat = features[path] = {
+        "keypoints": res["keypoint_array"],
+        "descriptors": res["descriptors"],
+        "count": res["count"],
+        "extraction_time": res["extraction_time"]
+    }
+    while len(features) > _worker["feature_cache_entries"]:
+        features.popitem(last=False)
+    return feat
+
+def _job_pair(item):
+    index, (path_a, path_b) = item
+    feat_a, feat_b = _features(path_a), _features(path_b)
+    if feat_a is None or feat_b is None:
+        missing = [p for p, f in ((path_a, feat_a), (path_b, feat_b)) if f is None]
+        return {"pair": index, "image_a": path_a, "image_b": path_b,
+                "error": f"Could not load image: {', '.join(missing)}"}
+
+    match_results = _worker["matcher"].match(
+        feat_a["keypoints"], feat_a["descriptors"],
+        feat_b["keypoints"], feat_b["descriptors"],
+        ratio_test=_worker["ratio_test"],
+        ratio_threshold=_worker["ratio_threshold"]
+    )
+    stats = MetricsService.calculate_similarity_stats(
+        match_results["raw_matches"],
+        match_results["inlier_matches"],
+        feat_a["count"], feat_b["count"],
+        method=_worker["algo"]
+    )
+    homography = match_results["homography"]
+    record = {
+        "pair": index,
+        "image_a": path_a,
+        "image_b": path_b,
+        "keypoints_a": feat_a["count"],
+        "keypoints_b": feat_b["count"],
+        "stats": {k: (v if isinstance(v, str) else float(v)) for k, v in stats.items()},
+        "homography": homography.tolist() if homography is not None else None,
+        "extraction_time_a": feat_a["extraction_time"],
+        "extraction_time_b": feat_b["extraction_time"],
+        "matching_time": match_results["matching_time"],
+        "ransac_time": match_results["ransac_time"]
+    }
+    if _worker["store_inliers"]:
+        record["inliers"] = ResultStore.pack_indices(match_results["inlier_matches"])
+    return record
+
+class JobRunner:
+    """Resumable pair-comparison job with memory that stays flat however many pairs it covers.
+
+    Pairs are consumed lazily and at most `window` are in flight; each worker extracts features
+    on demand and keeps only the `feature_cache_entries` most recent images; every record is
+    written to the ResultStore as soon as it arrives and then dropped.
+    """
+
+    def __init__(self, algo="ORB", n_features: int = 2000, verification: str = "ransac", workers: int = None,
+                 ratio_test=True, ratio_threshold=0.75, store_inliers=False, feature_cache_entries: int = 64,
+                 window: int = None):
+        self.settings = {
+            "algo": algo.upper(),
+            "n_features": n_features,
+            "verification": verification,
+            "ratio_test": ratio_test,
+            "ratio_threshold": ratio_threshold,
+            "store_inliers": store_inliers,
+            "feature_cache_entries": feature_cache_entries
+        }
+        self.workers = workers or os.cpu_count() or 1
+        self.window = window or self.workers * 256
+
+    def job(self) -> dict:
+        """Settings that change the results; a store only resumes a job with the same ones."""
+        return {k: v for k, v in self.settings.items() if k != "feature_cache_entries"}
+
+    def run(self, pairs, store: ResultStore, progress=None):
+        """Compare every pair not already in `store`, appending one record per pair."""
+        # `pair` in a record is the position in this run's listing; done-state is keyed by the paths
+        todo = ((i, pair) for i, pair in enumerate(pairs) if not store.is_done(*pair))
+        start = time.perf_counter()
+        processed = errors = 0
+
+        def consume(records):
+            nonlocal processed, errors
+            for record in records:
+                store.append(record)
+                processed += 1
+                errors += "error" in record
+                if progress and processed % store.checkpoint_every == 0:
+                    progress(store.completed, processed, time.perf_counter() - start)
+
+        if self.workers == 1:
+            _init_worker(self.settings)
+            consume(map(_job_pair, todo))
+        else:
+            ctx = mp.get_context("fork" if "fork" in mp.get_all_start_methods() else "spawn")
+            with ctx.Pool(self.workers, initializer=_init_worker, initargs=(self.settings,)) as pool:
+                # Pool.imap would drain the whole generator into its task queue; windows keep it bounded
+                chunksize = max(1, self.window // (self.workers * 8))
+                while True:
+                    window = list(itertools.islice(todo, self.window))
+                    if not window:
+                        break
+                    consume(pool.imap_unordered(_job_pair, window, chunksize=chunksize))
+
+        store.checkpoint()
+        return {
+            "processed": processed,
+            "skipped": store.resumed,
+            "retried": store.failed,
+            "completed": store.completed,
+            "errors": errors,
+            "workers": self.workers,
+            "wall_time": time.perf_counter() - start
+        }
@@ -0,0 +1,66 @@
+import cv2
+import numpy as np
+
+class MatchSet:
+    """Array-native match list: queryIdx, trainIdx and distance held as parallel NumPy arrays.
+
+    Supports len(), slicing, boolean/index masks and iteration. cv2.DMatch objects are only
+    built (once) when something like cv2.drawMatches needs them.
+    """
+    __slots__ = ("query_idx", "train_idx", "distance", "_dmatches")
+
+    def __init__(self, query_idx, train_idx, distance):
+        self.query_idx = np.asarray(query_idx, dtype=np.int32)
+        self.train_idx = np.asarray(train_idx, dtype=np.int32)
+        self.distance = np.asarray(distance, dtype=np.float32)
+        self._dmatches = None
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0), np.empty(0), np.empty(0))
+
+    @classmethod
+    def from_dmatches(cls, matches):
+        """Build from a list of cv2.DMatch (e.g. the output of BFMatcher.match)."""
+        n = len(matches)
+        return cls(
+            np.fromiter((m.queryIdx for m in matches), dtype=np.int32, count=n),
+            np.fromiter((m.trainIdx for m in matches), dtype=np.int32, count=n),
+            np.fromiter((m.distance for m in matches), dtype=np.float32, count=n)
+        )
+
+    def __len__(self):
+        return len(self.distance)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            return self.to_dmatches()[key]
+        return MatchSet(self.query_idx[key], self.train_idx[key], self.distance[key])
+
+    def __iter__(self):
+        return iter(self.to_dmatches())
+
+    def sorted(self):
+        """Return a copy ordered by ascending distance (stable, so ties keep query order)."""
+        return self[np.argsort(self.distance, kind="stable")]
+
+    def to_dmatches(self) -> list:
+        """Lazily materialize cv2.DMatch objects for drawing APIs."""
+        if self._dmatches is None:
+            self._dmatches = [
+                cv2.DMatch(int(q), int(t), float(d))
+                for q, t, d in zip(self.query_idx, self.train_idx, self.distance)
+            ]
+        return self._dmatches
+
+    @staticmethod
+    def distances_of(matches) -> np.ndarray:
+        """Distances of a MatchSet or of a plain list of cv2.DMatch."""
+        if isinstance(matches, MatchSet):
+            return matches.distance
+        return np.array([m.distance for m in matches], dtype=np.float32)
+
+    @staticmethod
+    def as_dmatches(matches) -> list:
+        """cv2.DMatch list for a MatchSet or a plain list."""
+        return matches.to_dmatches() if isinstance(matches, MatchSet) else list(matches)
@@ -2,74 +2,393 @@ import cv2
 import numpy as np
 import time
 
+from services.detector_registry import is_binary, distance_scale
+from services.match_set import MatchSet
+from services.spatial_index import SpatialGrid
+from utils.instrumentation import instrumentation
+
+# Bits set per byte, for NumPy builds without np.bitwise_count
+POPCOUNT_LUT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# Verification strategies: name -> (model, cv2 robust estimation flag name)
+VERIFICATION_METHODS = {
+    "ransac": ("homography", "RANSAC"),
+    "lmeds": ("homography", "LMEDS"),
+    "rho": ("homography", "RHO"),
+    "usac": ("homography", "USAC_DEFAULT"),
+    "usac_fast": ("homography", "USAC_FAST"),
+    "magsac": ("homography", "USAC_MAGSAC"),
+    "prosac": ("homography", "USAC_PROSAC"),  # relies on matches being sorted best-first
+    "affine": ("affine", "RANSAC"),
+    "partial_affine": ("partial_affine", "RANSAC"),
+    "fundamental": ("fundamental", "FM_RANSAC"),
+    "fundamental_magsac": ("fundamental", "USAC_MAGSAC"),
+}
+
+# Minimal sample size per model, used for the pre-check and the iteration estimate
+MODEL_SAMPLE_SIZE = {"homography": 4, "affine": 3, "partial_affine": 2, "fundamental": 8}
+
 class MatcherService:
-    def __init__(self, method="ORB"):
+    def __init__(self, method="ORB", verification="ransac", reproj_threshold=5.0, max_iters=2000,
+                 confidence=0.995, min_matches=None, quantizer=None):
+        """`min_matches` rejects weak pairs before estimation (default: the model's sample size).
+
+        With a `quantizer` (services.quantization), des2 holds its compact codes and des1 the
+        query's float descriptors.
+        """
+        if verification not in VERIFICATION_METHODS:
+            raise ValueError(f"Unknown verification '{verification}'. Choose from: {', '.join(VERIFICATION_METHODS)}")
+        self.verification = verification
+        self.model_type, flag_name = VERIFICATION_METHODS[verification]
+        if not hasattr(cv2, flag_name):
+            raise ValueError(f"Verification '{verification}' needs cv2.{flag_name} (OpenCV {cv2.__version__} lacks it)")
+        self.verification_flag = getattr(cv2, flag_name)
+        self.reproj_threshold = reproj_threshold
+        self.max_iters = max_iters
+        self.confidence = confidence
+        self.min_matches = max(min_matches or 0, MODEL_SAMPLE_SIZE[self.model_type])
+
         self.method = method.upper()
-        if self.method == "ORB":
-            # For ORB use Hamming distance
-            self.bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=False)
-            self.distance_threshold = 60 # Interview-grade threshold for ORB
+        self.binary = is_binary(self.method)
+        if self.binary:
+            # For binary descriptors (ORB, AKAZE, BRISK) use Hamming distance
+            self.norm_type = cv2.NORM_HAMMING
+            self.distance_dtype = cv2.CV_32S
+            self.distance_threshold = distance_scale(self.method) # 60 for ORB, scaled by descriptor length
         else:
             # For SIFT use L2 distance
-            self.bf = cv2.BFMatcher(cv2.NORM_L2, crossCheck=False)
+            self.norm_type = cv2.NORM_L2
+            self.distance_dtype = cv2.CV_32F
             self.distance_threshold = None # SIFT uses Ratio Test instead
+        if quantizer is not None and self.binary:
+            raise ValueError("Descriptor quantization applies to float descriptors (SIFT), not binary ones")
+        self.quantizer = quantizer
+
+    def knn(self, des1, des2, k=2):
+        """Brute-force k nearest neighbours as (distances, indices) arrays, no DMatch objects."""
+        if self.quantizer is not None:
+            dist, idx = self.quantizer.knn(des1, des2, k)
+            return dist.astype(np.float32, copy=False), idx
+        dist, idx = cv2.batchDistance(des1, des2, self.distance_dtype, normType=self.norm_type, K=k)
+        return dist.astype(np.float32, copy=False), idx
+
+    def pair_distances(self, des1, des2, query_idx, train_idx, block_size: int = 65536) -> np.ndarray:
+        """Descriptor distance of each (query_idx[i], train_idx[i]) pair only, in blocks."""
+        out = np.empty(len(query_idx), dtype=np.float32)
+        for start in range(0, len(query_idx), block_size):
+            a = des1[query_idx[start:start + block_size]]
+            b = des2[train_idx[start:start + block_size]]
+            if self.binary:
+                x = a ^ b
+                if x.shape[1] % 8 == 0 and hasattr(np, "bitwise_count"):
+                    bits = np.bitwise_count(np.ascontiguousarray(x).view(np.uint64))
+                else:
+                    bits = POPCOUNT_LUT[x]
+                out[start:start + block_size] = bits.sum(axis=1, dtype=np.int32)
+            else:
+                diff = a.astype(np.float32, copy=False) - b.astype(np.float32, copy=False)
+                out[start:start + block_size] = np.sqrt(np.einsum("ij,ij->i", diff, diff))
+        return out
+
+    def guided_knn(self, pts1, des1, pts2, des2, homography, radius: float = 30.0, k: int = 2):
+        """Nearest neighbours among the keypoints within `radius` of each query's projection by `homography`.
+
+        Same (distances, indices) layout as knn(); rows with fewer than k candidates are padded
+        with inf / -1, and a lone candidate only passes the ratio test if its distance is below
+        the method's distance_scale. A SpatialGrid over pts2 yields the candidates, so only nearby pairs are compared.
+        """
+        if self.quantizer is not None:
+            raise ValueError("Guided matching compares raw descriptors; it does not support a quantizer")
+        if not radius > 0:
+            raise ValueError(f"radius must be positive, got {radius}")
+        n = len(pts1)
+        dist = np.full((n, k), np.inf, dtype=np.float32)
+        idx = np.full((n, k), -1, dtype=np.int32)
+        if n == 0 or len(pts2) == 0:
+            return dist, idx
+
+        with instrumentation.span("guided_candidates"):
+            projected = cv2.perspectiveTransform(
+                np.asarray(pts1, dtype=np.float32).reshape(-1, 1, 2), np.asarray(homography, dtype=np.float64)
+            ).reshape(-1, 2)
+            query_idx, train_idx = SpatialGrid(pts2, radius).pairs_within(projected, radius)
+        instrumentation.count("guided_candidates", len(query_idx))
+        if len(query_idx) == 0:
+            return dist, idx
+
+        d = self.pair_distances(des1, des2, query_idx, train_idx)
+        # Rank candidates by distance within each query and keep the first k
+        order = np.lexsort((d, query_idx))
+        query_idx, train_idx, d = query_idx[order], train_idx[order], d[order]
+        first = np.r_[True, query_idx[1:] != query_idx[:-1]]
+        positions = np.arange(len(query_idx))
+        rank = positions - np.maximum.accumulate(np.where(first, positions, 0))
+        top = rank < k
+        dist[query_idx[top], rank[top]] = d[top]
+        idx[query_idx[top], rank[top]] = train_idx[top]
+        return dist, idx
+
+    def _select(self, dist, idx, use_ratio, ratio_threshold) -> MatchSet:
+        """Ratio test (or distance threshold) on k-NN results, as a distance-sorted MatchSet."""
+        found = idx[:, 0] >= 0
+        if use_ratio:
+            if dist.shape[1] > 1:
+                # A lone candidate (no second neighbour, e.g. alone inside the guided radius) has
+                # nothing to be compared with: it must be a typical good match in absolute terms
+                lone = np.isinf(dist[:, 1])
+                keep = found & np.where(lone, dist[:, 0] < distance_scale(self.method),
+                                        dist[:, 0] < ratio_threshold * dist[:, 1])
+            else:
+                keep = found
+        else:
+            # ORB without ratio test (use distance threshold)
+            keep = found & (dist[:, 0] < self.distance_threshold)
+        query_idx = np.flatnonzero(keep)
+        return MatchSet(query_idx, idx[query_idx, 0], dist[query_idx, 0]).sorted()
+
+    @staticmethod
+    def keypoint_coords(kp) -> np.ndarray:
+        """(N, 2) float32 coordinates from a cv2.KeyPoint list or a packed keypoint array."""
+        if isinstance(kp, np.ndarray) and kp.dtype.names:
+            return np.column_stack([kp["x"], kp["y"]]).astype(np.float32)
+        if len(kp) == 0:
+            return np.empty((0, 2), dtype=np.float32)
+        return cv2.KeyPoint_convert(kp).reshape(-1, 2)
 
     def match(self, kp1, des1, kp2, des2, ratio_test=True, ratio_threshold=0.75):
         """Match descriptors and apply geometric verification."""
         if des1 is None or des2 is None or len(des1) < 4 or len(des2) < 4:
             return {
-                "raw_matches": [],
-                "inlier_matches": [],
+                "raw_matches": MatchSet.empty(),
+                "inlier_matches": MatchSet.empty(),
                 "inlier_ratio": 0.0,
                 "matching_time": 0.0,
                 "ransac_time": 0.0,
-                "homography": None
+                "total_match_time": 0.0,
+                "homography": None,
+                **self._verification_info(None, 0, 0, skipped="too few descriptors")
             }
 
-        start_matching = time.time()
-        
+        start_matching = time.perf_counter()
+
         # Step 1: Initial Matching
-        raw_matches = []
-        if self.method == "SIFT" or ratio_test:
-            # SIFT or explicit ratio test
-            matches = self.bf.knnMatch(des1, des2, k=2)
-            for m, n in matches:
-                if m.distance < ratio_threshold * n.distance:
-                    raw_matches.append(m)
-        else:
-            # ORB without ratio test (use distance threshold)
-            matches = self.bf.match(des1, des2)
-            raw_matches = [m for m in matches if m.distance < self.distance_threshold]
+        use_ratio = self.distance_threshold is None or ratio_test
+        with instrumentation.span("knn_match"):
+            # SIFT or explicit ratio test need the two nearest neighbours
+            dist, idx = self.knn(des1, des2, k=2 if use_ratio else 1)
 
-        # Sort by distance
-        raw_matches = sorted(raw_matches, key=lambda x: x.distance)
-        matching_time = time.time() - start_matching
+        with instrumentation.span("ratio_filter"):
+            raw_matches = self._select(dist, idx, use_ratio, ratio_threshold)
+        instrumentation.count("matches_raw", len(raw_matches))
+        matching_time = time.perf_counter() - start_matching
 
         # Step 2: Geometric Verification (RANSAC)
-        start_ransac = time.time()
-        inlier_matches = []
+        verification = self.verify(kp1, kp2, raw_matches)
+
+        return {
+            "raw_matches": raw_matches,
+            "matching_time": matching_time,
+            "total_match_time": matching_time + verification["ransac_time"],
+            **verification
+        }
+
+    def guided_match(self, kp1, des1, kp2, des2, homography, radius: float = 30.0,
+                     ratio_test=True, ratio_threshold=0.75):
+        """Match only within `radius` px of where a prior homography (previous frame, coarse pass)
+        maps each keypoint, then verify as match() does.
+
+        Candidate comparisons grow with the keypoints near each prediction instead of N x M.
+        """
+        if homography is None or des1 is None or des2 is None or len(des1) < 4 or len(des2) < 4:
+            # No prior: exhaustive matching (which also handles too few descriptors)
+            return self.match(kp1, des1, kp2, des2, ratio_test, ratio_threshold)
+
+        start_matching = time.perf_counter()
+        use_ratio = self.distance_threshold is None or ratio_test
+        with instrumentation.span("guided_match"):
+            dist, idx = self.guided_knn(
+                self.keypoint_coords(kp1), des1, self.keypoint_coords(kp2), des2,
+                homography, radius, k=2 if use_ratio else 1
+            )
+        with instrumentation.span("ratio_filter"):
+            raw_matches = self._select(dist, idx, use_ratio, ratio_threshold)
+        instrumentation.count("matches_raw", len(raw_matches))
+        matching_time = time.perf_counter() - start_matching
+
+        verification = self.verify(kp1, kp2, raw_matches)
+        return {
+            "raw_matches": raw_matches,
+            "matching_time": matching_time,
+            "total_match_time": matching_time + verification["ransac_time"],
+            **verification
+        }
+
+    def verify(self, kp1, kp2, raw_matches: MatchSet):
+        """Geometric verification of already computed matches (no re-matching)."""
+        start_ransac = time.perf_counter()
+        inlier_matches = MatchSet.empty()
         homography = None
+        model = None
         inlier_ratio = 0.0
+        skipped = None
+
+        if len(raw_matches) >= self.min_matches:
+            src_pts = self.keypoint_coords(kp1)[raw_matches.query_idx].reshape(-1, 1, 2)
+            dst_pts = self.keypoint_coords(kp2)[raw_matches.train_idx].reshape(-1, 1, 2)
 
-        if len(raw_matches) >= 4:
-            src_pts = np.float32([kp1[m.queryIdx].pt for m in raw_matches]).reshape(-1, 1, 2)
-            dst_pts = np.float32([kp2[m.trainIdx].pt for m in raw_matches]).reshape(-1, 1, 2)
+            model, mask = self.estimate(src_pts, dst_pts)
+            if model is not None and self.model_type != "fundamental":
+                # Affine models are promoted to 3x3 so callers can treat every planar model alike
+                homography = model if model.shape == (3, 3) else np.vstack([model, [0.0, 0.0, 1.0]])
 
-            homography, mask = cv2.findHomography(src_pts, dst_pts, cv2.RANSAC, 5.0)
-            
             if mask is not None:
-                matches_mask = mask.ravel().tolist()
-                inlier_matches = [m for i, m in enumerate(raw_matches) if matches_mask[i] == 1]
-                inlier_ratio = len(inlier_matches) / len(raw_matches) if len(raw_matches) > 0 else 0
+                inlier_matches = raw_matches[mask.ravel().astype(bool)]
+                inlier_ratio = len(inlier_matches) / len(raw_matches)
+        else:
+            # Weak pair: not enough matches to be worth estimating a model
+            skipped = f"fewer than {self.min_matches} matches"
 
-        ransac_time = time.time() - start_ransac
+        ransac_time = time.perf_counter() - start_ransac
+        instrumentation.observe("ransac", ransac_time, start_ransac)
+        instrumentation.count("matches_inlier", len(inlier_matches))
 
         return {
-            "raw_matches": raw_matches,
             "inlier_matches": inlier_matches,
             "inlier_ratio": inlier_ratio,
-            "matching_time": matching_time,
             "ransac_time": ransac_time,
-            "total_match_time": matching_time + ransac_time,
-            "homography": homography
+            "homography": homography,
+            **self._verification_info(model, len(raw_matches), len(inlier_matches), skipped)
+        }
+
+    def match_multi(self, kp1, des1, kp2, des2, max_models: int = 5, candidates: int = 3,
+                    ratio_test=True, ratio_threshold=0.75, min_inliers: int = 15):
+        """Find several instances of the query (or several planes) in one scene.
+
+        A single k-NN pass keeps up to `candidates` neighbours per query descriptor. Each one is
+        tested against the next neighbour beyond them (the k-NN form of the ratio test), because
+        identical instances would fail the usual best-vs-second test. verify_multi() then extracts
+        the models.
+        """
+        if des1 is None or des2 is None or len(des1) < 4 or len(des2) < 4:
+            return {"raw_matches": MatchSet.empty(), "matching_time": 0.0, **self.verify_multi(kp1, kp2, MatchSet.empty())}
+
+        start_matching = time.perf_counter()
+        use_ratio = self.distance_threshold is None or ratio_test
+        k = min(candidates + 1 if use_ratio else candidates, len(des2))
+        with instrumentation.span("knn_match"):
+            dist, idx = self.knn(des1, des2, k=k)
+
+        with instrumentation.span("ratio_filter"):
+            if use_ratio:
+                dist, idx, keep = dist[:, :-1], idx[:, :-1], dist[:, :-1] < ratio_threshold * dist[:, -1:]
+            else:
+                keep = dist < self.distance_threshold
+            query_idx, rank = np.nonzero(keep)
+            raw_matches = MatchSet(query_idx, idx[query_idx, rank], dist[query_idx, rank]).sorted()
+        instrumentation.count("matches_raw", len(raw_matches))
+        matching_time = time.perf_counter() - start_matching
+
+        return {
+            "raw_matches": raw_matches,
+            "matching_time": matching_time,
+            **self.verify_multi(kp1, kp2, raw_matches, max_models=max_models, min_inliers=min_inliers)
+        }
+
+    def verify_multi(self, kp1, kp2, raw_matches: MatchSet, max_models: int = 5, min_inliers: int = 15):
+        """Sequential RANSAC over already computed matches: fit a model, remove every match it
+        explains, repeat on the rest.
+
+        Stops after `max_models`, or when the next model has fewer than `min_inliers` inliers or
+        is degenerate (a mirrored or collapsed mapping). Returns the models best-supported first,
+        each with its homography and inlier MatchSet.
+        """
+        if self.model_type == "fundamental":
+            raise ValueError("Multi-model verification needs a planar model (homography or affine)")
+        start_ransac = time.perf_counter()
+        src_all = self.keypoint_coords(kp1)
+        dst_all = self.keypoint_coords(kp2)
+        min_inliers = max(min_inliers, self.min_matches)
+
+        models = []
+        remaining = raw_matches
+        while len(models) < max_models and len(remaining) >= min_inliers:
+            result = self.verify(kp1, kp2, remaining)
+            homography = result["homography"]
+            if homography is None or len(result["inlier_matches"]) < min_inliers:
+                break
+            det = np.linalg.det(homography[:2, :2]) / homography[2, 2] ** 2
+            if not 1e-3 < det < 1e3:
+                break
+
+            # Everything this model explains is consumed, including matches RANSAC left out
+            src = src_all[remaining.query_idx].reshape(-1, 1, 2)
+            projected = cv2.perspectiveTransform(src.astype(np.float64), homography).reshape(-1, 2)
+            explained = np.linalg.norm(projected - dst_all[remaining.train_idx], axis=1) <= self.reproj_threshold
+            if explained.sum() < min_inliers:
+                break
+            inliers = remaining[explained]
+            models.append({
+                "homography": homography,
+                "inlier_matches": inliers,
+                "num_inliers": len(inliers),
+                "inlier_ratio": len(inliers) / len(raw_matches)
+            })
+            remaining = remaining[~explained]
+
+        ransac_time = time.perf_counter() - start_ransac
+        instrumentation.observe("ransac_multi", ransac_time, start_ransac)
+        instrumentation.count("models_found", len(models))
+        return {
+            "models": models,
+            "num_models": len(models),
+            "unexplained_matches": remaining,
+            "ransac_time": ransac_time
+        }
+
+    def estimate(self, src_pts, dst_pts):
+        """Fit the configured model robustly. Returns (model, inlier mask) or (None, None)."""
+        if self.model_type == "homography":
+            return cv2.findHomography(
+                src_pts, dst_pts, self.verification_flag, self.reproj_threshold,
+                maxIters=self.max_iters, confidence=self.confidence
+            )
+        if self.model_type in ("affine", "partial_affine"):
+            estimator = cv2.estimateAffine2D if self.model_type == "affine" else cv2.estimateAffinePartial2D
+            return estimator(
+                src_pts, dst_pts, method=self.verification_flag,
+                ransacReprojThreshold=self.reproj_threshold,
+                maxIters=self.max_iters, confidence=self.confidence
+            )
+        model, mask = cv2.findFundamentalMat(
+            src_pts, dst_pts, self.verification_flag, self.reproj_threshold,
+            self.confidence, self.max_iters
+        )
+        # findFundamentalMat may stack several 3x3 solutions; keep the first
+        return (model[:3] if model is not None else None), mask
+
+    def estimated_iterations(self, num_matches, num_inliers) -> int:
+        """RANSAC iterations needed to reach `confidence` at the observed inlier ratio.
+
+        OpenCV does not report the iteration count, so this is the standard adaptive bound,
+        capped at max_iters.
+        """
+        if num_matches == 0:
+            return 0
+        w = num_inliers / num_matches
+        sample = MODEL_SAMPLE_SIZE[self.model_type]
+        p_good_sample = w ** sample
+        if p_good_sample >= 1.0:
+            return 1
+        if p_good_sample <= 0.0:
+            return self.max_iters
+        n = np.log(1.0 - self.confidence) / np.log(1.0 - p_good_sample)
+        return int(min(self.max_iters, max(1, np.ceil(n))))
+
+    def _verification_info(self, model, num_matches, num_inliers, skipped=None):
+        return {
+            "verification_method": self.verification,
+            "model_type": self.model_type,
+            "model": model,
+            "ransac_iterations": 0 if skipped else self.estimated_iterations(num_matches, num_inliers),
+            "verification_skipped": skipped
         }
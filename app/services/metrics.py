@@ -1,9 +1,18 @@
 import numpy as np
 
+from services.detector_registry import distance_scale
+from services.match_set import MatchSet
+from utils.instrumentation import instrumentation
+
 class MetricsService:
     @staticmethod
-    def calculate_similarity_stats(matches: list, inlier_matches: list, total_kp1: int, total_kp2: int, method: str):
+    def calculate_similarity_stats(matches, inlier_matches, total_kp1: int, total_kp2: int, method: str):
         """Calculate rigorous similarity metrics based on inliers and raw matches."""
+        with instrumentation.span("metrics"):
+            return MetricsService._similarity_stats(matches, inlier_matches, total_kp1, total_kp2, method)
+
+    @staticmethod
+    def _similarity_stats(matches, inlier_matches, total_kp1: int, total_kp2: int, method: str):
         num_matches = len(matches)
         num_inliers = len(inlier_matches)
         
@@ -22,7 +31,7 @@ class MetricsService:
                 "verdict": "Low similarity"
             }
 
-        distances = [m.distance for m in matches]
+        distances = MatchSet.distances_of(matches)
         avg_dist = np.mean(distances)
         median_dist = np.median(distances)
         std_dist = np.std(distances)
@@ -38,14 +47,12 @@ class MetricsService:
         inlier_ratio = num_inliers / num_matches if num_matches > 0 else 0
         
         # 3. Normalized Distance Score (0 to 1)
-        # For ORB (Hamming), 60 is threshold. For SIFT (L2), distances are larger.
-        if method.upper() == "ORB":
-            # Higher score for lower distance. 0 at 60 distance, 1 at 0 distance.
-            dist_score = max(0, (60 - avg_dist) / 60)
-        else:
-            # SIFT distances vary; use a heuristic normalization for display
-            # Typically SIFT matches are < 200-300 for good matches
-            dist_score = max(0, (300 - avg_dist) / 300)
+        # For ORB (Hamming), 60 is threshold. For SIFT (L2), distances are larger:
+        # typically SIFT matches are < 200-300 for good matches. Other binary detectors
+        # scale ORB's threshold by descriptor length.
+        # Higher score for lower distance. 0 at the scale, 1 at 0 distance.
+        scale = distance_scale(method)
+        dist_score = max(0, (scale - avg_dist) / scale)
 
         # 4. Real Confidence Score (0-100)
         # weights: inlier_ratio (40%), match_ratio (30%), dist_score (30%)
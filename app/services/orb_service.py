@@ -1,28 +1,25 @@
 import cv2
-import time
-import numpy as np
 
-class ORBService:
-    def __init__(self, n_features: int = 2000):
-        self.detector = cv2.ORB_create(nfeatures=n_features)
+from services.detector_service import DetectorService
 
-    def detect_and_compute(self, img: np.ndarray):
-        """Detect keypoints and compute descriptors using ORB."""
-        start_time = time.time()
-        # Ensure image is grayscale for detection
-        if len(img.shape) == 3:
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = img
-            
-        kp, des = self.detector.detectAndCompute(gray, None)
-        end_time = time.time()
-        
-        return {
-            "keypoints": kp,
-            "descriptors": des,
-            "extraction_time": end_time - start_time,
-            "count": len(kp),
-            "descriptor_type": str(des.dtype) if des is not None else None,
-            "descriptor_size": des.shape[1] if des is not None else None
-        }
+class ORBService(DetectorService):
+    name = "ORB"
+    binary = True
+    distance_scale = 60.0
+    has_budget = True
+
+    def __init__(self, n_features: int = 2000, cache=None, **options):
+        super().__init__(cache=cache, **options)
+        self.n_features = n_features
+
+    def _create_detector(self):
+        return cv2.ORB_create(nfeatures=self.n_features)
+
+    def _detect_tile(self, gray, mask, core, padded, cap=None):
+        # Each tile is its own ORB run (on a tile thread's detector), so its budget is the tile's cap
+        if cap:
+            self.detector.setMaxFeatures(cap)
+        return super()._detect_tile(gray, mask, core, padded, cap)
+
+    def params(self) -> dict:
+        return {**super().params(), "n_features": self.n_features}
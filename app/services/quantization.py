@@ -0,0 +1,226 @@
+import cv2
+import numpy as np
+
+class DescriptorQuantizer:
+    """Compact storage format for float descriptors (SIFT) with a matching nearest-neighbour search.
+
+    `encode()` turns (N, 128) float32 descriptors into compact codes; `knn(query, codes, k)`
+    returns (distances, indices) like MatcherService.knn, with the query given as the original
+    float descriptors. Pass an instance as MatcherService(quantizer=...) to match against codes.
+    """
+    name = None
+
+    def fit(self, descriptors: np.ndarray):
+        """Learn the encoding from a sample of descriptors (no-op for fixed encodings)."""
+        return self
+
+    def encode(self, descriptors: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def knn(self, query: np.ndarray, codes: np.ndarray, k: int = 2):
+        raise NotImplementedError
+
+    def bytes_per_descriptor(self) -> int:
+        raise NotImplementedError
+
+    def _blocked_knn(self, query, codes, k, decode, squared_norms, block_size=1024, query_block=256):
+        """Top-k L2 search over codes decoded one block at a time.
+
+        ||q - c||^2 is expanded as ||q||^2 + ||c||^2 - 2 q.c so each tile is a single BLAS
+        product. Each code block is decoded once and scanned `query_block` queries at a time, so
+        scratch memory is one (query_block, block_size) distance tile (1 MB by default) however
+        many descriptors are matched, and the whole float database is never materialised.
+        """
+        best_d = np.full((len(query), k), np.inf, dtype=np.float32)
+        best_i = np.full((len(query), k), -1, dtype=np.int32)
+        query_norms = (query * query).sum(axis=1)[:, None]
+
+        for start in range(0, len(codes), block_size):
+            block = codes[start:start + block_size]
+            decoded, block_norms = decode(block), squared_norms(block)[None, :]
+            kb = min(k, len(block))
+            for q0 in range(0, len(query), query_block):
+                rows = slice(q0, q0 + query_block)
+                dist = query_norms[rows] + block_norms - 2.0 * (query[rows] @ decoded.T)
+
+                # Merge this tile's k best into the running k best of its queries
+                part = np.argpartition(dist, kb - 1, axis=1)[:, :kb] if dist.shape[1] > kb else \
+                    np.broadcast_to(np.arange(dist.shape[1]), dist.shape)
+                cand_d = np.concatenate([best_d[rows], np.take_along_axis(dist, part, axis=1)], axis=1)
+                cand_i = np.concatenate([best_i[rows], (part + start).astype(np.int32)], axis=1)
+                order = np.argsort(cand_d, axis=1, kind="stable")[:, :k]
+                best_d[rows] = np.take_along_axis(cand_d, order, axis=1)
+                best_i[rows] = np.take_along_axis(cand_i, order, axis=1)
+
+        return np.sqrt(np.maximum(best_d, 0.0)), best_i
+
+    def compression_ratio(self, dim: int = 128) -> float:
+        """Memory saving relative to float32 descriptors."""
+        return dim * 4 / self.bytes_per_descriptor()
+
+    def recall(self, query: np.ndarray, train: np.ndarray, ratio_threshold: float = 0.75) -> dict:
+        """Agreement with exact float L2 matching on the same descriptors.
+
+        `nn_recall` is the fraction of queries whose exact nearest neighbour is also ranked first
+        on the codes; `match_recall` / `match_precision` compare the ratio-test match sets.
+        """
+        exact_d, exact_i = cv2.batchDistance(query.astype(np.float32), train.astype(np.float32),
+                                             cv2.CV_32F, normType=cv2.NORM_L2, K=2)
+        approx_d, approx_i = self.knn(query, self.encode(train), k=2)
+
+        exact = exact_d[:, 0] < ratio_threshold * exact_d[:, 1]
+        approx = approx_d[:, 0] < ratio_threshold * approx_d[:, 1]
+        agree = exact & approx & (exact_i[:, 0] == approx_i[:, 0])
+        return {
+            "quantizer": self.name,
+            "nn_recall": float(np.mean(exact_i[:, 0] == approx_i[:, 0])),
+            "match_recall": float(agree.sum() / max(1, exact.sum())),
+            "match_precision": float(agree.sum() / max(1, approx.sum())),
+            "exact_matches": int(exact.sum()),
+            "approx_matches": int(approx.sum()),
+            "compression_ratio": self.compression_ratio(train.shape[1])
+        }
+
+    def state(self) -> dict:
+        """Arrays needed to rebuild a fitted quantizer (see save/load)."""
+        return {}
+
+    def save(self, path: str):
+        np.savez(path, name=np.array(self.name), **self.state())
+
+    @staticmethod
+    def load(path: str) -> "DescriptorQuantizer":
+        with np.load(path) as data:
+            quantizer = QUANTIZERS[str(data["name"])].__new__(QUANTIZERS[str(data["name"])])
+            quantizer.restore({key: data[key] for key in data.files if key != "name"})
+        return quantizer
+
+    def restore(self, state: dict):
+        pass
+
+class Uint8Quantizer(DescriptorQuantizer):
+    """SIFT components are integers in [0, 255] stored as float32: uint8 is lossless and 4x smaller."""
+    name = "uint8"
+
+    def encode(self, descriptors):
+        return np.clip(np.rint(descriptors), 0, 255).astype(np.uint8)
+
+    def knn(self, query, codes, k=2):
+        # Integer squared distances take OpenCV's vectorised 8-bit path; NORM_L2 on uint8 does not
+        dist, idx = cv2.batchDistance(self.encode(query), codes, cv2.CV_32S, normType=cv2.NORM_L2SQR, K=k)
+        return np.sqrt(dist.astype(np.float32)), idx
+
+    def bytes_per_descriptor(self):
+        return 128
+
+class PCAQuantizer(DescriptorQuantizer):
+    """Project onto the top principal components and store them as float16 (64 dims: 4x smaller)."""
+    name = "pca"
+
+    def __init__(self, n_components: int = 64):
+        self.n_components = n_components
+        self.mean = None
+        self.components = None
+
+    def fit(self, descriptors):
+        data = descriptors.astype(np.float32)
+        self.mean, eigenvectors = cv2.PCACompute(data, mean=None, maxComponents=self.n_components)
+        self.components = eigenvectors.astype(np.float32)
+        return self
+
+    def project(self, descriptors):
+        return (descriptors.astype(np.float32) - self.mean) @ self.components.T
+
+    def encode(self, descriptors):
+        return self.project(descriptors).astype(np.float16)
+
+    def knn(self, query, codes, k=2):
+        # Queries stay float32: only the stored side pays the float16 rounding
+        decode = lambda block: block.astype(np.float32)
+        norms = lambda block: np.square(block, dtype=np.float32).sum(axis=1)
+        return self._blocked_knn(self.project(query), codes, k, decode, norms)
+
+    def bytes_per_descriptor(self):
+        return self.n_components * 2
+
+    def state(self):
+        return {"mean": self.mean, "components": self.components}
+
+    def restore(self, state):
+        self.mean, self.components = state["mean"], state["components"]
+        self.n_components = len(self.components)
+
+class ProductQuantizer(DescriptorQuantizer):
+    """Product quantization: one byte per sub-vector (32 sub-vectors: 32 bytes, 16x smaller).
+
+    Search uses asymmetric distances (ADC): the float query is compared with the reconstructed
+    codes and is never quantized itself.
+    """
+    name = "pq"
+
+    def __init__(self, n_subvectors: int = 32, n_centroids: int = 256, block_size: int = 1024, seed: int = 0):
+        if n_centroids > 256:
+            raise ValueError("n_centroids must fit in one byte (<= 256)")
+        self.n_subvectors = n_subvectors
+        self.n_centroids = n_centroids
+        self.block_size = block_size
+        self.seed = seed
+        self.codebooks = None  # (n_subvectors, n_centroids, sub_dim)
+
+    def fit(self, descriptors, iterations: int = 20):
+        data = descriptors.astype(np.float32)
+        dim = data.shape[1]
+        if dim % self.n_subvectors:
+            raise ValueError(f"Descriptor size {dim} is not divisible by {self.n_subvectors} sub-vectors")
+        sub_dim = dim // self.n_subvectors
+        n_centroids = min(self.n_centroids, len(data))
+
+        cv2.setRNGSeed(self.seed)
+        criteria = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_MAX_ITER, iterations, 1e-3)
+        codebooks = np.zeros((self.n_subvectors, self.n_centroids, sub_dim), dtype=np.float32)
+        for m in range(self.n_subvectors):
+            sub = np.ascontiguousarray(data[:, m * sub_dim:(m + 1) * sub_dim])
+            _, _, centers = cv2.kmeans(sub, n_centroids, None, criteria, 1, cv2.KMEANS_PP_CENTERS)
+            codebooks[m, :n_centroids] = centers
+        self.codebooks = codebooks
+        return self
+
+    def _split(self, descriptors):
+        n = len(descriptors)
+        return descriptors.astype(np.float32).reshape(n, self.n_subvectors, -1)
+
+    def encode(self, descriptors):
+        subs = self._split(descriptors)
+        codes = np.empty((len(descriptors), self.n_subvectors), dtype=np.uint8)
+        for m in range(self.n_subvectors):
+            _, idx = cv2.batchDistance(subs[:, m], self.codebooks[m], cv2.CV_32F, normType=cv2.NORM_L2SQR, K=1)
+            codes[:, m] = idx.ravel()
+        return codes
+
+    def decode(self, codes):
+        """Reconstruct approximate float descriptors from codes."""
+        return self.codebooks[np.arange(self.n_subvectors), codes.astype(np.intp)].reshape(len(codes), -1)
+
+    def knn(self, query, codes, k=2):
+        # ||c||^2 per code is a sum of per-sub-space centroid norms: no decoding needed for it
+        centroid_norms = (self.codebooks ** 2).sum(axis=2)
+        subspaces = np.arange(self.n_subvectors)
+        norms = lambda block: centroid_norms[subspaces, block.astype(np.intp)].sum(axis=1)
+        return self._blocked_knn(query.astype(np.float32), codes, k, self.decode, norms, self.block_size)
+
+    def bytes_per_descriptor(self):
+        return self.n_subvectors
+
+    def state(self):
+        return {"codebooks": self.codebooks}
+
+    def restore(self, state):
+        self.codebooks = state["codebooks"]
+        self.n_subvectors, self.n_centroids = self.codebooks.shape[:2]
+        self.block_size, self.seed = 1024, 0
+
+QUANTIZERS = {
+    "uint8": Uint8Quantizer,
+    "pca": PCAQuantizer,
+    "pq": ProductQuantizer,
+}
@@ -0,0 +1,66 @@
+import numpy as np
+
+class SpatialGrid:
+    """Uniform grid over 2-D points for fixed-radius neighbour queries.
+
+    Points are bucketed into square cells of side `cell_size` and stored as one index array
+    sorted by cell, so building is a single sort and each query only touches the cells within
+    its radius. With the cell size equal to the radius that is a 3x3 block: the work per query
+    is proportional to the points nearby, not to all points.
+    """
+
+    def __init__(self, points: np.ndarray, cell_size: float):
+        if not cell_size > 0:
+            raise ValueError(f"cell_size must be positive, got {cell_size}")
+        self.points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        self.cell_size = float(cell_size)
+        cells = np.floor(self.points / self.cell_size).astype(np.int64)
+        self.origin = cells.min(axis=0) if len(cells) else np.zeros(2, dtype=np.int64)
+        cells -= self.origin
+        self.shape = cells.max(axis=0) + 1 if len(cells) else np.zeros(2, dtype=np.int64)
+        keys = cells[:, 1] * self.shape[0] + cells[:, 0]
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+    def pairs_within(self, queries: np.ndarray, radius: float):
+        """(query_idx, point_idx) arrays for every point within `radius` of each query point."""
+        if not radius > 0:
+            raise ValueError(f"radius must be positive, got {radius}")
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, 2)
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+        if len(queries) == 0 or len(self.points) == 0:
+            return empty
+        # Projections far outside the frame (or at infinity) have no neighbours
+        query_ids = np.flatnonzero(np.isfinite(queries).all(axis=1))
+        reach = int(np.ceil(radius / self.cell_size))
+        extent = (self.shape + 2 * reach) * self.cell_size
+        lower = (self.origin - reach) * self.cell_size
+        inside = ((queries[query_ids] >= lower) & (queries[query_ids] < lower + extent)).all(axis=1)
+        query_ids = query_ids[inside]
+        if len(query_ids) == 0:
+            return empty
+
+        # Every (query, neighbouring cell) combination that lies on the grid
+        cells = np.floor(queries[query_ids] / self.cell_size).astype(np.int64) - self.origin
+        span = np.arange(-reach, reach + 1)
+        offsets = np.stack(np.meshgrid(span, span), axis=-1).reshape(-1, 2)
+        neighbours = (cells[:, None, :] + offsets[None, :, :]).reshape(-1, 2)
+        owners = np.repeat(query_ids, len(offsets))
+        valid = ((neighbours >= 0) & (neighbours < self.shape)).all(axis=1)
+        neighbours, owners = neighbours[valid], owners[valid]
+        keys = neighbours[:, 1] * self.shape[0] + neighbours[:, 0]
+
+        # Each cell is a contiguous run of the sorted index; expand the runs without a Python loop
+        starts = np.searchsorted(self.sorted_keys, keys, side="left")
+        lengths = np.searchsorted(self.sorted_keys, keys, side="right") - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return empty
+        run_offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        positions = np.arange(total) - run_offsets + np.repeat(starts, lengths)
+        query_idx = np.repeat(owners, lengths)
+        point_idx = self.order[positions]
+
+        diff = queries[query_idx] - self.points[point_idx]
+        keep = (diff * diff).sum(axis=1) <= radius * radius
+        return query_idx[keep], point_idx[keep]
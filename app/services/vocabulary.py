@@ -0,0 +1,121 @@
+import json
+
+import numpy as np
+
+from services.detector_registry import is_binary
+
+class Vocabulary:
+    """Visual vocabulary for global image descriptors (bag of visual words and VLAD).
+
+    Trained with mini-batch k-means over descriptors sampled from ORBService/SIFTService output.
+    Binary descriptors (ORB, AKAZE, BRISK) are unpacked to 0/1 bit vectors, where squared L2
+    equals Hamming distance, so every detector shares the same float k-means and BLAS assignment.
+    """
+
+    def __init__(self, method="ORB", n_words: int = 1000, batch_size: int = 10000,
+                 iterations: int = 100, seed: int = 0):
+        self.method = method.upper()
+        self.n_words = n_words
+        self.batch_size = batch_size
+        self.iterations = iterations
+        self.seed = seed
+        self.centers = None
+
+    def prepare(self, descriptors: np.ndarray) -> np.ndarray:
+        """Descriptors as float32 vectors in the vocabulary's space."""
+        if is_binary(self.method):
+            return np.unpackbits(descriptors, axis=1).astype(np.float32)
+        return descriptors.astype(np.float32, copy=False)
+
+    @staticmethod
+    def sample(descriptor_sets, per_image: int = 500, seed: int = 0) -> np.ndarray:
+        """Up to `per_image` random descriptors from each image, so no image dominates training."""
+        rng = np.random.default_rng(seed)
+        sampled = []
+        for descriptors in descriptor_sets:
+            if descriptors is None or len(descriptors) == 0:
+                continue
+            if len(descriptors) > per_image:
+                descriptors = descriptors[rng.choice(len(descriptors), per_image, replace=False)]
+            sampled.append(descriptors)
+        if not sampled:
+            raise ValueError("No descriptors to train on")
+        return np.concatenate(sampled)
+
+    def train(self, descriptors: np.ndarray):
+        """Mini-batch k-means: each centre is the running mean of every sample assigned to it."""
+        data = self.prepare(descriptors)
+        if len(data) < self.n_words:
+            raise ValueError(f"Need at least {self.n_words} descriptors to train {self.n_words} words, got {len(data)}")
+        rng = np.random.default_rng(self.seed)
+        centers = data[rng.choice(len(data), self.n_words, replace=False)].copy()
+        counts = np.zeros(self.n_words, dtype=np.float64)
+
+        for _ in range(self.iterations):
+            batch = data[rng.choice(len(data), min(self.batch_size, len(data)), replace=False)]
+            words = self._nearest(batch, centers)
+            batch_counts = np.bincount(words, minlength=self.n_words)
+            sums = np.zeros_like(centers)
+            np.add.at(sums, words, batch)
+
+            hit = batch_counts > 0
+            new_counts = counts[hit] + batch_counts[hit]
+            centers[hit] = (centers[hit] * counts[hit, None] + sums[hit]) / new_counts[:, None]
+            counts[hit] = new_counts
+
+            # Centres nothing has ever been assigned to restart on random samples
+            dead = np.flatnonzero(counts == 0)
+            if len(dead):
+                centers[dead] = batch[rng.choice(len(batch), len(dead), replace=len(dead) > len(batch))]
+
+        self.centers = centers.astype(np.float32)
+        return self
+
+    @staticmethod
+    def _nearest(data, centers, block_size: int = 8192):
+        # argmin ||x - c||^2 = argmin (||c||^2 - 2 x.c): one BLAS product per block
+        center_norms = (centers * centers).sum(axis=1)
+        words = np.empty(len(data), dtype=np.int64)
+        for start in range(0, len(data), block_size):
+            block = data[start:start + block_size]
+            words[start:start + block_size] = np.argmin(center_norms[None, :] - 2.0 * (block @ centers.T), axis=1)
+        return words
+
+    def assign(self, descriptors: np.ndarray) -> np.ndarray:
+        """Visual word id of every descriptor."""
+        return self._nearest(self.prepare(descriptors), self.centers)
+
+    def bow(self, descriptors: np.ndarray) -> np.ndarray:
+        """Term counts per visual word (idf weighting is applied by the index)."""
+        if descriptors is None or len(descriptors) == 0:
+            return np.zeros(self.n_words, dtype=np.float32)
+        return np.bincount(self.assign(descriptors), minlength=self.n_words).astype(np.float32)
+
+    def vlad(self, descriptors: np.ndarray) -> np.ndarray:
+        """VLAD: residuals to the assigned word summed per word, with power and L2 normalisation."""
+        dim = self.centers.shape[1]
+        if descriptors is None or len(descriptors) == 0:
+            return np.zeros(self.n_words * dim, dtype=np.float32)
+        data = self.prepare(descriptors)
+        words = self._nearest(data, self.centers)
+        residuals = np.zeros_like(self.centers)
+        np.add.at(residuals, words, data - self.centers[words])
+
+        # Intra-normalisation per word, then signed square root against bursty features
+        norms = np.linalg.norm(residuals, axis=1, keepdims=True)
+        residuals /= np.maximum(norms, 1e-12)
+        vector = residuals.ravel()
+        vector = np.sign(vector) * np.sqrt(np.abs(vector))
+        return (vector / max(np.linalg.norm(vector), 1e-12)).astype(np.float32)
+
+    def save(self, path: str):
+        meta = {"method": self.method, "n_words": self.n_words, "seed": self.seed}
+        np.savez(path, meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8), centers=self.centers)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+            vocabulary = cls(method=meta["method"], n_words=meta["n_words"], seed=meta["seed"])
+            vocabulary.centers = data["centers"]
+        return vocabulary
@@ -0,0 +1,138 @@
+"""Concurrency stress check for the shared detector/matcher instances (services.instance_pool).
+
+A fixed set of tasks (synthetic image pair x detector configuration: extract both images, match,
+verify) is first run single-threaded with freshly created instances to get a reference
+fingerprint per task: packed keypoints, descriptors, raw and inlier match indices. The same
+tasks are then run from 1, 2, 4, ... threads in each mode:
+- shared:   one pooled instance per configuration used by every thread at once
+- checkout: exclusive instances checked out of the pool per task
+- fresh:    new instances created inside every task (what callers did before the pool)
+
+Every result must reproduce its reference exactly; throughput and speedup over one thread are
+reported per thread count. OpenCV's own thread count is limited to cores / threads while a run
+is in flight. The exit code is 1 when any result differs.
+
+Examples:
+    python app/stress_pool.py
+    python app/stress_pool.py --threads 1 4 16 --pairs 12 --rounds 3 --modes shared fresh
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from services.detector_registry import available_detectors, create_detector
+from services.instance_pool import InstancePool, opencv_threads, threads_per_worker
+from services.matcher import MatcherService
+from utils.synthetic import SyntheticUtils
+
+# (label, method, n_features, detector options)
+CONFIGS = [
+    ("ORB-1000", "ORB", 1000, {}),
+    ("ORB-2000-tiled", "ORB", 2000, {"tile_size": 256, "max_features_per_tile": 200}),
+    ("SIFT", "SIFT", None, {}),
+    ("AKAZE", "AKAZE", None, {}),
+]
+MODES = ("shared", "checkout", "fresh")
+
+def fingerprint(res_a, res_b, match_results) -> str:
+    h = hashlib.md5()
+    for res in (res_a, res_b):
+        h.update(res["keypoint_array"].tobytes())
+        if res["descriptors"] is not None:
+            h.update(res["descriptors"].tobytes())
+    for matches in (match_results["raw_matches"], match_results["inlier_matches"]):
+        h.update(matches.query_idx.tobytes())
+        h.update(matches.train_idx.tobytes())
+    return h.hexdigest()
+
+def run_task(detector, matcher, img_a, img_b) -> str:
+    res_a = detector.detect_and_compute(img_a)
+    res_b = detector.detect_and_compute(img_b)
+    match_results = matcher.match(res_a["keypoints"], res_a["descriptors"],
+                                  res_b["keypoints"], res_b["descriptors"])
+    return fingerprint(res_a, res_b, match_results)
+
+def make_runner(mode: str, pool: InstancePool):
+    def task(args):
+        (label, method, n_features, options), img_a, img_b = args
+        if mode == "shared":
+            return run_task(pool.detector(method, n_features, **options), pool.matcher(method), img_a, img_b)
+        if mode == "checkout":
+            with pool.checkout("detector", method, n_features=n_features, **options) as detector, \
+                    pool.checkout("matcher", method) as matcher:
+                return run_task(detector, matcher, img_a, img_b)
+        return run_task(create_detector(method, n_features=n_features, **options),
+                        MatcherService(method=method), img_a, img_b)
+    return task
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stress shared detector/matcher instances from many threads.")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--pairs", type=int, default=4, help="Synthetic image pairs")
+    parser.add_argument("--size", type=int, nargs=2, default=[360, 480], metavar=("H", "W"))
+    parser.add_argument("--rounds", type=int, default=1, help="Times each task is repeated per run")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    available = set(available_detectors())
+    configs = [c for c in CONFIGS if c[1] in available]
+    images = [SyntheticUtils.make_pair(*args.size, seed=7 * i)[:2] for i in range(args.pairs)]
+    tasks = [(config, img_a, img_b) for config in configs for img_a, img_b in images]
+
+    # Reference: one thread, fresh instances, default OpenCV threading
+    start = time.perf_counter()
+    reference = [run_task(create_detector(m, n_features=n, **o), MatcherService(method=m), a, b)
+                 for (_, m, n, o), a, b in tasks]
+    print(f"{len(tasks)} tasks ({len(configs)} configs x {args.pairs} pairs), reference in "
+          f"{time.perf_counter() - start:.2f}s; {os.cpu_count()} cores, cv2 threads {cv2.getNumThreads()}",
+          file=sys.stderr)
+
+    results = []
+    for mode in args.modes:
+        baseline = None
+        for n_threads in args.threads:
+            pool = InstancePool(workers=n_threads)
+            runner = make_runner(mode, pool)
+            work = tasks * args.rounds
+            start = time.perf_counter()
+            with opencv_threads(threads_per_worker(n_threads)), ThreadPoolExecutor(max_workers=n_threads) as executor:
+                outputs = list(executor.map(runner, work))
+            wall = time.perf_counter() - start
+            mismatches = sum(out != reference[i % len(tasks)] for i, out in enumerate(outputs))
+            throughput = len(work) / wall
+            baseline = baseline or throughput
+            results.append({
+                "mode": mode,
+                "threads": n_threads,
+                "tasks": len(work),
+                "wall_time": wall,
+                "tasks_per_s": throughput,
+                "speedup": throughput / baseline,
+                "mismatches": mismatches,
+                **pool.stats()
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'Mode':<9} {'Threads':>7} {'Tasks':>6} {'Wall s':>7} {'Tasks/s':>8} {'Speedup':>7} "
+              f"{'Created':>7} {'Mismatch':>8}")
+        for r in results:
+            print(f"{r['mode']:<9} {r['threads']:>7} {r['tasks']:>6} {r['wall_time']:>7.2f} "
+                  f"{r['tasks_per_s']:>8.1f} {r['speedup']:>7.2f} {r['created']:>7} {r['mismatches']:>8}")
+
+    bad = sum(r["mismatches"] for r in results)
+    if bad:
+        print(f"{bad} result(s) differ from the single-threaded reference", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
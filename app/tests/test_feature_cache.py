@@ -0,0 +1,22 @@
+import numpy as np
+
+from services.feature_cache import FeatureCache
+from utils.keypoint_utils import KEYPOINT_DTYPE
+
+def test_size_is_the_same_after_reopening(tmp_path):
+    cache = FeatureCache(str(tmp_path))
+    for i, n in enumerate((0, 5, 500)):
+        descriptors = np.full((n, 32), i, dtype=np.uint8) if n else None
+        cache.put(f"key{i}", np.zeros(n, dtype=KEYPOINT_DTYPE), descriptors)
+
+    on_disk = sum(p.stat().st_size for p in tmp_path.iterdir())
+    assert cache.size_bytes == on_disk
+    assert FeatureCache(str(tmp_path)).size_bytes == on_disk
+
+def test_eviction_keeps_the_files_within_max_bytes(tmp_path):
+    cache = FeatureCache(str(tmp_path), max_bytes=20 * 1024)
+    for i in range(10):
+        cache.put(f"key{i}", np.zeros(100, dtype=KEYPOINT_DTYPE), np.full((100, 32), i, dtype=np.uint8))
+
+    assert 1 < len(cache) < 10
+    assert sum(p.stat().st_size for p in tmp_path.iterdir()) == cache.size_bytes <= 20 * 1024
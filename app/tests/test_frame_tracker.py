@@ -0,0 +1,33 @@
+import numpy as np
+
+from services.frame_tracker import FrameTracker
+from utils.synthetic import SyntheticUtils
+
+def test_blank_frame_does_not_move_the_track():
+    tracker = FrameTracker()
+    frames = [frame for frame, _ in SyntheticUtils.make_sequence(360, 480, n_frames=3, seed=1)]
+    for frame in frames:
+        tracker.step(frame)
+    cumulative = tracker.cumulative.copy()
+
+    result = tracker.step(np.zeros_like(frames[-1]))
+
+    assert result["homography"] is None
+    assert result["cumulative"] is None
+    np.testing.assert_array_equal(tracker.cumulative, cumulative)
+    # Lost: the next frame starts without a motion prior
+    np.testing.assert_array_equal(tracker.motion, np.eye(3))
+
+def test_unrelated_frame_does_not_move_the_track():
+    tracker = FrameTracker()
+    tracker.step(SyntheticUtils.texture(360, 480, seed=1))
+    result = tracker.step(SyntheticUtils.texture(360, 480, seed=2))
+
+    assert result["homography"] is None
+    np.testing.assert_array_equal(tracker.cumulative, np.eye(3))
+    np.testing.assert_array_equal(tracker.motion, np.eye(3))
+
+def test_smooth_sequence_is_tracked():
+    tracker = FrameTracker()
+    results = list(tracker.track(frame for frame, _ in SyntheticUtils.make_sequence(360, 480, n_frames=10, seed=3)))
+    assert all(r["homography"] is not None for r in results)
@@ -0,0 +1,39 @@
+import numpy as np
+
+from services.index_service import IndexService
+from utils.keypoint_utils import KEYPOINT_DTYPE
+
+def make_images(n, rows=300, seed=0):
+    rng = np.random.default_rng(seed)
+    return {f"img{i}": rng.random((rows, 128), dtype=np.float32) * 100 for i in range(n)}
+
+def add_all(index, images):
+    for image_id, descriptors in images.items():
+        index.add(image_id, np.zeros(len(descriptors), dtype=KEYPOINT_DTYPE), descriptors)
+
+def test_small_mutations_do_not_rebuild_the_tree():
+    images = make_images(12)
+    index = IndexService("SIFT")
+    add_all(index, dict(list(images.items())[:10]))
+    assert index.query(images["img3"][:100], top_k=1)[0]["image_id"] == "img3"
+
+    add_all(index, {"img10": images["img10"]})
+    index.remove("img3")
+    assert index.query(images["img10"][:100], top_k=1)[0]["image_id"] == "img10"
+    assert all(r["image_id"] != "img3" for r in index.query(images["img3"][:100]))
+    assert index.rebuilds == 1
+
+    # Once enough rows are stale the tree is rebuilt over everything
+    add_all(index, {"img11": images["img11"], "img3": images["img3"]})
+    assert index.query(images["img3"][:100], top_k=1)[0]["image_id"] == "img3"
+    assert index.rebuilds == 2
+
+def test_load_reuses_the_saved_tree(tmp_path):
+    images = make_images(5)
+    index = IndexService("SIFT")
+    add_all(index, images)
+    index.save(str(tmp_path / "index.npz"))
+
+    loaded = IndexService.load(str(tmp_path / "index.npz"))
+    assert loaded.query(images["img2"][:100], top_k=1)[0]["image_id"] == "img2"
+    assert loaded.rebuilds == 0
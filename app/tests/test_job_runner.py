@@ -0,0 +1,40 @@
+import cv2
+
+from services.job_runner import JobRunner, ResultStore, directory_pairs
+from utils.synthetic import SyntheticUtils
+
+def run_job(directory, output, **store_options):
+    runner = JobRunner(workers=1)
+    store = ResultStore(output, job=runner.job(), **store_options)
+    try:
+        summary = runner.run(directory_pairs(directory), store)
+    finally:
+        store.close()
+    return store, summary
+
+def test_failed_pairs_are_retried_on_resume(tmp_path):
+    for i in range(2):
+        cv2.imwrite(str(tmp_path / f"img{i}.png"), SyntheticUtils.texture(200, 240, seed=i))
+    (tmp_path / "img2.png").write_bytes(b"not an image")
+    output = str(tmp_path / "results.jsonl")
+
+    store, summary = run_job(str(tmp_path), output)
+    assert summary["errors"] == 2 and store.completed == 1
+
+    cv2.imwrite(str(tmp_path / "img2.png"), SyntheticUtils.texture(200, 240, seed=2))
+    store, summary = run_job(str(tmp_path), output)
+    assert store.resumed == 1 and store.failed == 2
+    assert summary["processed"] == 2 and summary["errors"] == 0 and store.completed == 3
+
+    latest = {(r["image_a"], r["image_b"]): r for r in ResultStore.read(output)}
+    assert len(latest) == 3 and not any("error" in r for r in latest.values())
+
+def test_failed_pairs_can_be_kept_as_done(tmp_path):
+    for i in range(2):
+        cv2.imwrite(str(tmp_path / f"img{i}.png"), SyntheticUtils.texture(200, 240, seed=i))
+    (tmp_path / "img2.png").write_bytes(b"not an image")
+    output = str(tmp_path / "results.jsonl")
+
+    run_job(str(tmp_path), output, retry_errors=False)
+    store, summary = run_job(str(tmp_path), output, retry_errors=False)
+    assert store.resumed == 3 and store.failed == 0 and summary["processed"] == 0
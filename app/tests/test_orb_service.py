@@ -0,0 +1,19 @@
+import numpy as np
+
+from services.orb_service import ORBService
+from utils.synthetic import SyntheticUtils
+
+def test_tiled_extraction_stays_within_budget():
+    img = SyntheticUtils.texture(1500, 2000, seed=3)
+    res = ORBService(n_features=2000, tile_size=512).detect_and_compute(img)
+
+    assert 0 < res["count"] <= 2000
+    assert len(res["descriptors"]) == res["count"]
+
+def test_tiled_budget_is_spread_over_the_tiles():
+    img = SyntheticUtils.texture(1500, 2000, seed=3)
+    res = ORBService(n_features=2000, tile_size=512).detect_and_compute(img)
+
+    pts = np.array([k.pt for k in res["keypoints"]])
+    tiles = set(zip((pts[:, 0] // 512).astype(int), (pts[:, 1] // 512).astype(int)))
+    assert len(tiles) == 12
@@ -0,0 +1,57 @@
+"""Train a visual vocabulary for the global-descriptor prefilter (services.global_index).
+
+Descriptors are extracted from every image in a directory, a fixed number is sampled per image,
+and mini-batch k-means builds the visual words. Use a large vocabulary (1000+ words) for
+bag-of-words tf-idf and a small one (32-128 words) for VLAD.
+
+Examples:
+    python app/train_vocabulary.py --dir images/ --algo ORB --n-words 1000 --output vocab_bow.npz
+    python app/train_vocabulary.py --dir images/ --algo SIFT --n-words 64 --output vocab_vlad.npz
+"""
+import argparse
+import os
+import sys
+import time
+
+from services.detector_registry import available_detectors, create_detector
+from services.vocabulary import Vocabulary
+from utils.image_utils import ImageUtils, IMAGE_EXTENSIONS
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train a visual vocabulary with mini-batch k-means.")
+    parser.add_argument("--dir", required=True, help="Directory of training images")
+    parser.add_argument("--algo", choices=available_detectors(), default="ORB")
+    parser.add_argument("--n-features", type=int, default=2000, help="ORB keypoints per image")
+    parser.add_argument("--n-words", type=int, default=1000)
+    parser.add_argument("--per-image", type=int, default=500, help="Descriptors sampled per image")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True, help="Vocabulary .npz path")
+    args = parser.parse_args(argv)
+
+    paths = sorted(
+        os.path.join(args.dir, name) for name in os.listdir(args.dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    detector = create_detector(args.algo, n_features=args.n_features)
+
+    start = time.perf_counter()
+    descriptor_sets = []
+    for _, img in ImageUtils.iter_images(paths, grayscale=True):
+        if img is not None:
+            descriptor_sets.append(detector.detect_and_compute(img)["descriptors"])
+    sample = Vocabulary.sample(descriptor_sets, per_image=args.per_image, seed=args.seed)
+    extract_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vocabulary = Vocabulary(method=args.algo, n_words=args.n_words, batch_size=args.batch_size,
+                            iterations=args.iterations, seed=args.seed).train(sample)
+    vocabulary.save(args.output)
+
+    print(f"{len(descriptor_sets)} images, {len(sample)} descriptors sampled in {extract_time:.1f}s; "
+          f"{args.n_words} words trained in {time.perf_counter() - start:.1f}s -> {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
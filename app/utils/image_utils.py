@@ -1,20 +1,123 @@
 import cv2
 import numpy as np
-from PIL import Image
-import io
+import mmap
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.instrumentation import instrumentation
+
+# imread flags for decoding at 1/2, 1/4 and 1/8 scale
+_REDUCED_FLAGS = {
+    (False, 2): cv2.IMREAD_REDUCED_COLOR_2, (True, 2): cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    (False, 4): cv2.IMREAD_REDUCED_COLOR_4, (True, 4): cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    (False, 8): cv2.IMREAD_REDUCED_COLOR_8, (True, 8): cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
 
 class ImageUtils:
     @staticmethod
-    def load_image(file) -> np.ndarray:
-        """Load image from a file-like object or path."""
-        file_bytes = np.asarray(bytearray(file.read()), dtype=np.uint8)
-        img = cv2.imdecode(file_bytes, cv2.IMREAD_COLOR)
-        return img
+    def decode_flags(grayscale: bool = False, reduce: int = 1) -> int:
+        """imdecode flags for the requested colour mode and reduction factor (1, 2, 4 or 8)."""
+        if reduce == 1:
+            return cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+        if (grayscale, reduce) not in _REDUCED_FLAGS:
+            raise ValueError(f"reduce must be 1, 2, 4 or 8, got {reduce}")
+        return _REDUCED_FLAGS[(grayscale, reduce)]
+
+    @staticmethod
+    def load_image(file, grayscale: bool = False, reduce: int = 1) -> np.ndarray:
+        """Load image from a file-like object, path or bytes buffer.
+
+        Paths are memory-mapped and in-memory buffers (bytes, memoryview, BytesIO and Streamlit
+        uploads) are wrapped with np.frombuffer, so the encoded data is never copied before
+        decoding. `grayscale` and `reduce` decode straight to the size and format extraction needs.
+        """
+        with instrumentation.span("decode"):
+            return ImageUtils._decode(file, ImageUtils.decode_flags(grayscale, reduce))
+
+    @staticmethod
+    def _decode(file, flags: int) -> np.ndarray:
+
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return None
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    buf = np.frombuffer(mm, dtype=np.uint8)
+                    img = cv2.imdecode(buf, flags)
+                    del buf  # release the export before the mapping closes
+                    return img
+
+        if isinstance(file, (bytes, bytearray, memoryview)):
+            return cv2.imdecode(np.frombuffer(file, dtype=np.uint8), flags)
+
+        if hasattr(file, "getbuffer"):
+            view = file.getbuffer()
+            try:
+                return cv2.imdecode(np.frombuffer(view, dtype=np.uint8), flags)
+            finally:
+                view.release()
+
+        # Generic stream: a single read is unavoidable, but no further copies
+        return cv2.imdecode(np.frombuffer(file.read(), dtype=np.uint8), flags)
+
+    @staticmethod
+    def iter_images(sources, grayscale: bool = False, reduce: int = 1, workers: int = 4, prefetch: int = 8):
+        """Yield (source, image) in order while later files decode on a background thread pool.
+
+        At most `prefetch` decoded images are held ahead of the consumer, so memory stays bounded
+        and decoding overlaps with whatever the caller does with each image.
+        """
+        sources = iter(sources)
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            def submit_next():
+                for source in sources:
+                    pending.append((source, pool.submit(ImageUtils.load_image, source, grayscale, reduce)))
+                    return
+
+            for _ in range(max(1, prefetch)):
+                submit_next()
+            while pending:
+                source, future = pending.popleft()
+                submit_next()
+                yield source, future.result()
+
+    @staticmethod
+    def iter_frames(source, grayscale: bool = False, prefetch: int = 8):
+        """Yield frames in order from a video file, camera index, image directory or list of paths.
+
+        Image sequences reuse iter_images() so decoding overlaps with processing.
+        """
+        if isinstance(source, (list, tuple)) or (isinstance(source, (str, os.PathLike)) and os.path.isdir(source)):
+            if not isinstance(source, (list, tuple)):
+                source = sorted(os.path.join(source, name) for name in os.listdir(source)
+                                if name.lower().endswith(IMAGE_EXTENSIONS))
+            for _, frame in ImageUtils.iter_images(source, grayscale=grayscale, prefetch=prefetch):
+                if frame is not None:
+                    yield frame
+            return
+
+        capture = cv2.VideoCapture(source)
+        if not capture.isOpened():
+            raise ValueError(f"Cannot open video source: {source}")
+        try:
+            while True:
+                with instrumentation.span("decode"):
+                    ok, frame = capture.read()
+                if not ok:
+                    break
+                yield cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if grayscale else frame
+        finally:
+            capture.release()
 
     @staticmethod
     def to_grayscale(img: np.ndarray) -> np.ndarray:
         """Convert BGR image to grayscale."""
-        return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        with instrumentation.span("grayscale"):
+            return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
     @staticmethod
     def to_rgb(img: np.ndarray) -> np.ndarray:
@@ -38,6 +141,7 @@ class ImageUtils:
         return cv2.resize(img, dim, interpolation=cv2.INTER_AREA)
 
     @staticmethod
-    def opencv_to_pil(img: np.ndarray) -> Image.Image:
-        """Convert OpenCV BGR image to PIL Image."""
+    def opencv_to_pil(img: np.ndarray):
+        """Convert OpenCV BGR image to PIL Image (PIL is imported on first use)."""
+        from PIL import Image
         return Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
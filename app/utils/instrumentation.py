@@ -0,0 +1,163 @@
+import contextvars
+import io
+import itertools
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current_trace = contextvars.ContextVar("visionmatch_trace", default=None)
+
+class LatencyHistogram:
+    """Cumulative latency histogram per stage, exportable in Prometheus text format."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            entry = self._stages.setdefault(stage, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    entry["counts"][i] += 1
+            entry["sum"] += seconds
+            entry["count"] += 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {stage: {"count": e["count"], "sum": e["sum"]} for stage, e in self._stages.items()}
+
+    def prometheus(self, name: str) -> str:
+        lines = [f"# HELP {name} Latency per pipeline stage.", f"# TYPE {name} histogram"]
+        with self._lock:
+            for stage, entry in sorted(self._stages.items()):
+                for bound, count in zip(self.buckets, entry["counts"]):
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {entry["count"]}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {entry["sum"]:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {entry["count"]}')
+        return "\n".join(lines) + "\n"
+
+class Instrumentation:
+    """perf_counter spans, counters and per-request traces shared by every service.
+
+    Spans feed a latency histogram per stage; inside `trace()` they are also recorded on the
+    request's trace record. `profile=True` wraps each trace in cProfile and `trace_memory=True`
+    records the tracemalloc peak; both are expensive and off by default (or set the
+    VISIONMATCH_PROFILE / VISIONMATCH_TRACEMALLOC environment variables to 1).
+    """
+
+    def __init__(self, profile: bool = None, trace_memory: bool = None, max_traces: int = 1000):
+        self.enabled = True
+        self.profile = os.environ.get("VISIONMATCH_PROFILE") == "1" if profile is None else profile
+        self.trace_memory = os.environ.get("VISIONMATCH_TRACEMALLOC") == "1" if trace_memory is None else trace_memory
+        self.histogram = LatencyHistogram()
+        self.traces = deque(maxlen=max_traces)
+        self.trace_sinks = []
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    @contextmanager
+    def span(self, name: str):
+        """Time a block with perf_counter and record it as stage `name`."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, start)
+
+    def observe(self, name: str, seconds: float, start: float = None):
+        """Record an externally measured duration for stage `name`."""
+        if not self.enabled:
+            return
+        self.histogram.observe(name, seconds)
+        record = _current_trace.get()
+        if record is not None:
+            offset = (start if start is not None else time.perf_counter() - seconds) - record["_start"]
+            record["spans"].append({"name": name, "start": offset, "duration": seconds})
+
+    def count(self, name: str, value: int = 1):
+        """Increment counter `name` (e.g. keypoints detected, matches found)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+        record = _current_trace.get()
+        if record is not None:
+            record["counters"][name] = record["counters"].get(name, 0) + value
+
+    def counters(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
+
+    @contextmanager
+    def trace(self, name: str, **attributes):
+        """Collect every span and counter of one request into a trace record."""
+        record = {
+            "trace_id": next(self._ids),
+            "name": name,
+            "attributes": attributes,
+            "spans": [],
+            "counters": {},
+            "_start": time.perf_counter()
+        }
+        token = _current_trace.set(record)
+
+        profiler = None
+        if self.profile:
+            import cProfile  # profiling is opt-in; keep cProfile/pstats off the import path
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # another profiler is active on this thread
+                profiler = None
+        memory = self.trace_memory
+        if memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+
+        try:
+            yield record
+        finally:
+            record["duration"] = time.perf_counter() - record.pop("_start")
+            if profiler is not None:
+                profiler.disable()
+                import pstats
+                out = io.StringIO()
+                pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(15)
+                record["profile"] = out.getvalue()
+            if memory:
+                # Process-wide peak since the trace began (approximate under concurrency)
+                record["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+            _current_trace.reset(token)
+            self.observe(f"trace_{name}", record["duration"])
+            self.traces.append(record)
+            for sink in self.trace_sinks:
+                sink(record)
+
+    def prometheus(self, prefix: str = "visionmatch") -> str:
+        """Export stage histograms and counters in Prometheus text format."""
+        text = self.histogram.prometheus(f"{prefix}_stage_seconds")
+        for name, value in sorted(self.counters().items()):
+            text += f"# TYPE {prefix}_{name}_total counter\n{prefix}_{name}_total {value}\n"
+        return text
+
+    def reset(self):
+        self.histogram = LatencyHistogram(self.histogram.buckets)
+        self.traces.clear()
+        with self._lock:
+            self._counters.clear()
+
+# Process-wide instance used by the services
+instrumentation = Instrumentation()
@@ -0,0 +1,31 @@
+import cv2
+import numpy as np
+
+# Compact, picklable layout for cv2.KeyPoint (which cannot be pickled or saved directly)
+KEYPOINT_DTYPE = np.dtype([
+    ("x", np.float32),
+    ("y", np.float32),
+    ("size", np.float32),
+    ("angle", np.float32),
+    ("response", np.float32),
+    ("octave", np.int32),
+    ("class_id", np.int32),
+])
+
+class KeypointUtils:
+    @staticmethod
+    def pack(kp) -> np.ndarray:
+        """Pack a sequence of cv2.KeyPoint into a structured NumPy array."""
+        packed = np.empty(len(kp), dtype=KEYPOINT_DTYPE)
+        for i, k in enumerate(kp):
+            packed[i] = (k.pt[0], k.pt[1], k.size, k.angle, k.response, k.octave, k.class_id)
+        return packed
+
+    @staticmethod
+    def unpack(packed: np.ndarray) -> list:
+        """Rebuild cv2.KeyPoint objects from a structured array."""
+        return [
+            cv2.KeyPoint(float(r["x"]), float(r["y"]), float(r["size"]), float(r["angle"]),
+                         float(r["response"]), int(r["octave"]), int(r["class_id"]))
+            for r in packed
+        ]
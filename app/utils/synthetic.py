@@ -0,0 +1,113 @@
+import cv2
+import numpy as np
+
+# Known-transform families for evaluation, with severity levels from mild to hard:
+# degrees, scale factor, corner jitter (fraction of the image size), blur sigma, JPEG quality, gamma
+TRANSFORMS = {
+    "rotation": (15.0, 45.0, 90.0),
+    "scale": (0.75, 0.5, 1.5),
+    "perspective": (0.05, 0.1, 0.2),
+    "blur": (1.0, 2.0, 4.0),
+    "jpeg": (50, 20, 10),
+    "illumination": (0.6, 1.8, 2.5),
+}
+
+class SyntheticUtils:
+    @staticmethod
+    def texture(height: int, width: int, seed: int = 0) -> np.ndarray:
+        """Generate a feature-rich BGR test image: multi-scale noise plus random shapes."""
+        rng = np.random.default_rng(seed)
+        img = np.zeros((height, width), dtype=np.float32)
+        for scale in (4, 16, 64):
+            small = rng.random((max(1, height // scale), max(1, width // scale)), dtype=np.float32)
+            img += cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+        img = cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+        img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+
+        # Hard edges and corners give the detectors something repeatable to lock on to
+        n_shapes = max(20, (height * width) // 20000)
+        for _ in range(n_shapes):
+            color = tuple(int(c) for c in rng.integers(0, 256, 3))
+            x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+            r = int(rng.integers(4, max(5, min(height, width) // 12)))
+            if rng.random() < 0.5:
+                cv2.circle(img, (x, y), r, color, -1)
+            else:
+                cv2.rectangle(img, (x - r, y - r), (x + r, y + int(r * rng.uniform(0.3, 1.5))), color, -1)
+        return img
+
+    @staticmethod
+    def random_homography(height: int, width: int, seed: int = 0, max_rotation: float = 15.0,
+                          scale_range=(0.8, 1.2), perspective: float = 0.05) -> np.ndarray:
+        """Random rotation/scale about the centre plus perspective jitter of the corners."""
+        rng = np.random.default_rng(seed)
+        angle = rng.uniform(-max_rotation, max_rotation)
+        scale = rng.uniform(*scale_range)
+        similarity = np.vstack([cv2.getRotationMatrix2D((width / 2, height / 2), angle, scale), [0, 0, 1]])
+
+        corners = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+        jitter = rng.uniform(-perspective, perspective, (4, 2)) * (width, height)
+        warp = cv2.getPerspectiveTransform(corners, (corners + jitter).astype(np.float32))
+        return warp @ similarity
+
+    @staticmethod
+    def warp(img: np.ndarray, homography: np.ndarray, border: int = cv2.BORDER_REFLECT) -> np.ndarray:
+        """Warp an image with a homography into a frame of the same size."""
+        h, w = img.shape[:2]
+        return cv2.warpPerspective(img, homography, (w, h), borderMode=border)
+
+    @staticmethod
+    def transform(img: np.ndarray, name: str, level, seed: int = 0):
+        """Apply one TRANSFORMS family at `level`; returns (image_b, H) with H mapping img to image_b.
+
+        Geometric warps use a black border so no mirrored content can produce matches that
+        disagree with H. Photometric transforms keep the geometry (H is the identity).
+        """
+        h, w = img.shape[:2]
+        homography = np.eye(3)
+        if name in ("rotation", "scale"):
+            angle, scale = (level, 1.0) if name == "rotation" else (0.0, level)
+            homography = np.vstack([cv2.getRotationMatrix2D((w / 2, h / 2), angle, scale), [0, 0, 1]])
+        elif name == "perspective":
+            rng = np.random.default_rng(seed)
+            corners = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+            # Corners move inwards or outwards by up to `level` of the image size
+            jitter = rng.uniform(-level, level, (4, 2)) * (w, h)
+            homography = cv2.getPerspectiveTransform(corners, (corners + jitter).astype(np.float32)).astype(np.float64)
+        elif name == "blur":
+            return cv2.GaussianBlur(img, (0, 0), level), homography
+        elif name == "jpeg":
+            _, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, int(level)])
+            return cv2.imdecode(buf, cv2.IMREAD_UNCHANGED), homography
+        elif name == "illumination":
+            lut = (255.0 * (np.arange(256) / 255.0) ** level).clip(0, 255).astype(np.uint8)
+            return cv2.LUT(img, lut), homography
+        else:
+            raise ValueError(f"Unknown transform '{name}'. Choose from: {', '.join(TRANSFORMS)}")
+        return SyntheticUtils.warp(img, homography, border=cv2.BORDER_CONSTANT), homography
+
+    @staticmethod
+    def make_pair(height: int, width: int, seed: int = 0, **homography_kwargs):
+        """Return (image_a, image_b, H) where image_b = warp(image_a, H)."""
+        img = SyntheticUtils.texture(height, width, seed)
+        homography = SyntheticUtils.random_homography(height, width, seed + 1, **homography_kwargs)
+        return img, SyntheticUtils.warp(img, homography), homography
+
+    @staticmethod
+    def make_sequence(height: int, width: int, n_frames: int = 60, seed: int = 0,
+                      max_shift: float = 6.0, max_rotation: float = 0.5):
+        """Yield (frame, H) for a smooth camera pan over a larger texture; H maps the previous frame to this one."""
+        rng = np.random.default_rng(seed)
+        margin = int(n_frames * max_shift) + 32
+        canvas = SyntheticUtils.texture(height + 2 * margin, width + 2 * margin, seed)
+        to_canvas = np.array([[1.0, 0, margin], [0, 1.0, margin], [0, 0, 1.0]])
+        previous = None
+        for _ in range(n_frames):
+            # Random-walk camera: small translation and rotation about the frame centre per step
+            step = np.vstack([cv2.getRotationMatrix2D((width / 2, height / 2), rng.uniform(-max_rotation, max_rotation), 1.0),
+                              [0, 0, 1]])
+            step[:2, 2] += rng.uniform(-max_shift, max_shift, 2)
+            to_canvas = to_canvas @ np.linalg.inv(step) if previous is not None else to_canvas
+            frame = cv2.warpPerspective(canvas, to_canvas, (width, height), flags=cv2.WARP_INVERSE_MAP)
+            yield frame, (step if previous is not None else np.eye(3))
+            previous = frame
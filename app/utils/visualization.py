@@ -1,33 +1,67 @@
 import cv2
 import numpy as np
-import matplotlib.pyplot as plt
-import plotly.express as px
-import plotly.graph_objects as go
+
+from services.match_set import MatchSet
+from utils.instrumentation import instrumentation
 
 class VisualizationUtils:
     @staticmethod
-    def draw_keypoints(img: np.ndarray, kp: list) -> np.ndarray:
-        """Draw rich keypoints on the image."""
-        img_with_kp = cv2.drawKeypoints(
-            img, kp, None, 
-            flags=cv2.DRAW_MATCHES_FLAGS_DRAW_RICH_KEYPOINTS
-        )
+    def preview(img: np.ndarray, kp: list, max_long_edge: int = None):
+        """Downscale an image and its keypoints together for display (no-op if already small enough)."""
+        if not max_long_edge or max(img.shape[:2]) <= max_long_edge:
+            return img, kp
+        scale = max_long_edge / max(img.shape[:2])
+        with instrumentation.span("preview_resize"):
+            small = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        scaled = [
+            cv2.KeyPoint(k.pt[0] * scale, k.pt[1] * scale, k.size * scale, k.angle, k.response, k.octave, k.class_id)
+            for k in kp
+        ]
+        return small, scaled
+
+    @staticmethod
+    def draw_keypoints(img: np.ndarray, kp: list, max_long_edge: int = None) -> np.ndarray:
+        """Draw rich keypoints on the image, optionally on a preview no larger than max_long_edge."""
+        img, kp = VisualizationUtils.preview(img, kp, max_long_edge)
+        with instrumentation.span("draw_keypoints"):
+            img_with_kp = cv2.drawKeypoints(
+                img, kp, None, 
+                flags=cv2.DRAW_MATCHES_FLAGS_DRAW_RICH_KEYPOINTS
+            )
         return img_with_kp
 
     @staticmethod
-    def draw_matches(img1: np.ndarray, kp1: list, img2: np.ndarray, kp2: list, matches: list, n_matches: int = 50) -> np.ndarray:
-        """Draw top N matches between two images."""
+    def draw_matches(img1: np.ndarray, kp1: list, img2: np.ndarray, kp2: list, matches, n_matches: int = 50,
+                     max_long_edge: int = None) -> np.ndarray:
+        """Draw top N matches between two images, optionally on previews no larger than max_long_edge."""
         display_matches = matches[:n_matches] if n_matches else matches
-        img_matches = cv2.drawMatches(
-            img1, kp1, img2, kp2, display_matches, None,
-            flags=cv2.DrawMatchesFlags_NOT_DRAW_SINGLE_POINTS
-        )
+        img1, kp1 = VisualizationUtils.preview(img1, kp1, max_long_edge)
+        img2, kp2 = VisualizationUtils.preview(img2, kp2, max_long_edge)
+        with instrumentation.span("draw_matches"):
+            img_matches = cv2.drawMatches(
+                img1, kp1, img2, kp2, MatchSet.as_dmatches(display_matches), None,
+                flags=cv2.DrawMatchesFlags_NOT_DRAW_SINGLE_POINTS
+            )
         return img_matches
 
     @staticmethod
-    def plot_distance_histogram(matches: list, stats: dict, algo_name: str):
+    def encode_png(img: np.ndarray) -> bytes:
+        """PNG-encode a BGR image (for downloads)."""
+        with instrumentation.span("encode_png"):
+            ok, buf = cv2.imencode(".png", img)
+        return buf.tobytes() if ok else b""
+
+    @staticmethod
+    def plot_distance_histogram(matches, stats: dict, algo_name: str):
         """Generate an enriched histogram of match distances using Plotly."""
-        distances = [m.distance for m in matches]
+        with instrumentation.span("plot_histogram"):
+            return VisualizationUtils._distance_histogram(MatchSet.distances_of(matches), stats, algo_name)
+
+    @staticmethod
+    def _distance_histogram(distances, stats: dict, algo_name: str):
+        # Plotly takes longer to import than everything else here; load it when a plot is drawn
+        import plotly.express as px
+
         fig = px.histogram(
             x=distances, 
             nbins=30, 